@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+
+#    Copyright (C) 2016 Jeremy S. Sanders
+#    Email: Jeremy Sanders <jeremy@jeremysanders.net>
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+##############################################################################
+
+"""A test server for capturing data in Veusz.
+
+This listens on a TCP port and sends samples of a noisy sine wave to
+each client connecting, at the rate requested. Capture from it in
+Veusz using Data->Capture, choosing the internet socket option with
+host localhost and the port given.
+
+By default the data are sent as binary frames (tick the binary frames
+option in the capture dialog). With --text, lines of text are sent
+instead, which can be read using a descriptor like "x y".
+
+Example:
+  python capture_binary_server.py --port 8765 --rate 200000
+"""
+
+from __future__ import division, print_function
+import argparse
+import socket
+import struct
+import sys
+import time
+
+import numpy as N
+
+# frame header: magic, numpy type character, number of columns,
+# length of name and number of values in each column
+header = struct.Struct('<4scBHI')
+
+def encodeFrame(name, columns, dtype='<f8'):
+    """Encode a binary frame containing a dataset with the columns
+    given (data, [serr] or data, [perr, nerr])."""
+
+    dt = N.dtype(dtype).newbyteorder('<')
+    bname = name.encode('utf-8')
+    vals = N.array(columns, dtype=dt)
+    return ( header.pack(b'VZF1', dt.char.encode('ascii'), len(columns),
+                         len(bname), vals.shape[1]) +
+             bname + vals.tobytes() )
+
+def encodeText(x, y):
+    """Encode values as lines of text."""
+    return ''.join(['%.6g %.6g\n' % v for v in zip(x, y)]).encode('ascii')
+
+def serve(conn, rate, blocksize, text, dtype):
+    """Send data to connection until it is closed."""
+
+    start = time.time()
+    sent = 0
+    nbytes = 0
+    lastreport = start
+    while True:
+        # number of samples due by now
+        due = int((time.time()-start)*rate)
+        if due - sent < blocksize:
+            time.sleep(blocksize/rate/2)
+            continue
+
+        idx = N.arange(sent, sent+blocksize)
+        x = idx / rate
+        y = N.sin(2*N.pi*x) + N.random.normal(scale=0.1, size=blocksize)
+
+        if text:
+            data = encodeText(x, y)
+        else:
+            data = ( encodeFrame('x', [x]) +
+                     encodeFrame('y', [y], dtype=dtype) )
+        try:
+            conn.sendall(data)
+        except socket.error:
+            break
+        sent += blocksize
+        nbytes += len(data)
+
+        now = time.time()
+        if now - lastreport > 5:
+            print('Sent %i samples (%.0f/s, %.1f MB/s)' % (
+                sent, sent/(now-start), nbytes/(now-start)/1e6))
+            lastreport = now
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Send test data for capturing in Veusz.')
+    parser.add_argument('--port', type=int, default=8765,
+                        help='port to listen on')
+    parser.add_argument('--rate', type=float, default=1000,
+                        help='samples per second')
+    parser.add_argument('--block', type=int, default=1000,
+                        help='samples in each frame')
+    parser.add_argument('--dtype', default='f4',
+                        help='numpy type of y values in frames')
+    parser.add_argument('--text', action='store_true',
+                        help='send lines of text rather than binary frames')
+    args = parser.parse_args()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(('localhost', args.port))
+    sock.listen(1)
+    print('Listening on port %i' % args.port)
+
+    while True:
+        conn, addr = sock.accept()
+        print('Connection from %s:%i' % addr)
+        serve(conn, args.rate, args.block, args.text, args.dtype)
+        conn.close()
+        print('Connection closed')
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        sys.exit(0)
@@ -0,0 +1,133 @@
+"""Check reading imports in a background thread, cancelling them and
+adding their datasets to the document.
+
+Writes a report to the output file, which is compared with the
+expected output.
+"""
+
+from __future__ import print_function
+import os.path
+import shutil
+import sys
+import tempfile
+import time
+
+import veusz.qtall as qt4
+import veusz.document as document
+import veusz.dataimport.base as base
+import veusz.dataimport.defn_standard as defn_standard
+
+def fmt(vals):
+    """Format values for output."""
+    return ' '.join(['%g' % v for v in vals])
+
+def makeImport(filename):
+    """Make standard import operation for file."""
+    return defn_standard.OperationDataImport(
+        defn_standard.ImportParamsSimple(descriptor='x y', filename=filename))
+
+def testAsyncImport(out, filename, numlines):
+    print('AsyncImport', file=out)
+
+    doc = document.Document()
+    imp = base.AsyncImport(doc, makeImport(filename))
+    print(' finished:', imp.wait(), file=out)
+    print(' datasets before applying:', sorted(doc.data), file=out)
+    print(' applied:', sorted(imp.apply()), file=out)
+    print(' datasets after applying:', sorted(doc.data), file=out)
+    print(' x:', fmt(doc.data['x'].data[:3]), file=out)
+    p = imp.progress
+    print(' progress: rows=%s bytes total=%s fraction=%s' % (
+            p.rows == numlines, p.bytestotal == os.path.getsize(filename),
+            p.fraction()), file=out)
+    print(' applied again:', sorted(imp.apply()), file=out)
+    doc.undoOperation()
+    print(' datasets after one undo:', sorted(doc.data), file=out)
+
+    # cancelled before reading
+    doc = document.Document()
+    op = makeImport(filename)
+    op.progress.cancel()
+    imp = base.AsyncImport(doc, op)
+    try:
+        imp.apply()
+    except base.ImportCancelled as ex:
+        print(' cancelled:', ex, file=out)
+    print(' datasets after cancelling:', sorted(doc.data), file=out)
+
+    # cancelled while reading, after the first chunk of lines
+    doc = document.Document()
+    op = makeImport(filename)
+    op.simpleread.chunklines = 10
+    op.progress.callback = lambda progress: progress.cancel()
+    imp = base.AsyncImport(doc, op)
+    try:
+        imp.apply()
+    except base.ImportCancelled as ex:
+        print(' cancelled while reading:', ex, file=out)
+    print(' rows read before cancelling:', imp.progress.rows, file=out)
+    print(' datasets after cancelling:', sorted(doc.data), file=out)
+
+def testCommands(out, app, filename):
+    print('commands', file=out)
+
+    doc = document.Document()
+    ifc = document.CommandInterface(doc)
+
+    def status(title, importid):
+        st = ifc.ImportStatus(importid)
+        print(' %s: done=%s datasets=%s error=%s in document=%s' % (
+                title, st['done'], ','.join(sorted(st['datasets'])),
+                st['error'],
+                ','.join(sorted(doc.data))), file=out)
+
+    importid = ifc.ImportFile(filename, 'a b', background=True)
+    st = ifc.ImportWait(importid)
+    print(' waited: done=%s datasets=%s error=%s' % (
+            st['done'], ','.join(sorted(st['datasets'])), st['error']),
+          file=out)
+    status('status after waiting', importid)
+
+    try:
+        ifc.ImportStatus(1000)
+    except RuntimeError as ex:
+        print(' invalid id:', ex, file=out)
+
+    # datasets added by the event loop
+    importid = ifc.ImportFile(filename, 'c d', background=True)
+    ifc.backgroundimports[importid].wait()
+    status('read but event loop not run', importid)
+    for i in range(200):
+        app.processEvents()
+        if ifc.ImportStatus(importid)['done']:
+            break
+        time.sleep(0.05)
+    status('after event loop', importid)
+    print(' timer stopped:', not ifc.importtimer.isActive(), file=out)
+
+    importid = ifc.ImportFile(
+        filename + '.missing', 'e', background=True)
+    st = ifc.ImportWait(importid)
+    print(' missing file: done=%s failed=%s' % (
+            st['done'], st['error'] is not None), file=out)
+
+def main(outfile):
+    app = qt4.QApplication([])
+
+    tempdir = tempfile.mkdtemp()
+    filename = os.path.join(tempdir, 'data.dat')
+    numlines = 1000
+    with open(filename, 'w') as f:
+        for i in range(numlines):
+            f.write('%i %i\n' % (i, i*2))
+
+    out = open(outfile, 'w')
+    try:
+        testAsyncImport(out, filename, numlines)
+        testCommands(out, app, filename)
+    finally:
+        out.close()
+        shutil.rmtree(tempdir)
+
+if __name__ == '__main__':
+    main(sys.argv[1])
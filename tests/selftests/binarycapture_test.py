@@ -0,0 +1,123 @@
+"""Check decoding binary capture frames, and capturing them into
+datasets with a CaptureSession.
+
+Writes a report to the output file, which is compared with the
+expected output.
+"""
+
+from __future__ import print_function
+import sys
+
+import numpy as N
+
+import veusz.qtall as qt4
+import veusz.document as document
+import veusz.dataimport.capture as capture
+
+def fmt(vals):
+    """Format values for output."""
+    return ' '.join(['%g' % v for v in vals])
+
+def makeFrame(name, dtype, cols):
+    """Make a binary capture frame."""
+    cols = [N.array(c, dtype='<'+dtype) for c in cols]
+    bname = name.encode('utf-8')
+    return ( capture.FrameDecoder.header.pack(
+            capture.FrameDecoder.magic, dtype.encode('ascii'), len(cols),
+            len(bname), len(cols[0])) +
+             bname + b''.join([c.tobytes() for c in cols]) )
+
+class ListCaptureStream(capture.CaptureStream):
+    """Stream returning the pieces of data in a list.
+
+    None in the list means no data are waiting. The stream finishes
+    when the list is empty."""
+
+    def __init__(self, name, pieces):
+        capture.CaptureStream.__init__(self)
+        self.name = name
+        self.pieces = list(pieces)
+        self.closed = False
+
+    def getMoreData(self):
+        if not self.pieces:
+            raise capture.CaptureFinishException("End of data")
+        data = self.pieces.pop(0)
+        return b'' if data is None else data
+
+    def close(self):
+        self.closed = True
+
+def testFrames(out):
+    print('FrameDecoder', file=out)
+
+    stream = ( makeFrame('a', 'd', [[1.5, 2.5]]) +
+               makeFrame('b', 'h', [[1, 2, 3], [4, 5, 6]]) +
+               makeFrame('c', 'f', [[1], [2], [3]]) )
+
+    dec = capture.FrameDecoder()
+    # feed in pieces to split frames
+    for i in range(0, len(stream), 7):
+        dec.feed(stream[i:i+7])
+        for name, cols, vals in dec.frames():
+            print(' %s: %s' % (name, ', '.join(
+                ['%s=%s' % (c, fmt(v)) for c, v in zip(cols, vals)])),
+                  file=out)
+    print(' remaining bytes:', len(dec.buffer), file=out)
+
+    dec = capture.FrameDecoder()
+    dec.feed(b'XXXX' + b'\0'*20)
+    try:
+        dec.frames()
+    except capture.CaptureFinishException:
+        print(' bad frame: CaptureFinishException', file=out)
+
+def testSession(out):
+    print('CaptureSession', file=out)
+
+    first = ( makeFrame('a', 'd', [[1.5, 2.5]]) +
+              makeFrame('b', 'h', [[1, 2, 3], [4, 5, 6]]) )
+    second = ( makeFrame('a', 'd', [[3.5]]) +
+               makeFrame('c', 'f', [[1], [2], [3]]) )
+    stream = ListCaptureStream(
+        'frames', [first[:10], first[10:], None,
+                   second[:5], second[5:], None])
+
+    session = capture.CaptureSession()
+    session.addSource(stream, capture.BinaryCaptureStore(prefix='p_'))
+
+    for i in range(3):
+        messages = session.read()
+        print(' read %i: finished=%s messages=%s' % (
+                i+1, session.isFinished(), '; '.join(messages)), file=out)
+        counts = session.getDatasetCounts()
+        print('  counts: %s' % ' '.join(
+                ['%s=%i' % (n, counts[n]) for n in sorted(counts)]), file=out)
+        data = {}
+        session.setOutput(data)
+        for name in sorted(data):
+            ds = data[name]
+            print('  %s: %s' % (name, ' '.join(
+                        ['%s=%s' % (c, fmt(getattr(ds, c)))
+                         for c in ds.streamcolumns])), file=out)
+    print(' stream closed:', stream.closed, file=out)
+    print(' bytes read:', session.bytesread == len(first) + len(second),
+          file=out)
+
+    doc = document.Document()
+    doc.applyOperation(capture.OperationDataCaptureSet(session, final=True))
+    for name in sorted(doc.data):
+        ds = doc.data[name]
+        print(' document %s: %s editable=%s' % (
+                name, ds.__class__.__name__, ds.editable), file=out)
+
+def main(outfile):
+    app = qt4.QApplication([])
+
+    out = open(outfile, 'w')
+    testFrames(out)
+    testSession(out)
+    out.close()
+
+if __name__ == '__main__':
+    main(sys.argv[1])
@@ -0,0 +1,122 @@
+"""Check buffering lines read by capture streams, and capturing from
+several streams at the same time with a CaptureSession.
+
+Writes a report to the output file, which is compared with the
+expected output.
+"""
+
+from __future__ import print_function
+import sys
+
+import veusz.qtall as qt4
+import veusz.document as document
+import veusz.dataimport.capture as capture
+import veusz.dataimport.simpleread as simpleread
+
+def fmt(vals):
+    """Format values for output."""
+    return ' '.join(['%g' % v for v in vals])
+
+class ListCaptureStream(capture.CaptureStream):
+    """Stream returning the pieces of text in a list.
+
+    None in the list means no data are waiting. The stream finishes
+    when the list is empty."""
+
+    def __init__(self, name, pieces):
+        capture.CaptureStream.__init__(self)
+        self.name = name
+        self.pieces = list(pieces)
+        self.closed = False
+
+    def getMoreData(self):
+        if not self.pieces:
+            raise capture.CaptureFinishException("End of data")
+        data = self.pieces.pop(0)
+        return '' if data is None else data
+
+    def close(self):
+        self.closed = True
+
+def readLines(stream):
+    """Read lines until there are none waiting."""
+    lines = []
+    try:
+        while True:
+            lines.append(stream.readLine())
+    except StopIteration:
+        pass
+    return lines
+
+def testStream(out):
+    print('CaptureStream', file=out)
+
+    stream = capture.CaptureStream()
+    stream._addData('1 2\n3 ')
+    print(' lines=%s buffer=%r' % (list(stream.lines), stream.buffer),
+          file=out)
+    stream._addData('4\n5 6\n7')
+    print(' lines=%s buffer=%r' % (list(stream.lines), stream.buffer),
+          file=out)
+
+    stream = ListCaptureStream('s', ['1 2\n3', ' 4\n', None, '5\n', None])
+    print(' read:', readLines(stream), file=out)
+    print(' read:', readLines(stream), file=out)
+    print(' bytes read:', stream.bytesread, file=out)
+
+    stream = ListCaptureStream('s', ['1\n2\n3\n'])
+    stream.maxlines = 2
+    try:
+        readLines(stream)
+    except capture.CaptureFinishException as ex:
+        print(' maximum lines:', ex, file=out)
+
+    stream = ListCaptureStream(
+        's', ['%i\n' % i for i in range(150)] + [None])
+    print(' continuous reads:', len(readLines(stream)),
+          len(readLines(stream)), file=out)
+
+def testSession(out):
+    print('CaptureSession', file=out)
+
+    one = ListCaptureStream('one', ['1 2\n3 ', '4\n', None, '5 6\n'])
+    two = ListCaptureStream('two', ['10\n20\n', None, None, '30\n'])
+
+    session = capture.CaptureSession()
+    session.addSource(one, capture.CaptureStore(simpleread.SimpleRead('a b')))
+    session.addSource(two, capture.CaptureStore(
+            simpleread.SimpleRead('c'), maxlength=2, prefix='p_'))
+    print(' name:', session.name, file=out)
+
+    for i in range(3):
+        messages = session.read()
+        print(' read %i: finished=%s messages=%s' % (
+                i+1, session.isFinished(), '; '.join(messages)), file=out)
+        counts = session.getDatasetCounts()
+        print('  counts: %s' % ' '.join(
+                ['%s=%i' % (n, counts[n]) for n in sorted(counts)]), file=out)
+        data = {}
+        session.setOutput(data)
+        for name in sorted(data):
+            print('  %s: %s' % (name, fmt(data[name].data)), file=out)
+
+    print(' streams closed:', one.closed, two.closed, file=out)
+    print(' bytes read:', session.bytesread, file=out)
+
+    doc = document.Document()
+    doc.applyOperation(capture.OperationDataCaptureSet(session, final=True))
+    for name in sorted(doc.data):
+        ds = doc.data[name]
+        print(' document %s: %s editable=%s' % (
+                name, fmt(ds.data), ds.editable), file=out)
+
+def main(outfile):
+    app = qt4.QApplication([])
+
+    out = open(outfile, 'w')
+    testStream(out)
+    testSession(out)
+    out.close()
+
+if __name__ == '__main__':
+    main(sys.argv[1])
@@ -0,0 +1,89 @@
+"""Check decimating line points to the first, minimum, maximum and
+last points in each pixel column.
+
+Writes a report to the output file, which is compared with the
+expected output.
+"""
+
+from __future__ import print_function
+import math
+import sys
+
+import numpy as N
+
+import veusz.utils as utils
+
+def fmt(vals):
+    """Format values for output."""
+    return ' '.join(['%g' % v for v in vals])
+
+def reference(x, y, width):
+    """Slow version of decimation, for comparison."""
+    runs = []
+    for i, xv in enumerate(x):
+        col = math.floor(xv * (1./width))
+        if runs and runs[-1][0] == col:
+            runs[-1][1].append(i)
+        else:
+            runs.append( (col, [i]) )
+
+    idx = []
+    for col, run in runs:
+        yrun = [y[i] for i in run]
+        imin = run[yrun.index(min(yrun))]
+        imax = run[yrun.index(max(yrun))]
+        for i in sorted(set([run[0], imin, imax, run[-1]])):
+            idx.append(i)
+    return [x[i] for i in idx], [y[i] for i in idx]
+
+def columnRanges(x, y, width):
+    """Minimum and maximum y in each column."""
+    out = {}
+    for xv, yv in zip(x, y):
+        col = math.floor(xv * (1./width))
+        lo, hi = out.get(col, (yv, yv))
+        out[col] = (min(lo, yv), max(hi, yv))
+    return out
+
+def check(out, title, x, y, width=1.):
+    """Decimate points and report results."""
+    dx, dy = utils.decimateLinePoints(x, y, width=width)
+    rx, ry = reference(list(x), list(y), width)
+    print('%s: points=%i reduced=%s' % (title, len(x), len(dx) < len(x)),
+          file=out)
+    if len(dx) < len(x):
+        print(' matches reference:',
+              list(dx) == rx and list(dy) == ry, file=out)
+        print(' ends kept:', ( dx[0] == x[0] and dy[0] == y[0] and
+                               dx[-1] == x[-1] and dy[-1] == y[-1] ),
+              file=out)
+        print(' column ranges kept:',
+              columnRanges(dx, dy, width) == columnRanges(x, y, width),
+              file=out)
+    return dx, dy
+
+def main(outfile):
+    out = open(outfile, 'w')
+
+    x = N.arange(40) * 0.125
+    y = (N.arange(40) * 7) % 11
+    dx, dy = check(out, 'small', x, y)
+    print(' x:', fmt(dx), file=out)
+    print(' y:', fmt(dy), file=out)
+
+    x = N.linspace(0., 500., 200000)
+    y = N.sin(x*37.) + N.cos(x*3.)
+    check(out, 'large', x, y)
+    check(out, 'large wide columns', x, y, width=10.)
+
+    check(out, 'few points', N.arange(6)*0.1, N.arange(6))
+    check(out, 'point per column', N.arange(100.), N.arange(100.))
+    x = N.arange(100) * 0.01
+    y = N.ones(100)
+    y[50] = N.nan
+    check(out, 'invalid values', x, y)
+
+    out.close()
+
+if __name__ == '__main__':
+    main(sys.argv[1])
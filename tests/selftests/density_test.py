@@ -0,0 +1,96 @@
+"""Check counting points into a density image, and that a single
+image is drawn for all the parts of a dataset split by invalid
+values.
+
+Writes a report to the output file, which is compared with the
+expected output.
+"""
+
+from __future__ import print_function
+import sys
+
+import numpy as N
+
+import veusz.qtall as qt4
+import veusz.document as document
+import veusz.widgets as widgets
+
+dpi = (100, 100)
+
+def testGrid(out):
+    print('density grid', file=out)
+
+    PP = widgets.PointPlotter
+    print(' empty clip:',
+          PP._densityGrid(qt4.QRectF(0, 0, 0, 3)), file=out)
+
+    cliprect = qt4.QRectF(0, 0, 4, 3)
+    counts = PP._densityGrid(cliprect)
+    print(' shape:', counts.shape, file=out)
+
+    # the last three points are outside or invalid
+    x = N.array([0.5, 0.5, 3.9, 1.5, 4., -0.1, N.nan])
+    y = N.array([2.5, 2.5, 0.1, 1.5, 1., 1., 1.])
+    PP._addDensityPoints(counts, x, y, cliprect)
+    PP._addDensityPoints(counts, x[3:4], y[3:4], cliprect)
+    for row in counts:
+        print(' ', ' '.join(['%g' % v for v in row]), file=out)
+
+def testRender(out):
+    print('rendering', file=out)
+
+    # record the images drawn
+    images = []
+    origplot = widgets.PointPlotter._plotDensityImage
+    def plotDensityImage(self, painter, counts, cliprect):
+        images.append(counts.sum())
+        origplot(self, painter, counts, cliprect)
+    widgets.PointPlotter._plotDensityImage = plotDensityImage
+
+    # three parts separated by invalid values
+    x = list(N.linspace(1., 9., 50))
+    y = list(N.linspace(1., 9., 50))
+    y[20] = y[35] = float('nan')
+
+    doc = document.Document()
+    ifc = document.CommandInterface(doc)
+    ifc.SetData('x', x)
+    ifc.SetData('y', y)
+    ifc.To(ifc.Add('page'))
+    ifc.To(ifc.Add('graph'))
+    for axis in 'x', 'y':
+        ifc.Set('%s/min' % axis, 0.)
+        ifc.Set('%s/max' % axis, 10.)
+    ifc.Add('xy', name='xy1', xData='x', yData='y')
+
+    def report(title):
+        del images[:]
+        size = doc.pageSize(0, dpi=dpi)
+        helper = document.PaintHelper(size, dpi=dpi)
+        doc.paintTo(helper, 0)
+        print(' %s: images=%i points=%s' % (
+                title, len(images), ' '.join(['%g' % n for n in images])),
+              file=out)
+
+    ifc.Set('xy1/densityThreshold', 10)
+    report('above threshold')
+    ifc.Set('xy1/thinfactor', 2)
+    report('above threshold thinned')
+    ifc.Set('xy1/thinfactor', 1)
+    ifc.Set('xy1/densityThreshold', 100)
+    report('below threshold')
+    ifc.Set('xy1/densityThreshold', 0)
+    report('disabled')
+
+    widgets.PointPlotter._plotDensityImage = origplot
+
+def main(outfile):
+    app = qt4.QApplication([])
+
+    out = open(outfile, 'w')
+    testGrid(out)
+    testRender(out)
+    out.close()
+
+if __name__ == '__main__':
+    main(sys.argv[1])
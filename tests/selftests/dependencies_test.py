@@ -0,0 +1,57 @@
+"""Check that only derived values depending on a modified item are
+re-evaluated.
+
+Writes a report to the output file, which is compared with the
+expected output.
+"""
+
+from __future__ import print_function
+import sys
+
+import veusz.qtall as qt4
+import veusz.document as document
+import veusz.datasets as datasets
+
+def main(outfile):
+    app = qt4.QApplication([])
+
+    doc = document.Document()
+    ifc = document.CommandInterface(doc)
+    deps = doc.dependencies
+
+    ifc.SetData('x', [1, 2, 3])
+    ifc.SetData('z', [4, 5, 6])
+    ifc.SetDataExpression('y', 'x*2', linked=True)
+    ifc.Add('page')
+
+    out = open(outfile, 'w')
+    def report(title, func):
+        before = deps.evaluations
+        val = func()
+        print('%s: evaluated=%s values=%s' % (
+            title, deps.evaluations != before,
+            ' '.join(['%g' % v for v in val])), file=out)
+
+    ydata = lambda: doc.data['y'].data
+
+    report('first read', ydata)
+    report('read again', ydata)
+
+    ifc.SetData('z', [7, 8, 9])
+    report('unrelated dataset modified', ydata)
+
+    ifc.Set('/page1/width', '10cm')
+    report('unrelated setting modified', ydata)
+
+    doc.setData('w', datasets.Dataset(data=[1.]))
+    report('dataset added', ydata)
+
+    ifc.SetData('x', [2, 3, 4])
+    report('input dataset modified', ydata)
+
+    report('read after modification', ydata)
+
+    out.close()
+
+if __name__ == '__main__':
+    main(sys.argv[1])
@@ -0,0 +1,128 @@
+"""Check results evaluated by plotters and colored images are cached
+until the datasets they use change, and the cache size is bounded.
+
+Writes a report to the output file, which is compared with the
+expected output.
+"""
+
+from __future__ import print_function
+import sys
+
+import numpy as N
+
+import veusz.qtall as qt4
+import veusz.document as document
+import veusz.widgets as widgets
+
+dpi = (100, 100)
+
+def makeDocument():
+    """Make document with a graph with an xy and image widget."""
+    doc = document.Document()
+    ifc = document.CommandInterface(doc)
+    ifc.SetData('a', [1, 2, 3])
+    ifc.SetData('b', [4, 5, 6])
+    ifc.SetData2D('img', N.arange(1000*1000.).reshape((1000, 1000)),
+                  xrange=(0, 10), yrange=(0, 10))
+    # page of 394 pixels, smaller than the image
+    ifc.Set('/width', '10cm')
+    ifc.Set('/height', '10cm')
+    ifc.To(ifc.Add('page'))
+    ifc.To(ifc.Add('graph'))
+    for axis in 'x', 'y':
+        ifc.Set('%s/min' % axis, 0.)
+        ifc.Set('%s/max' % axis, 10.)
+    ifc.Add('xy', name='xy1', xData='a', yData='b')
+    ifc.Add('image', name='image1', data='img')
+    return doc, ifc
+
+def testEval(out, doc, ifc):
+    print('cachedEval', file=out)
+
+    widget = doc.resolveFullWidgetPath('/page1/graph1/xy1')
+    evaluated = []
+    def evalfn(size):
+        def evaluate():
+            evaluated.append(True)
+            doc.dependencies.readDataset('a')
+            return N.zeros(size)
+        return evaluate
+
+    def report(title, key, size=3):
+        del evaluated[:]
+        widget.cachedEval(key, evalfn(size))
+        print(' %s: evaluated=%s cached=%i' % (
+                title, bool(evaluated), len(widget.evalcache)), file=out)
+
+    report('first', 'k0')
+    report('again', 'k0')
+    ifc.SetData('b', [7, 8, 9])
+    report('unrelated dataset modified', 'k0')
+    ifc.SetData('a', [7, 8, 9])
+    report('input dataset modified', 'k0')
+
+    for key in 'k1', 'k2', 'k3', 'k4':
+        report('new key %s' % key, key)
+    report('oldest key', 'k0')
+    report('recent key', 'k4')
+
+    # results of 800 bytes with at most 1000 kept
+    widget.evalcachebytes = 1000
+    report('first large result', 'big1', 100)
+    report('second large result', 'big2', 100)
+    report('first large result again', 'big1', 100)
+    report('result bigger than bound', 'huge', 1000)
+    report('result bigger than bound again', 'huge', 1000)
+
+def testImage(out, doc, ifc):
+    print('image', file=out)
+
+    # record images colored
+    colored = []
+    origcolor = widgets.Image.colorImage
+    def colorImage(self, vals, transimg, minval, maxval):
+        colored.append(vals.shape)
+        return origcolor(self, vals, transimg, minval, maxval)
+    widgets.Image.colorImage = colorImage
+
+    def report(title):
+        del colored[:]
+        size = doc.pageSize(0, dpi=dpi)
+        helper = document.PaintHelper(size, dpi=dpi)
+        doc.paintTo(helper, 0)
+        print(' %s: colored=%s sampled=%s' % (
+                title, bool(colored),
+                bool(colored) and colored[0] != (1000, 1000)), file=out)
+
+    report('first render')
+    report('unchanged')
+    ifc.Set('x/min', -1.)
+    ifc.Set('x/max', 9.)
+    report('panned')
+    ifc.Set('image1/colorMap', 'heat')
+    report('colormap changed')
+    ifc.SetData2D('img', N.arange(1000*1000.).reshape((1000, 1000))*2,
+                  xrange=(0, 10), yrange=(0, 10))
+    report('data modified')
+    ifc.Set('x/max', 1000.)
+    report('zoomed out')
+
+    image = doc.resolveFullWidgetPath('/page1/graph1/image1')
+    print(' sample steps:', image._sampleStep(1000, (0., 100.)),
+          image._sampleStep(1000, (0., 1000.)),
+          image._sampleStep(1000, (0., 0.5)),
+          image._sampleStep(100, (200., 0.)), file=out)
+
+    widgets.Image.colorImage = origcolor
+
+def main(outfile):
+    app = qt4.QApplication([])
+
+    out = open(outfile, 'w')
+    doc, ifc = makeDocument()
+    testEval(out, doc, ifc)
+    testImage(out, doc, ifc)
+    out.close()
+
+if __name__ == '__main__':
+    main(sys.argv[1])
@@ -0,0 +1,90 @@
+"""Check the cache of imported data.
+
+Writes a report to the output file, which is compared with the
+expected output.
+"""
+
+from __future__ import print_function
+import os
+import os.path
+import shutil
+import sys
+import tempfile
+
+import veusz.qtall as qt4
+import veusz.datasets as datasets
+import veusz.dataimport.defn_csv as defn_csv
+import veusz.dataimport.importcache as importcache
+
+def fmt(vals):
+    """Format values for output."""
+    if vals is None:
+        return 'None'
+    return ' '.join(['%g' % v for v in vals])
+
+def testCache(out, tempdir):
+    print('importcache', file=out)
+
+    cachedir = os.path.join(tempdir, 'cache')
+    importcache.cacheDir = lambda: cachedir
+
+    filename = os.path.join(tempdir, 'data.csv')
+    with open(filename, 'w') as f:
+        f.write('x,+-,y,lab\n1,0.1,2,a\n3,0.2,4,b\n')
+
+    params = defn_csv.ImportParamsCSV(filename=filename)
+    key = importcache.cacheKey(params)
+    print(' same key:',
+          key == importcache.cacheKey(defn_csv.ImportParamsCSV(
+                filename=filename)), file=out)
+    print(' key depends on params:',
+          key != importcache.cacheKey(defn_csv.ImportParamsCSV(
+                filename=filename, prefix='p_')), file=out)
+    print(' key ignores processes and cache:',
+          key == importcache.cacheKey(defn_csv.ImportParamsCSV(
+                filename=filename, processes=4, cache=True)), file=out)
+    print(' missing file key:', importcache.cacheKey(
+            defn_csv.ImportParamsCSV(
+                filename=os.path.join(tempdir, 'missing.csv'))), file=out)
+
+    print(' load before save:', importcache.loadCache(key), file=out)
+
+    importcache.saveCache(key, {
+            'x': datasets.Dataset(data=[1, 3], serr=[0.1, 0.2]),
+            'y': datasets.Dataset(data=[2, 4]),
+            'lab': datasets.DatasetText(data=['a', 'b']),
+            'd': datasets.DatasetDateTime(data=[0., 86400.]),
+            }, invalids={'y': 2})
+    cached, invalids = importcache.loadCache(key)
+    for name in sorted(cached):
+        ds = cached[name]
+        if isinstance(ds, datasets.DatasetText):
+            vals = ' '.join(ds.data)
+        else:
+            vals = '%s serr=%s' % (fmt(ds.data), fmt(ds.serr))
+        print(' %s: %s %s' % (name, ds.__class__.__name__, vals), file=out)
+    print(' invalid conversions:', ' '.join(
+            ['%s=%i' % (n, invalids[n]) for n in sorted(invalids)]), file=out)
+
+    # modifying the file changes the key
+    with open(filename, 'a') as f:
+        f.write('5,0.3,6,c\n')
+    print(' key after modification differs:',
+          key != importcache.cacheKey(params), file=out)
+
+    importcache.evictCache(0)
+    print(' after eviction:', importcache.loadCache(key), file=out)
+
+def main(outfile):
+    app = qt4.QApplication([])
+
+    tempdir = tempfile.mkdtemp()
+    out = open(outfile, 'w')
+    try:
+        testCache(out, tempdir)
+    finally:
+        out.close()
+        shutil.rmtree(tempdir)
+
+if __name__ == '__main__':
+    main(sys.argv[1])
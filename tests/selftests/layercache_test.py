@@ -0,0 +1,83 @@
+"""Check plotter layers are reused between renders only if the
+widget or the data it plots have not changed.
+
+Writes a report to the output file, which is compared with the
+expected output.
+"""
+
+from __future__ import print_function
+import sys
+
+import veusz.qtall as qt4
+import veusz.document as document
+
+dpi = (100, 100)
+
+def render(doc, cache):
+    """Render first page of document, returning an image."""
+    size = doc.pageSize(0, dpi=dpi)
+    helper = document.PaintHelper(size, dpi=dpi, layercache=cache)
+    doc.paintTo(helper, 0)
+    if cache is not None:
+        cache.prune(helper)
+
+    img = qt4.QImage(size[0], size[1], qt4.QImage.Format_ARGB32)
+    img.fill(0)
+    painter = qt4.QPainter(img)
+    helper.renderToPainter(painter)
+    painter.end()
+    return img
+
+def main(outfile):
+    app = qt4.QApplication([])
+
+    doc = document.Document()
+    ifc = document.CommandInterface(doc)
+    ifc.SetData('a', [1, 2, 3])
+    ifc.SetData('b', [2, 4, 6])
+    ifc.SetData('c', [3, 4, 5])
+    ifc.SetData('d', [1, 1, 1])
+    ifc.To(ifc.Add('page'))
+    ifc.To(ifc.Add('graph'))
+    for axis in 'x', 'y':
+        ifc.Set('%s/min' % axis, 0.)
+        ifc.Set('%s/max' % axis, 10.)
+    ifc.Add('xy', name='xy1', xData='a', yData='b')
+    ifc.Add('xy', name='xy2', xData='c', yData='d')
+
+    cache = document.LayerCache(doc)
+    out = open(outfile, 'w')
+
+    def report(title):
+        recorded, reused = cache.numrecorded, cache.numreused
+        img = render(doc, cache)
+        same = img == render(doc, None)
+        print('%s: recorded=%i reused=%i layers=%i same as uncached=%s' % (
+                title, cache.numrecorded-recorded, cache.numreused-reused,
+                len(cache.layers), same), file=out)
+
+    report('first render')
+    report('unchanged')
+
+    ifc.SetData('d', [2, 2, 2])
+    report('dataset of xy2 modified')
+
+    ifc.SetData('e', [1])
+    report('unused dataset added')
+
+    ifc.Set('xy1/MarkerFill/color', 'red')
+    report('setting of xy1 modified')
+
+    ifc.Set('x/max', 20.)
+    report('axis range modified')
+
+    ifc.Remove('xy2')
+    report('xy2 removed')
+
+    cache.clear()
+    report('after clearing')
+
+    out.close()
+
+if __name__ == '__main__':
+    main(sys.argv[1])
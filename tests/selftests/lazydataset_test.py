@@ -0,0 +1,62 @@
+"""Check lazy datasets only read their data when needed, reading
+chunks to compute ranges.
+
+Writes a report to the output file, which is compared with the
+expected output.
+"""
+
+from __future__ import print_function
+import sys
+
+import numpy as N
+
+import veusz.qtall as qt4
+import veusz.datasets as datasets
+
+def fmt(vals):
+    """Format values for output."""
+    if vals is None:
+        return 'None'
+    return ' '.join(['%g' % v for v in vals])
+
+def testLazy(out):
+    print('DatasetLazy', file=out)
+
+    vals = N.arange(10, dtype=N.float64) ** 2
+    calls = []
+    def loadfn():
+        calls.append('all')
+        return {'data': vals, 'serr': N.ones(10)}
+    def chunkfn(sl):
+        calls.append('%i:%i' % (sl.start, sl.stop))
+        return {'data': vals[sl], 'serr': N.ones(10)[sl]}
+
+    ds = datasets.DatasetLazy(loadfn, 10, lazycolumns=('data', 'serr'),
+                              chunkfn=chunkfn)
+    ds.chunksize = 4
+    print(' description:', ds.description(), file=out)
+    print(' errors:', ds.hasErrors(), file=out)
+    print(' reads before use:', len(calls), file=out)
+    print(' range:', fmt(ds.getRange()), file=out)
+    print(' reads for range:', ' '.join(calls), file=out)
+
+    del calls[:]
+    print(' data:', fmt(ds.data), file=out)
+    print(' serr:', fmt(ds.serr[:3]), file=out)
+    print(' range after read:', fmt(ds.getRange()), file=out)
+    print(' reads for data:', ' '.join(calls), file=out)
+
+    ds = datasets.DatasetLazy(loadfn, 10)
+    del calls[:]
+    print(' range without chunkfn:', fmt(ds.getRange()), file=out)
+    print(' reads without chunkfn:', ' '.join(calls), file=out)
+
+def main(outfile):
+    app = qt4.QApplication([])
+
+    out = open(outfile, 'w')
+    testLazy(out)
+    out.close()
+
+if __name__ == '__main__':
+    main(sys.argv[1])
@@ -0,0 +1,68 @@
+"""Check memory-mapped datasets, computing ranges and invalid points
+in chunks.
+
+Writes a report to the output file, which is compared with the
+expected output.
+"""
+
+from __future__ import print_function
+import os
+import os.path
+import shutil
+import sys
+import tempfile
+
+import numpy as N
+
+import veusz.qtall as qt4
+import veusz.datasets as datasets
+
+def fmt(vals):
+    """Format values for output."""
+    if vals is None:
+        return 'None'
+    return ' '.join(['%g' % v for v in vals])
+
+def testMemmap(out, tempdir):
+    print('DatasetMemmap', file=out)
+
+    filename = os.path.join(tempdir, 'memmap.dat')
+    vals = N.array([5, -3, 8, 1, 0, 12, 7], dtype=N.int16)
+    vals.tofile(filename)
+    mapped = N.memmap(filename, dtype=N.int16, mode='r')
+    errs = N.ones(len(vals), dtype=N.float32)
+
+    ds = datasets.DatasetMemmap(mapped, serr=errs)
+    # use small chunks to check they are combined
+    ds.chunksize = 3
+
+    print(' length:', len(ds), file=out)
+    print(' dtype:', ds.data.dtype, file=out)
+    print(' writeable:', ds.data.flags.writeable, file=out)
+    print(' range:', fmt(ds.getRange()), file=out)
+
+    copy = ds.returnCopy()
+    print(' copy range:', fmt(copy.getRange()), file=out)
+
+    nanvals = N.array([1., N.nan, 3., N.inf, -2.])
+    ds = datasets.DatasetMemmap(nanvals)
+    ds.chunksize = 2
+    print(' invalid:', ' '.join([str(x) for x in ds.invalidDataPoints()]),
+          file=out)
+    print(' finite range:', fmt(ds.getRange()), file=out)
+
+    del mapped, ds, copy
+
+def main(outfile):
+    app = qt4.QApplication([])
+
+    tempdir = tempfile.mkdtemp()
+    out = open(outfile, 'w')
+    try:
+        testMemmap(out, tempdir)
+    finally:
+        out.close()
+        shutil.rmtree(tempdir)
+
+if __name__ == '__main__':
+    main(sys.argv[1])
@@ -0,0 +1,164 @@
+"""Check splitting text files into chunks, and that reading the
+chunks in parallel processes gives the same datasets as reading
+serially.
+
+Writes a report to the output file, which is compared with the
+expected output.
+"""
+
+from __future__ import print_function
+import os.path
+import shutil
+import sys
+import tempfile
+
+import numpy as N
+
+import veusz.qtall as qt4
+import veusz.dataimport.parallel as parallel
+import veusz.dataimport.simpleread as simpleread
+import veusz.dataimport.readcsv as readcsv
+import veusz.dataimport.defn_csv as defn_csv
+
+def writeFile(tempdir, text, name='data.txt'):
+    """Write text to file, returning filename."""
+    filename = os.path.join(tempdir, name)
+    with open(filename, 'w') as f:
+        f.write(text)
+    return filename
+
+def sameOutput(out1, out2):
+    """Are the datasets in dicts the same (treating nans as equal)?"""
+    if sorted(out1) != sorted(out2):
+        return False
+    for name in out1:
+        a, b = out1[name].data, out2[name].data
+        if isinstance(a, N.ndarray):
+            if not ( a.shape == b.shape and N.all(
+                    (a == b) | (N.isnan(a) & N.isnan(b))) ):
+                return False
+        elif list(a) != list(b):
+            return False
+    return True
+
+def testSplit(out, tempdir):
+    print('splitFile', file=out)
+
+    print(' compatible encodings:',
+          parallel.asciiCompatible('utf_8', '"'),
+          parallel.asciiCompatible('latin_1', None),
+          parallel.asciiCompatible('utf_16', None),
+          parallel.asciiCompatible('not_an_encoding', None), file=out)
+
+    filename = writeFile(
+        tempdir, ''.join(['line %03i\n' % i for i in range(100)]))
+    chunks = parallel.splitFile(filename, 'utf_8', size=50)
+    print(' lines: chunks=%i first=%s last=%s' % (
+            len(chunks), chunks[0], chunks[-1]), file=out)
+    print(' contiguous:', all(
+            [c1[1] == c2[0] for c1, c2 in zip(chunks[:-1], chunks[1:])]),
+          file=out)
+    print(' whole file:', parallel.splitFile(filename, 'utf_8', size=1000),
+          file=out)
+    print(' utf-16:', parallel.splitFile(filename, 'utf_16', size=50),
+          file=out)
+
+    filename = writeFile(tempdir, '')
+    print(' empty file:', parallel.splitFile(filename, 'utf_8', size=50),
+          file=out)
+
+    # rows of 14 bytes containing a quoted new line
+    filename = writeFile(tempdir, '1,"two\nlines"\n'*20)
+    chunks = parallel.splitFile(filename, 'utf_8', size=20, quotechar='"')
+    print(' quoted: chunks at row ends=%s first=%s' % (
+            all([c[1] % 14 == 0 for c in chunks]), chunks[0]), file=out)
+    chunks = parallel.splitFile(filename, 'utf_8', size=20)
+    print(' quotes ignored: chunks at row ends=%s first=%s' % (
+            all([c[1] % 14 == 0 for c in chunks]), chunks[0]), file=out)
+
+def testMap(out):
+    print('mapChunks', file=out)
+    print(' available:', parallel.available(), file=out)
+    print(' results:', list(parallel.mapChunks(abs, [-3, 2, -1, 4], 2)),
+          file=out)
+    results = parallel.mapChunks(abs, [-3, 2, -1, 4], 2)
+    print(' first result:', next(results), file=out)
+    results.close()
+
+def testSimpleRead(out, tempdir, title, text, descriptor='x y'):
+    """Read file serially and in parallel."""
+    filename = writeFile(tempdir, text)
+
+    serial = simpleread.SimpleRead(descriptor)
+    serial.readData(simpleread.FileStream(open(filename)))
+    serialout = {}
+    serial.setOutput(serialout)
+
+    par = simpleread.SimpleRead(descriptor)
+    par.readFileParallel(filename, 'utf_8', 2)
+    parout = {}
+    par.setOutput(parout)
+
+    print(' %s: datasets=%s same data=%s same invalid=%s' % (
+            title, ','.join(sorted(parout)), sameOutput(serialout, parout),
+            serial.getInvalidConversions() == par.getInvalidConversions()),
+          file=out)
+
+def testCSV(out, tempdir, title, text):
+    """Read CSV file serially and in parallel."""
+    filename = writeFile(tempdir, text, name='data.csv')
+    params = defn_csv.ImportParamsCSV(filename=filename)
+
+    serial = readcsv.ReadCSV(params)
+    serial.readData()
+    serialout = {}
+    serial.setData(serialout)
+
+    par = readcsv.ReadCSV(params)
+    par.readDataParallel(2)
+    parout = {}
+    par.setData(parout)
+
+    print(' %s: datasets=%s same data=%s' % (
+            title, ','.join(sorted(parout)), sameOutput(serialout, parout)),
+          file=out)
+
+def testRead(out, tempdir):
+    print('parallel reading', file=out)
+
+    # use small chunks
+    parallel.chunksize = 2000
+
+    numbers = ''.join(['%i %g\n' % (i, i*0.5) for i in range(1000)])
+    testSimpleRead(out, tempdir, 'numbers', numbers)
+    testSimpleRead(out, tempdir, 'invalid values',
+                   numbers + '1 bad\n' + numbers)
+    testSimpleRead(out, tempdir, 'descriptor in later chunk',
+                   numbers + 'descriptor a b\n' + numbers)
+    testSimpleRead(out, tempdir, 'new column in later chunk',
+                   numbers + numbers.replace('\n', ' 1\n'), descriptor='')
+    testSimpleRead(out, tempdir, 'continuation lines',
+                   numbers.replace('0 ', '0 \\\n'))
+
+    rows = ''.join(['%i,%g,"t%i"\n' % (i, i*0.5, i) for i in range(1000)])
+    testCSV(out, tempdir, 'csv', 'x,y,z\n' + rows)
+    testCSV(out, tempdir, 'csv with header in later chunk',
+            'x,y,z\n' + rows + 'a,b,c\n' + rows)
+    testCSV(out, tempdir, 'csv with quoted new lines',
+            'x,y,z\n' + rows.replace('"t', '"t\n'))
+
+def main(outfile):
+    app = qt4.QApplication([])
+
+    tempdir = tempfile.mkdtemp()
+    out = open(outfile, 'w')
+    try:
+        testSplit(out, tempdir)
+        testMap(out)
+        testRead(out, tempdir)
+    finally:
+        out.close()
+        shutil.rmtree(tempdir)
+
+if __name__ == '__main__':
+    main(sys.argv[1])
@@ -0,0 +1,93 @@
+"""Check document changes are combined into frames when the plot
+window updates on document changes, and that frames are not recorded
+while rendering is still in progress.
+
+Writes a report to the output file, which is compared with the
+expected output.
+"""
+
+from __future__ import print_function
+import sys
+import time
+
+import veusz.qtall as qt4
+import veusz.document as document
+from veusz.windows.plotwindow import PlotWindow
+
+def main(outfile):
+    app = qt4.QApplication([])
+
+    doc = document.Document()
+    ifc = document.CommandInterface(doc)
+    ifc.SetData('x', [1, 2, 3])
+    ifc.To(ifc.Add('page'))
+    ifc.To(ifc.Add('graph'))
+    ifc.Add('xy', name='xy1', xData='x', yData='x')
+
+    # count drawings of the document recorded
+    recorded = []
+    paintto = doc.paintTo
+    def countPaintTo(helper, page):
+        recorded.append(True)
+        paintto(helper, page)
+    doc.paintTo = countPaintTo
+
+    win = PlotWindow(doc, None)
+    # update on document changes
+    win.setTimeout(-1)
+
+    def runEvents():
+        """Process events until frames are drawn."""
+        for i in range(1000):
+            app.processEvents()
+            if not ( win.frametimer.isActive() or win.framewaiting or
+                     win.rendercontrol.isBusy() ):
+                break
+            time.sleep(0.01)
+        for i in range(10):
+            app.processEvents()
+
+    out = open(outfile, 'w')
+    def report(title):
+        print('%s: recorded=%i frame scheduled=%s waiting=%s' % (
+                title, len(recorded), win.frametimer.isActive(),
+                win.framewaiting), file=out)
+        del recorded[:]
+
+    runEvents()
+    report('initial')
+
+    for i in range(20):
+        ifc.SetData('x', [1, 2, i])
+    report('after changes without events')
+    runEvents()
+    report('after events')
+    print('frame interval in range:',
+          win.minframeinterval <= win.frameinterval <=
+          win.maxframeinterval, file=out)
+
+    # pretend rendering is still in progress
+    win.rendercontrol.pending += 1
+    ifc.Set('xy1/marker', 'square')
+    for i in range(1000):
+        app.processEvents()
+        if not win.frametimer.isActive():
+            break
+        time.sleep(0.01)
+    report('changed while rendering')
+    win.rendercontrol.pending -= 1
+    win.rendercontrol.sigQueueChange.emit(-1)
+    report('rendering finished')
+    runEvents()
+    report('after events')
+
+    win.setTimeout(0)
+    ifc.Set('xy1/marker', 'circle')
+    runEvents()
+    report('never updating')
+
+    win.rendercontrol.exitThreads()
+    out.close()
+
+if __name__ == '__main__':
+    main(sys.argv[1])
@@ -0,0 +1,124 @@
+"""Check converting CSV values column-by-column gives the same
+datasets as converting them value-by-value.
+
+Writes a report to the output file, which is compared with the
+expected output.
+"""
+
+from __future__ import print_function
+import os.path
+import shutil
+import sys
+import tempfile
+
+import numpy as N
+
+import veusz.qtall as qt4
+import veusz.dataimport.defn_csv as defn_csv
+import veusz.dataimport.readcsv as readcsv
+
+class ValueReadCSV(readcsv.ReadCSV):
+    """Reader which converts every value individually."""
+    def _readRun(self, cols, start, end):
+        return 0
+
+def read(readerclass, params, chunklines):
+    """Read file, returning dict of datasets."""
+    reader = readerclass(params)
+    reader.chunklines = chunklines
+    reader.readData()
+    out = {}
+    reader.setData(out)
+    return out
+
+def sameValues(a, b):
+    """Are values the same (treating nans as equal)?"""
+    if a is None or b is None:
+        return a is None and b is None
+    if isinstance(a, N.ndarray) and isinstance(b, N.ndarray):
+        return a.shape == b.shape and N.all(
+            (a == b) | (N.isnan(a) & N.isnan(b)))
+    return list(a) == list(b)
+
+def sameDatasets(out1, out2):
+    """Are the datasets read the same?"""
+    if sorted(out1) != sorted(out2):
+        return False
+    for name in out1:
+        ds1, ds2 = out1[name], out2[name]
+        if ds1.__class__ is not ds2.__class__:
+            return False
+        for attr in ('data', 'serr', 'perr', 'nerr'):
+            if not sameValues(getattr(ds1, attr, None),
+                              getattr(ds2, attr, None)):
+                return False
+    return True
+
+def isNumeric(ds):
+    return isinstance(ds.data, N.ndarray) and ds.data.dtype.kind == 'f'
+
+def check(out, tempdir, title, text, show=(), chunklines=65536, **params):
+    """Read text as a CSV file using column-by-column and
+    value-by-value conversion and compare."""
+    filename = os.path.join(tempdir, 'data.csv')
+    with open(filename, 'w') as f:
+        f.write(text)
+    params = defn_csv.ImportParamsCSV(filename=filename, **params)
+
+    colout = read(readcsv.ReadCSV, params, chunklines)
+    valout = read(ValueReadCSV, params, chunklines)
+
+    print('%s: datasets=%s same data=%s' % (
+            title, ','.join(sorted(colout)),
+            sameDatasets(colout, valout)), file=out)
+    print(' invalid values: %s' % ' '.join(
+            ['%s=%i' % (n, N.isnan(colout[n].data).sum())
+             for n in sorted(colout) if isNumeric(colout[n])]), file=out)
+    for name in show:
+        print(' %s: %s' % (name, ' '.join(
+                    ['%g' % v for v in colout[name].data])), file=out)
+
+def main(outfile):
+    app = qt4.QApplication([])
+
+    tempdir = tempfile.mkdtemp()
+    out = open(outfile, 'w')
+    try:
+        check(out, tempdir, 'numbers', 'x,y\n1,2\n3,4\n5,6\n', show=('x',))
+        check(out, tempdir, 'invalid value starting dataset',
+              'x,y\n1,2\n3,bad\n5,6\n', show=('y', 'bad'))
+        check(out, tempdir, 'invalid value with first row header',
+              'x,y\n1,2\n3,bad\n5,6\n', show=('y',), headermode='1st')
+        check(out, tempdir, 'blanks', 'x,y\n1,\n,4\n5,6\n', show=('x', 'y'))
+        check(out, tempdir, 'blanks are data', 'x,y\n1,\n,4\n5,6\n',
+              show=('x', 'y'), blanksaredata=True)
+        check(out, tempdir, 'dates and text',
+              'd,t\n2020-01-01,a\n2020-01-02,"b,c"\n')
+        check(out, tempdir, 'locale', 'x;y\n1,5;2\n3,25;4\n',
+              show=('x',), delimiter=';', numericlocale='de_DE')
+        check(out, tempdir, 'error bars',
+              'x,+-,y,+,-\n1,0.1,2,0.2,0.3\n3,0.1,4,0.2,0.3\n')
+        check(out, tempdir, 'short rows', 'a,b,c\n1,2,3\n4\n5,6\n',
+              show=('a', 'b', 'c'))
+        check(out, tempdir, 'columns with same name', 'x,x\n1,2\n3,4\n',
+              show=('x',))
+        check(out, tempdir, 'rows', 'x,1,2,3\ny,4,5,6\n',
+              show=('x', 'y'), readrows=True)
+
+        lines = ['x,y,z\n']
+        for i in range(5000):
+            if i % 101 == 50:
+                y = 'bad'
+            elif i % 333 == 0:
+                y = '%ie-300' % i
+            else:
+                y = '%g' % (i*0.5)
+            lines.append('%i,%s,r%i\n' % (i, y, i))
+        check(out, tempdir, 'large', ''.join(lines), chunklines=1000,
+              headermode='1st')
+    finally:
+        out.close()
+        shutil.rmtree(tempdir)
+
+if __name__ == '__main__':
+    main(sys.argv[1])
@@ -0,0 +1,65 @@
+"""Check resampling images with non-linear pixel edges onto a linear
+grid for drawing.
+
+Writes a report to the output file, which is compared with the
+expected output.
+"""
+
+from __future__ import print_function
+import sys
+
+import numpy as N
+
+from veusz.widgets.image import resampleGridToBox, clipTransparencyToShape
+
+def fmt(vals):
+    """Format values for output."""
+    return ' '.join(['%g' % v for v in vals])
+
+def resample(out, title, gridx, gridy, posn, **args):
+    """Resample and report results."""
+    res = resampleGridToBox(
+        N.array(gridx, dtype=N.float64), N.array(gridy, dtype=N.float64),
+        posn, **args)
+    if res is None:
+        print('%s: None' % title, file=out)
+        return
+    rangex, rangey, yidx, xidx = res
+    print('%s: xrange=%s yrange=%s' % (
+            title, fmt(rangex), fmt(rangey)), file=out)
+    print(' rows:', fmt(yidx[:,0]), file=out)
+    print(' columns:', fmt(xidx), file=out)
+
+def numPixels(out, title, gridx, posn, **args):
+    """Report the number of output columns."""
+    res = resampleGridToBox(gridx, N.array([0., 1.]), posn, **args)
+    print('%s: columns=%i' % (title, len(res[3])), file=out)
+
+def main(outfile):
+    out = open(outfile, 'w')
+
+    posn = (0., 0., 100., 100.)
+    resample(out, 'irregular', [0, 10, 20, 40], [0, 5, 10], posn)
+    resample(out, 'reversed y', [0, 10, 20, 40], [10, 5, 0], posn)
+    resample(out, 'cropped', [0, 10, 20, 40], [0, 5, 10], (5., 0., 25., 100.))
+    resample(out, 'outside', [0, 10, 20, 40], [0, 5, 10], (50., 0., 100., 100.))
+    resample(out, 'invalid edge', [0, N.nan, 20], [0, 5, 10], posn)
+
+    posn = (0., 0., 1e6, 100.)
+    numPixels(out, 'one per unit', N.linspace(0., 10., 101), posn)
+    numPixels(out, 'zero width pixel', N.array([0., 0., 10.]), posn)
+    numPixels(out, 'high resolution',
+              N.linspace(0., 100000., 1000001), posn)
+    numPixels(out, 'high resolution with maximum',
+              N.linspace(0., 100000., 1000001), posn, maxpixels=100)
+
+    trans = N.zeros((2, 3)) + 0.5
+    print('transparency same shape:',
+          clipTransparencyToShape(trans, (2, 3)) is trans, file=out)
+    for row in clipTransparencyToShape(trans, (3, 2)):
+        print(' transparency row:', fmt(row), file=out)
+
+    out.close()
+
+if __name__ == '__main__':
+    main(sys.argv[1])
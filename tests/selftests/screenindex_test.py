@@ -0,0 +1,94 @@
+"""Check finding the closest screen points to a position using the
+spatial index in the picking code, comparing with a search of all
+the points.
+
+Writes a report to the output file, which is compared with the
+expected output.
+"""
+
+from __future__ import print_function
+import sys
+
+import numpy as N
+
+from veusz.widgets.pickable import ScreenIndex
+
+def bruteVisible(xs, ys, bounds):
+    """Indices of finite points inside bounds."""
+    with N.errstate(invalid='ignore'):
+        return N.flatnonzero(
+            N.isfinite(xs) & N.isfinite(ys) &
+            (xs >= bounds[0]) & (xs <= bounds[2]) &
+            (ys >= bounds[1]) & (ys <= bounds[3]) )
+
+def bruteNearest(dist, vis):
+    """Lowest index of closest point, given distances of visible
+    points."""
+    if len(vis) == 0:
+        return None, N.inf
+    mindist = dist.min()
+    return vis[dist == mindist].min(), mindist
+
+def compare(out, title, xs, ys, bounds, queries):
+    """Compare index and brute force searches at query positions."""
+    index = ScreenIndex(xs, ys, bounds)
+    vis = bruteVisible(xs, ys, bounds)
+    vx, vy = xs[vis], ys[vis]
+
+    along = radial = True
+    for x0, y0 in queries:
+        along = along and (
+            index.nearestAlong('x', x0) ==
+            bruteNearest(N.abs(vx-x0), vis) and
+            index.nearestAlong('y', y0) ==
+            bruteNearest(N.abs(vy-y0), vis) )
+        radial = radial and (
+            index.nearestRadial(x0, y0) ==
+            bruteNearest(N.sqrt((vx-x0)**2 + (vy-y0)**2), vis) )
+    print('%s: visible=%s along matches=%s radial matches=%s' % (
+            title, len(index.visidx) == len(vis), along, radial), file=out)
+
+def fmtResult(res):
+    return '%s %g' % res
+
+def main(outfile):
+    out = open(outfile, 'w')
+
+    bounds = (0., 0., 10., 10.)
+    xs = N.array([5., 1., N.nan, 3., 1., 20.])
+    ys = N.array([5., 2., 1., 3., 2., 1.])
+    index = ScreenIndex(xs, ys, bounds)
+    print('visible:', ' '.join(['%i' % i for i in index.visidx]), file=out)
+    print('along x 1.2:', fmtResult(index.nearestAlong('x', 1.2)), file=out)
+    print('along y 4.5:', fmtResult(index.nearestAlong('y', 4.5)), file=out)
+    print('radial 2,2:', fmtResult(index.nearestRadial(2., 2.)), file=out)
+    print('radial 30,30 (outside):',
+          index.nearestRadial(30., 30.)[0], file=out)
+    print('next visible:', index.nextVisible(2, 1), index.nextVisible(2, -1),
+          index.nextVisible(5, 1), index.nextVisible(0, -1), file=out)
+
+    empty = ScreenIndex(N.array([]), N.array([]), bounds)
+    print('empty:', fmtResult(empty.nearestAlong('x', 1.)),
+          fmtResult(empty.nearestRadial(1., 1.)), file=out)
+
+    rand = N.random.RandomState(1)
+    bounds = (0., 0., 100., 100.)
+    queries = rand.uniform(-20., 120., size=(200, 2))
+
+    xs = rand.uniform(-10., 110., 5000)
+    ys = rand.uniform(-10., 110., 5000)
+    xs[::17] = N.nan
+    compare(out, 'uniform', xs, ys, bounds, queries)
+
+    xs = rand.normal(20., 2., 5000)
+    ys = rand.normal(70., 2., 5000)
+    compare(out, 'clustered', xs, ys, bounds, queries)
+
+    xs = N.repeat(rand.uniform(0., 100., 50), 20)
+    ys = N.repeat(rand.uniform(0., 100., 50), 20)
+    compare(out, 'repeated points', xs, ys, bounds, queries)
+
+    out.close()
+
+if __name__ == '__main__':
+    main(sys.argv[1])
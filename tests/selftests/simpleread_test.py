@@ -0,0 +1,121 @@
+"""Check the fast numeric reader for standard text imports gives the
+same datasets and invalid conversion counts as reading line by line.
+
+Writes a report to the output file, which is compared with the
+expected output.
+"""
+
+from __future__ import print_function
+import sys
+
+import numpy as N
+
+import veusz.dataimport.simpleread as simpleread
+
+class LineStringStream(simpleread.StringStream):
+    """Stream which does not support reading chunks of lines, so is
+    read line by line."""
+    def readLines(self, num):
+        return None
+
+def read(streamclass, text, descriptor, ignoretext, chunklines):
+    """Read text, returning datasets, invalid conversions and whether
+    the fast reader converted any lines."""
+    reader = simpleread.SimpleRead(descriptor)
+    reader.chunklines = chunklines
+    fast = []
+    storenumeric = reader._storeNumeric
+    def store(*args):
+        fast.append(True)
+        storenumeric(*args)
+    reader._storeNumeric = store
+
+    reader.readData(streamclass(text), ignoretext=ignoretext)
+    out = {}
+    reader.setOutput(out)
+    return out, reader.getInvalidConversions(), bool(fast)
+
+def sameValues(a, b):
+    """Are values the same (treating nans as equal)?"""
+    if a is None or b is None:
+        return a is None and b is None
+    if isinstance(a, N.ndarray) and isinstance(b, N.ndarray):
+        return a.shape == b.shape and N.all(
+            (a == b) | (N.isnan(a) & N.isnan(b)))
+    return list(a) == list(b)
+
+def sameDatasets(out1, out2):
+    """Are the datasets read the same?"""
+    if sorted(out1) != sorted(out2):
+        return False
+    for name in out1:
+        ds1, ds2 = out1[name], out2[name]
+        if ds1.__class__ is not ds2.__class__:
+            return False
+        for attr in ('data', 'serr', 'perr', 'nerr'):
+            if not sameValues(getattr(ds1, attr, None),
+                              getattr(ds2, attr, None)):
+                return False
+    return True
+
+def check(out, title, text, descriptor='', ignoretext=False,
+          chunklines=16384, show=(), showfast=False):
+    """Read text using the fast and line by line readers and
+    compare."""
+    fastout, fastinvalid, fast = read(
+        simpleread.StringStream, text, descriptor, ignoretext, chunklines)
+    lineout, lineinvalid, linefast = read(
+        LineStringStream, text, descriptor, ignoretext, chunklines)
+
+    print('%s: datasets=%s same data=%s' % (
+            title, ','.join(sorted(fastout)),
+            sameDatasets(fastout, lineout)), file=out)
+    print(' invalid=%s same invalid=%s' % (
+            ' '.join(['%s=%i' % (n, fastinvalid[n])
+                      for n in sorted(fastinvalid)]),
+            fastinvalid == lineinvalid), file=out)
+    for name in show:
+        print(' %s: %s' % (name, ' '.join(
+                    ['%g' % v for v in fastout[name].data])), file=out)
+    if showfast:
+        print(' fast reader used:', fast, 'line reader fast:', linefast,
+              file=out)
+
+def main(outfile):
+    out = open(outfile, 'w')
+
+    check(out, 'numbers', '1 2\n3 4\n\n5 6\n', 'x y', show=('x', 'y'),
+          showfast=True)
+    check(out, 'invalid values', '1 2\n3 bad\nfoo 4\n5 1e\n', 'x y',
+          show=('x', 'y'))
+    check(out, 'comments and continuations',
+          '1 2 # c\n3 \\\n4\n! comment\n5 6\n', 'x y', show=('x', 'y'))
+    check(out, 'error bars', '1 0.1 2 0.2 0.3\n2 0.1 3 0.2 0.3\n',
+          'x,+- y,+,-')
+    check(out, 'descriptor change', '1\n2\ndescriptor a b\n3 4\n', 'x')
+    check(out, 'text column', "1 'a'\n2 b\n", 'x y(text)')
+    check(out, 'ignore text', '1 2\nHeader line\n3 4\n', 'x y',
+          ignoretext=True, show=('x',))
+    check(out, 'automatic names', '1 2 3\n4 5 6\n')
+    check(out, 'varying columns', '1 2\n3 4 5\n')
+    check(out, 'continuations across chunks',
+          '1 \\\n2\n3 4\n5 \\\n6\n7 8\n', 'x y', chunklines=2,
+          show=('x', 'y'))
+
+    lines = []
+    for i in range(2000):
+        if i % 89 == 0:
+            lines.append('\n')
+        if i % 97 == 0:
+            lines.append('# comment\n')
+        if i % 101 == 50:
+            lines.append('%i bad\n' % i)
+        else:
+            lines.append('%i %g\n' % (i, i*0.5))
+    check(out, 'large', ''.join(lines), 'x y', chunklines=64,
+          showfast=True)
+
+    out.close()
+
+if __name__ == '__main__':
+    main(sys.argv[1])
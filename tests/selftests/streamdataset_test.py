@@ -0,0 +1,59 @@
+"""Check appending values to streaming datasets.
+
+Writes a report to the output file, which is compared with the
+expected output.
+"""
+
+from __future__ import print_function
+import sys
+
+import numpy as N
+
+import veusz.qtall as qt4
+import veusz.datasets as datasets
+
+def fmt(vals):
+    """Format values for output."""
+    if vals is None:
+        return 'None'
+    return ' '.join(['%g' % v for v in vals])
+
+def testStream(out):
+    print('DatasetStream', file=out)
+
+    ds = datasets.DatasetStream(columns=('data', 'serr'), maxlength=5000)
+    ds.append([1, 2, 3], serr=[0.5, 0.5, 0.5])
+    first = ds.data
+    print(' data:', fmt(first), file=out)
+    print(' serr:', fmt(ds.serr), file=out)
+    print(' writeable:', first.flags.writeable, file=out)
+
+    for i in range(100):
+        ds.append(N.arange(30)+i, serr=N.ones(30))
+    print(' length:', len(ds), file=out)
+    print(' last:', fmt(ds.data[-3:]), file=out)
+    print(' earlier view unchanged:', fmt(first), file=out)
+
+    for i in range(3):
+        ds.append(N.arange(2000), serr=N.ones(2000))
+    print(' length at maxlength:', len(ds), file=out)
+    print(' first kept:', fmt(ds.data[:2]), file=out)
+
+    try:
+        ds.append([1, 2])
+    except datasets.DatasetException:
+        print(' missing column: DatasetException', file=out)
+
+    copy = ds.returnCopy()
+    print(' copy type:', copy.__class__.__name__, file=out)
+    print(' copy editable:', copy.editable, file=out)
+
+def main(outfile):
+    app = qt4.QApplication([])
+
+    out = open(outfile, 'w')
+    testStream(out)
+    out.close()
+
+if __name__ == '__main__':
+    main(sys.argv[1])
@@ -46,6 +46,7 @@ if cpy3:
 
     # zip function
     czip = zip
+    czip_longest = itertools.zip_longest
 
     # function to create user strings
     cstr = str
@@ -121,6 +122,7 @@ else:
 
     # zip function
     czip = itertools.izip
+    czip_longest = itertools.izip_longest
 
     # function to create user strings
     cstr = unicode
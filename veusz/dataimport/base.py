@@ -19,14 +19,69 @@
 """Parameters for import routines."""
 
 from __future__ import division, print_function
+import os
 import sys
+import threading
 
 from ..compat import citems, cstr
+from .. import qtall as qt4
 from .. import utils
 
+def _(text, disambiguation=None, context="Import"):
+    """Translate text."""
+    return qt4.QCoreApplication.translate(context, text, disambiguation)
+
 class ImportingError(RuntimeError):
     """Common error when import fails."""
 
+class ImportCancelled(ImportingError):
+    """Import was cancelled by the user."""
+
+class ImportProgress(object):
+    """Progress of an import, which may be read and cancelled from
+    another thread.
+
+    Readers call update() as they read the file, which raises
+    ImportCancelled if cancel() has been called.
+
+    Attributes:
+     rows: number of rows (or lines) read
+     bytesread: number of bytes read, if known
+     bytestotal: size of file in bytes, if known
+     cancelled: whether the import has been cancelled
+     callback: optional function called with self on update (called
+       in the thread doing the import)
+    """
+
+    def __init__(self, callback=None):
+        self.rows = 0
+        self.bytesread = None
+        self.bytestotal = None
+        self.cancelled = False
+        self.callback = callback
+
+    def cancel(self):
+        """Ask the import to stop."""
+        self.cancelled = True
+
+    def update(self, rows=0, bytesread=None):
+        """Add rows to the number of rows read and update the number
+        of bytes read."""
+
+        if self.cancelled:
+            raise ImportCancelled(_('Import cancelled'))
+        self.rows += rows
+        if bytesread is not None:
+            self.bytesread = bytesread
+        if self.callback is not None:
+            self.callback(self)
+
+    def fraction(self):
+        """Fraction of the file read, or None if not known."""
+        if self.bytesread is None or not self.bytestotal:
+            return None
+        return min(1., self.bytesread / self.bytestotal)
+
 class ImportParamsBase(object):
     """Import parameters for the various imports.
 
@@ -185,26 +240,33 @@ class LinkedFileBase(object):
                 document.setData(outname, ds)
         return read
 
-    def reloadLinks(self, document):
-        """Reload links using an operation"""
+    def createReloadOperation(self):
+        """Return operation to reload the linked datasets."""
+        return self.createOperation()(self.params)
+
+    # number of times the datasets have been reloaded
+    reloads = 0
+
+    def readLinks(self, document):
+        """Read the linked datasets into a temporary document, without
+        modifying document, so that this can be done in another thread.
+
+        Returns (tempdoc, operation) to pass to applyReadLinks.
+        """
 
         # get the operation for reloading
-        op = self.createOperation()(self.params)
+        op = self.createReloadOperation()
 
         # load data into a temporary document
         tempdoc = document.__class__()
+        tempdoc.applyOperation(op)
+        return tempdoc, op
 
-        try:
-            tempdoc.applyOperation(op)
-        except Exception as ex:
-            # if something breaks, record an error and return nothing
-            document.log(cstr(ex))
+    def applyReadLinks(self, document, tempdoc, op):
+        """Replace the linked datasets in document by those read by
+        readLinks. Returns (read datasets, errors)."""
 
-            # find datasets which are linked using this link object
-            # return errors for them
-            errors = dict([(name, 1) for name, ds in citems(document.data)
-                           if ds.linked is self])
-            return ([], errors)
+        self.reloads += 1
 
         # delete datasets which are linked and imported here
         tags = self._deleteLinkedDatasets(document)
@@ -216,17 +278,73 @@ class LinkedFileBase(object):
 
         return (read, errors)
 
+    def readLinksError(self, document, ex):
+        """Record error ex when reading the linked datasets.
+        Returns (read datasets, errors) with an error for each."""
+
+        document.log(cstr(ex))
+
+        # find datasets which are linked using this link object
+        # return errors for them
+        errors = dict([(name, 1) for name, ds in citems(document.data)
+                       if ds.linked is self])
+        return ([], errors)
+
+    def reloadLinks(self, document):
+        """Reload links using an operation"""
+
+        try:
+            tempdoc, op = self.readLinks(document)
+        except Exception as ex:
+            # if something breaks, record an error and return nothing
+            return self.readLinksError(document, ex)
+
+        return self.applyReadLinks(document, tempdoc, op)
+
 class OperationDataImportBase(object):
     """Default useful import class."""
 
     def __init__(self, params):
         self.params = params
+        self.progress = ImportProgress()
+        self.prepared = False
 
     def doImport(self, document):
         """Do import, override this.
         Set outdatasets
         """
 
+    def _clearOutputs(self):
+        """Reset the outputs of the import."""
+
+        # list of returned dataset names
+        self.outnames = []
+        # map of names to datasets
+        self.outdatasets = {}
+        # list of returned custom variables
+        self.outcustoms = []
+        # invalid conversions
+        self.outinvalids = {}
+
+    def prepare(self):
+        """Read the data, without modifying the document.
+
+        This can be called in a separate thread before the operation
+        is applied to the document. ImportCancelled is raised if
+        self.progress is cancelled.
+        """
+
+        self._clearOutputs()
+        filename = getattr(self.params, 'filename', None)
+        if filename and filename != '{clipboard}':
+            try:
+                self.progress.bytestotal = os.path.getsize(filename)
+            except (EnvironmentError, TypeError):
+                pass
+
+        self.retn = self.doImport()
+        self.prepared = True
+
     def addCustoms(self, document, customs):
         """Optionally, add the customs return by plugins to document."""
 
@@ -245,20 +363,15 @@ class OperationDataImportBase(object):
     def do(self, document):
         """Do import."""
 
-        # list of returned dataset names
-        self.outnames = []
-        # map of names to datasets
-        self.outdatasets = {}
-        # list of returned custom variables
-        self.outcustoms = []
-        # invalid conversions
-        self.outinvalids = {}
-
         # remember datasets in document for undo
         self.oldconst = None
 
-        # do actual import
-        retn = self.doImport()
+        # do actual import, unless already done by prepare()
+        if not self.prepared:
+            self.prepare()
+        retn = self.retn
+        # read the file again if redone
+        self.prepared = False
 
         # these are custom values returned from the plugin
         if self.outcustoms:
@@ -299,3 +412,64 @@ class OperationDataImportBase(object):
         if self.oldconst is not None:
             document.evaluate.customs = self.oldconst
             document.evaluate.update()
+
+class AsyncImport(object):
+    """Read the data for an import operation in a separate thread.
+
+    The progress of the import can be checked using the progress
+    attribute (an ImportProgress) and the import cancelled with
+    cancel(). When done, apply() applies the operation to the
+    document, so the datasets are all added in one undoable step.
+    """
+
+    def __init__(self, document, op):
+        self.document = document
+        self.op = op
+        self.progress = op.progress
+        self.exception = None
+        self.applied = False
+
+        if getattr(op.params, 'filename', None) == '{clipboard}':
+            # the clipboard can only be read in the main thread
+            self.thread = None
+            self._run()
+        else:
+            self.thread = threading.Thread(target=self._run)
+            self.thread.daemon = True
+            self.thread.start()
+
+    def _run(self):
+        try:
+            self.op.prepare()
+        except Exception as ex:
+            self.exception = ex
+
+    def isDone(self):
+        """Has reading finished?"""
+        return self.thread is None or not self.thread.is_alive()
+
+    def wait(self, timeout=None):
+        """Wait for reading to finish, or until timeout (in seconds).
+        Returns whether it has finished."""
+        if self.thread is not None:
+            self.thread.join(timeout)
+        return self.isDone()
+
+    def cancel(self):
+        """Stop reading the data."""
+        self.progress.cancel()
+
+    def apply(self):
+        """Wait for reading to finish, then apply the operation to the
+        document. Raises any exception from reading.
+
+        Returns a list of the names of the datasets imported.
+        """
+
+        self.wait()
+        if self.exception is not None:
+            raise self.exception
+        if not self.applied:
+            self.applied = True
+            self.document.applyOperation(self.op)
+        return self.op.outnames
@@ -17,15 +17,21 @@
 ##############################################################################
 
 from __future__ import division
+import codecs
+import collections
 import select
 import subprocess
 import os
 import socket
 import platform
 import signal
+import struct
 
-from ..compat import cstr
+import numpy as N
+
+from ..compat import cstr, citems, czip, crange
 from .. import qtall as qt4
+from .. import datasets
 from .. import utils
 from . import simpleread
 
@@ -42,7 +48,10 @@ class CaptureStream(simpleread.Stream):
         """Initialise the stream."""
 
         simpleread.Stream.__init__(self)
+        # incomplete last line read
         self.buffer = ''
+        # complete lines waiting to be returned
+        self.lines = collections.deque()
         self.continuousreads = 0
         self.bytesread = 0
         self.linesread = 0
@@ -84,14 +93,11 @@ class CaptureStream(simpleread.Stream):
                 self.continuousreads = 0
                 raise StopIteration
 
-            index = self.buffer.find('\n')
-            if index >= 0:
+            if self.lines:
                 # is there a line in the buffer?
-                retn = self.buffer[:index]
-                self.buffer = self.buffer[index+1:]
                 self.linesread += 1
                 self.continuousreads += 1
-                return retn
+                return self.lines.popleft()
             else:
                 # if not, then read some more data
                 data = self.getMoreData()
@@ -100,7 +106,13 @@ class CaptureStream(simpleread.Stream):
                     self.continuousreads = 0
                     raise StopIteration
                 self.bytesread += len(data)
-                self.buffer += data
+                self._addData(data)
+
+    def _addData(self, data):
+        """Split data read into lines, keeping any incomplete line."""
+        lines = (self.buffer + data).split('\n')
+        self.buffer = lines.pop()
+        self.lines.extend(lines)
 
     def close(self):
         """Close any allocated object."""
@@ -109,15 +121,15 @@ class CaptureStream(simpleread.Stream):
 class FileCaptureStream(CaptureStream):
     """Capture from a file or named pipe."""
 
-    def __init__(self, filename):
+    def __init__(self, filename, binary=False):
         CaptureStream.__init__(self)
 
         # open file
-        self.fileobj = open(filename, 'rU')
+        self.fileobj = open(filename, 'rb' if binary else 'rU')
 
         # make new thread to read file
         self.readerthread = utils.NonBlockingReaderThread(
-            self.fileobj, exiteof=False)
+            self.fileobj, exiteof=False, binary=binary)
         self.readerthread.start()
 
         self.name = filename
@@ -139,17 +151,18 @@ class FileCaptureStream(CaptureStream):
 class CommandCaptureStream(CaptureStream):
     """Capture from an external program."""
 
-    def __init__(self, commandline):
+    def __init__(self, commandline, binary=False):
         """Capture from commandline - this is passed to the shell."""
         CaptureStream.__init__(self)
 
         self.name = commandline
         self.popen = subprocess.Popen(commandline, shell=True,
                                       bufsize=0, stdout=subprocess.PIPE,
-                                      universal_newlines=True)
+                                      universal_newlines=not binary)
 
         # make new thread to read stdout
-        self.readerthread = utils.NonBlockingReaderThread(self.popen.stdout)
+        self.readerthread = utils.NonBlockingReaderThread(
+            self.popen.stdout, binary=binary)
         self.readerthread.start()
 
     def getMoreData(self):
@@ -187,11 +200,14 @@ class CommandCaptureStream(CaptureStream):
 class SocketCaptureStream(CaptureStream):
     """Capture from an internet host."""
 
-    def __init__(self, host, port):
+    def __init__(self, host, port, binary=False):
         """Connect to host and port specified."""
         CaptureStream.__init__(self)
 
         self.name = '%s:%i' % (host, port)
+        self.binary = binary
+        # keep characters split between reads
+        self.decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
         try:
             self.socket = socket.socket( socket.AF_INET,
                                          socket.SOCK_STREAM )
@@ -218,19 +234,315 @@ class SocketCaptureStream(CaptureStream):
         i, o, e = select.select([self.socket], [], [], 0)
         if i:
             try:
-                retn = self.socket.recv(1024)
+                retn = self.socket.recv(65536)
             except socket.error as e:
                 self._handleSocketError(e)
             if len(retn) == 0:
                 raise CaptureFinishException("Remote socket closed")
-            return retn.decode('utf-8', errors='ignore')
+            if self.binary:
+                return retn
+            return self.decoder.decode(retn)
         else:
-            return ''
+            return b'' if self.binary else ''
 
     def close(self):
         """Close the socket."""
         self.socket.close()
 
+class CaptureStore(object):
+    """Datasets holding the data captured so far.
+
+    update() moves the data read by a SimpleRead into the datasets,
+    so the time and memory used by each update only depend on the
+    number of new values. Numerical and date data are appended to
+    DatasetStream datasets, keeping the last maxlength values or
+    values from the last maxage seconds, if set. Text data are
+    appended to the previous values, keeping the last maxlength
+    values.
+    """
+
+    def __init__(self, simplereadobject, maxlength=None, maxage=None,
+                 prefix=''):
+        self.simpleread = simplereadobject
+        # prefix for names of output datasets
+        self.prefix = prefix
+        self.maxlength = maxlength
+        self.maxage = maxage
+        # output datasets
+        self.datasets = {}
+        # streams holding values of date datasets
+        self.datestreams = {}
+        # total number of values read for each dataset
+        self.counts = {}
+
+    def read(self, stream):
+        """Read data waiting in stream into the datasets."""
+        try:
+            self.simpleread.readData(stream)
+        finally:
+            self.update()
+
+    def update(self):
+        """Move the data read so far to the datasets."""
+
+        readdata = {}
+        self.simpleread.setOutput(readdata, prefix=self.prefix)
+        self.simpleread.datasets.clear()
+
+        for name, ds in citems(readdata):
+            self.counts[name] = self.counts.get(name, 0) + len(ds.data)
+
+            old = self.datasets.get(name)
+            if type(ds) is datasets.Dataset:
+                cols = [c for c in ds.columns if getattr(ds, c) is not None]
+                if ( not isinstance(old, datasets.DatasetStream) or
+                     old.streamcolumns != tuple(cols) ):
+                    old = self.datasets[name] = datasets.DatasetStream(
+                        columns=cols, maxlength=self.maxlength,
+                        maxage=self.maxage)
+                old.append(ds.data, serr=ds.serr, perr=ds.perr, nerr=ds.nerr)
+
+            elif isinstance(ds, datasets.DatasetDateTime):
+                stream = self.datestreams.get(name)
+                if stream is None:
+                    stream = self.datestreams[name] = datasets.DatasetStream(
+                        maxlength=self.maxlength, maxage=self.maxage)
+                stream.append(ds.data)
+                # wraps the values in the stream without copying
+                self.datasets[name] = datasets.DatasetDateTime(
+                    data=stream.data)
+
+            elif old is not None and type(old) is type(ds):
+                # add to previous text values
+                old.appendValues(ds.data)
+                if ( self.maxlength is not None and
+                     len(old.data) > self.maxlength ):
+                    del old.data[:-self.maxlength]
+
+            else:
+                self.datasets[name] = ds
+
+    def getDatasetCounts(self):
+        """Get a dict of the datasets and total number of values read,
+        including those not yet moved to the datasets."""
+
+        out = dict(self.counts)
+        for name, num in citems(self.simpleread.getDatasetCounts()):
+            name = self.prefix + name
+            out[name] = out.get(name, 0) + num
+        return out
+
+    def setOutput(self, out):
+        """Set the datasets in the out dict."""
+        out.update(self.datasets)
+
+class FrameDecoder(object):
+    """Decode frames of binary data.
+
+    Each frame is a header, followed by the dataset name encoded as
+    UTF-8, then the values of each column of the dataset one after
+    another, as little-endian arrays. The header is packed with the
+    struct format '<4scBHI', containing:
+
+     magic: b'VZF1'
+     dtype: numpy type character of the values (e.g. b'd' for 64 bit
+       floats, b'f' for 32 bit floats, b'h' for 16 bit ints)
+     ncols: number of columns: 1 (data), 2 (data and symmetric
+       errors) or 3 (data, positive errors and negative errors)
+     namelen: length of name in bytes
+     count: number of values in each column
+    """
+
+    header = struct.Struct('<4scBHI')
+    magic = b'VZF1'
+    columns = {
+        1: ('data',),
+        2: ('data', 'serr'),
+        3: ('data', 'perr', 'nerr'),
+        }
+
+    def __init__(self):
+        # bytes which have not been decoded
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        """Add bytes read."""
+        self.buffer += data
+
+    def frames(self):
+        """Decode the complete frames read so far.
+
+        Returns a list of (name, columns, values), where columns are
+        the names of the columns and values a 2D float64 array with a
+        row for each column.
+        """
+
+        buf = self.buffer
+        hsize = self.header.size
+        out = []
+        pos = 0
+        while len(buf) - pos >= hsize:
+            magic, dtype, ncols, namelen, count = self.header.unpack_from(
+                buf, pos)
+            if magic != self.magic or ncols not in self.columns:
+                raise CaptureFinishException("Invalid binary data frame")
+            try:
+                dt = N.dtype('<' + dtype.decode('ascii'))
+            except (TypeError, UnicodeDecodeError):
+                raise CaptureFinishException("Invalid binary data type")
+            if dt.kind not in 'iuf':
+                raise CaptureFinishException("Invalid binary data type")
+
+            size = hsize + namelen + ncols*count*dt.itemsize
+            if len(buf) - pos < size:
+                # frame not complete
+                break
+
+            start = pos + hsize
+            name = bytes(buf[start:start+namelen]).decode('utf-8', 'ignore')
+            vals = N.frombuffer(
+                buf, dtype=dt, count=ncols*count,
+                offset=start+namelen).astype(N.float64)
+            out.append( (name, self.columns[ncols], vals.reshape(ncols, count)) )
+            pos += size
+
+        # remove decoded frames
+        del buf[:pos]
+        return out
+
+class BinaryCaptureStore(object):
+    """Datasets holding data captured from a stream of binary frames
+    (see FrameDecoder).
+
+    The values are appended to DatasetStream datasets, keeping the
+    last maxlength values or values from the last maxage seconds, if
+    set. The stream should be opened in binary mode.
+    """
+
+    # maximum number of reads from stream at a time
+    maxreads = 100
+
+    def __init__(self, maxlength=None, maxage=None, prefix=''):
+        self.maxlength = maxlength
+        self.maxage = maxage
+        self.prefix = prefix
+        self.decoder = FrameDecoder()
+        # output datasets
+        self.datasets = {}
+        # total number of values read for each dataset
+        self.counts = {}
+
+    def read(self, stream):
+        """Read data waiting in stream into the datasets."""
+
+        try:
+            for i in crange(self.maxreads):
+                if stream.timedout:
+                    raise CaptureFinishException(
+                        "Maximum time period occurred")
+                data = stream.getMoreData()
+                if not data:
+                    break
+                stream.bytesread += len(data)
+                self.decoder.feed(data)
+        finally:
+            self._addFrames(stream, self.decoder.frames())
+
+    def _addFrames(self, stream, frames):
+        """Append the values from the frames decoded."""
+
+        for name, columns, vals in frames:
+            name = self.prefix + name
+            ds = self.datasets.get(name)
+            if ds is None or ds.streamcolumns != columns:
+                ds = self.datasets[name] = datasets.DatasetStream(
+                    columns=columns, maxlength=self.maxlength,
+                    maxage=self.maxage)
+            ds.append(**dict(czip(columns, vals)))
+            self.counts[name] = self.counts.get(name, 0) + vals.shape[1]
+            stream.linesread += vals.shape[1]
+
+        if stream.maxlines is not None and stream.linesread >= stream.maxlines:
+            raise CaptureFinishException("Maximum number of values read")
+
+    def getDatasetCounts(self):
+        """Get a dict of the datasets and number of values read."""
+        return dict(self.counts)
+
+    def setOutput(self, out):
+        """Set the datasets in the out dict."""
+        out.update(self.datasets)
+
+class CaptureSession(object):
+    """Capture from several streams at the same time, reading the data
+    from each stream into its own CaptureStore (or BinaryCaptureStore)."""
+
+    def __init__(self):
+        self.streams = []
+        self.stores = []
+        # whether each stream is still being read
+        self.active = []
+
+    def addSource(self, stream, store):
+        """Capture from stream, putting the data in store."""
+        self.streams.append(stream)
+        self.stores.append(store)
+        self.active.append(True)
+
+    @property
+    def name(self):
+        """Names of streams."""
+        return ', '.join([stream.name for stream in self.streams])
+
+    @property
+    def bytesread(self):
+        """Total number of bytes read."""
+        return sum([stream.bytesread for stream in self.streams])
+
+    def read(self):
+        """Read data waiting in the streams.
+
+        Returns a list of messages for the streams which have finished.
+        """
+
+        messages = []
+        for i, (stream, store) in enumerate(czip(self.streams, self.stores)):
+            if not self.active[i]:
+                continue
+            try:
+                store.read(stream)
+            except CaptureFinishException as e:
+                self.active[i] = False
+                stream.close()
+                if len(self.streams) == 1:
+                    messages.append(cstr(e))
+                else:
+                    messages.append('%s: %s' % (stream.name, cstr(e)))
+        return messages
+
+    def isFinished(self):
+        """Have all the streams finished?"""
+        return not any(self.active)
+
+    def close(self):
+        """Close streams still being read."""
+        for i, stream in enumerate(self.streams):
+            if self.active[i]:
+                self.active[i] = False
+                stream.close()
+
+    def getDatasetCounts(self):
+        """Get a dict of the datasets and number of values read."""
+        out = {}
+        for store in self.stores:
+            out.update(store.getDatasetCounts())
+        return out
+
+    def setOutput(self, out):
+        """Set the datasets in the out dict."""
+        for store in self.stores:
+            store.setOutput(out)
+
 class OperationDataCaptureSet(object):
     """An operation for setting the results from a SimpleRead into the
     document's data from a data capture.
@@ -240,9 +552,16 @@ class OperationDataCaptureSet(object):
 
     descr = _('data capture')
 
-    def __init__(self, simplereadobject):
-        """Takes a simpleread object containing the data to be set."""
+    def __init__(self, simplereadobject, final=False):
+        """Takes a simpleread object (or CaptureStore or
+        CaptureSession) containing the data to be set.
+
+        If final is set, the capture has finished, so copies of the
+        datasets are set, converting streaming datasets to normal
+        editable datasets.
+        """
         self.simplereadobject = simplereadobject
+        self.final = final
 
     def do(self, doc):
         """Set the data in the document."""
@@ -250,6 +569,9 @@ class OperationDataCaptureSet(object):
         # set the data to the document and keep a list of what's changed
         readdata = {}
         self.simplereadobject.setOutput(readdata)
+        if self.final:
+            readdata = dict(
+                (name, ds.returnCopy()) for name, ds in citems(readdata))
 
         # keep a copy of datasets which have changed from backup
         self.nameschanged = list(readdata)
@@ -22,6 +22,7 @@ import re
 from .. import qtall as qt4
 from .. import document
 from . import readcsv
+from . import importcache
 from . import base
 
 def _(text, disambiguation=None, context="Import_CSV"):
@@ -41,6 +42,9 @@ class ImportParamsCSV(base.ImportParamsBase):
      numericlocale: name of local for numbers
      dateformat: date format string
      headermode: 'multi', '1st' or 'none'
+     processes: number of processes to read large files with
+                (0 or 1 to read in this process)
+     cache: whether to cache the imported data on disk
     """
 
     defaults = {
@@ -54,6 +58,8 @@ class ImportParamsCSV(base.ImportParamsBase):
         'numericlocale': 'en_US',
         'dateformat': 'YYYY-MM-DD|T|hh:mm:ss',
         'headermode': 'multi',
+        'processes': 0,
+        'cache': False,
         }
     defaults.update(base.ImportParamsBase.defaults)
 
@@ -70,21 +76,40 @@ class OperationDataImportCSV(base.OperationDataImportBase):
     def doImport(self):
         """Do the data import."""
 
+        LF = None
+        if self.params.linked:
+            LF = LinkedFileCSV(self.params)
+
+        # use data from cache, if they have not changed
+        key = None
+        if self.params.cache and self.params.filename != '{clipboard}':
+            key = importcache.cacheKey(self.params)
+            if key is not None:
+                cached = importcache.loadCache(key, linkedfile=LF)
+                if cached is not None:
+                    self.outdatasets.update(cached[0])
+                    self.outinvalids.update(cached[1])
+                    return
+
         try:
             csvr = readcsv.ReadCSV(self.params)
         except re.error:
             # invalid date RE
             raise base.ImportingError(_('Invalid date regular expression'))
+        csvr.progress = self.progress
 
-        csvr.readData()
-
-        LF = None
-        if self.params.linked:
-            LF = LinkedFileCSV(self.params)
+        if self.params.processes > 1:
+            csvr.readDataParallel(self.params.processes)
+        else:
+            csvr.readData()
 
         # set the data in the output structure
         csvr.setData(self.outdatasets, linkedfile=LF)
 
+        if key is not None:
+            importcache.saveCache(key, self.outdatasets,
+                                  invalids=self.outinvalids)
+
 class LinkedFileCSV(base.LinkedFileBase):
     """A CSV file linked to datasets."""
 
@@ -112,7 +137,10 @@ def ImportFileCSV(comm, filename,
                   headermode='multi',
                   dsprefix='', dssuffix='', prefix=None,
                   renames=None,
-                  linked=False):
+                  linked=False,
+                  processes=0,
+                  cache=False,
+                  background=False):
     """Read data from a comma separated file (CSV).
 
     Data are read from filename
@@ -140,6 +168,19 @@ def ImportFileCSV(comm, filename,
 
     If linked is True the data are linked with the file.
 
+    processes is the number of processes to read large files with in
+    parallel. Files are read serially if this is 0 or 1, or if readrows
+    is set.
+
+    If cache is True, the imported data are stored in a cache on disk.
+    They are read from the cache next time, if the file and the import
+    parameters are the same.
+
+    If background is True, the file is read in a separate thread and
+    an id is returned to pass to ImportStatus, ImportWait or
+    ImportCancel. The datasets are added to the document by the event
+    loop when reading has finished, or by ImportWait.
+
     Returns: list of imported datasets
     """
 
@@ -162,8 +203,12 @@ def ImportFileCSV(comm, filename,
         prefix=dsprefix, suffix=dssuffix,
         renames=renames,
         linked=linked,
+        processes=processes,
+        cache=cache,
         )
     op = OperationDataImportCSV(params)
+    if background:
+        return comm.addBackgroundImport(base.AsyncImport(comm.document, op))
     comm.document.applyOperation(op)
 
     if comm.verbose:
@@ -19,11 +19,12 @@
 from __future__ import division, print_function
 
 import collections
+import os
 import re
 
 import numpy as N
 from .. import qtall as qt4
-from ..compat import citems, cvalues, cbytes, cunicode, cpy3
+from ..compat import citems, cvalues, cbytes, cunicode, cpy3, crange
 from .. import document
 from .. import datasets
 from .. import utils
@@ -202,6 +203,81 @@ def convertDatasetToObject(data, slices):
 
     raise _ConvertError(_("HDF5 dataset has an invalid type"))
 
+def slicedShape(shape, slices):
+    """Get shape of data with shape given after applying slicing
+    tuple, without reading it."""
+    if not slices:
+        return tuple(shape)
+    out = []
+    for n, s in zip(shape, slices):
+        if not isinstance(s, int):
+            out.append(len(crange(*slice(*s).indices(n))))
+    return tuple(out)
+
+class _LazyData:
+    """Numeric 1D HDF5 dataset (after slicing) which is read when
+    needed, for lazy importing.
+
+    Only the shape is read when importing. Parts of the data can be
+    read by indexing with a slice. The size and modification time of
+    the file are recorded, so that data are not read from a file
+    which has changed since it was imported.
+    """
+    def __init__(self, filename, path, slices, fullshape):
+        self.filename = filename
+        self.path = path
+        self.fullshape = tuple(fullshape)
+        if not slices:
+            # slice the whole of the 1D dataset
+            slices = [(None, None, None)]
+        self.slices = list(slices)
+        self.shape = slicedShape(fullshape, slices)
+        self.filestat = self._stat()
+
+    def _stat(self):
+        s = os.stat(self.filename)
+        return (s.st_size, s.st_mtime)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def _readSlices(self, slices):
+        """Read the data with the slices given from the file."""
+        inith5py()
+        if self._stat() != self.filestat:
+            raise base.ImportingError(
+                _("HDF5 file '%s' has changed since it was imported. "
+                  "Reload it to read the data.") % self.filename)
+        with h5py.File(self.filename, 'r') as hdff:
+            return convertDatasetToObject(hdff[self.path], slices)
+
+    def read(self):
+        """Read the data from the file."""
+        return self._readSlices(self.slices)
+
+    def __getitem__(self, key):
+        """Read part of the data. Only slices with positive steps are
+        read without reading all the data."""
+
+        if not isinstance(key, slice) or (
+                key.step is not None and key.step < 0):
+            return self.read()[key]
+
+        start, stop, step = key.indices(self.shape[0])
+        count = len(crange(start, stop, step))
+        if count == 0:
+            return N.array([], dtype=N.float64)
+
+        # combine key with slice of the variable dimension
+        slices = list(self.slices)
+        dim = [i for i, sl in enumerate(slices) if not isinstance(sl, int)][0]
+        dstart, dstop, dstep = slice(*slices[dim]).indices(
+            self.fullshape[dim])
+        newstart = dstart + start*dstep
+        newstep = dstep*step
+        slices[dim] = (newstart, newstart+(count-1)*newstep+1, newstep)
+        return self._readSlices(slices)
+
 class ImportParamsHDF5(base.ImportParamsBase):
     """HDF5 file import parameters.
 
@@ -212,6 +288,7 @@ class ImportParamsHDF5(base.ImportParamsBase):
      twodranges: map hdf names to 2d range (minx, miny, maxx, maxy)
      twod_as_oned: set of hdf names to read 2d dataset as 1d dataset
      convert_datetime: map float or strings to datetime
+     lazy: only read 1D numeric datasets when they are used
     """
 
     defaults = {
@@ -221,6 +298,7 @@ class ImportParamsHDF5(base.ImportParamsBase):
         'twodranges': None,
         'twod_as_oned': None,
         'convert_datetime': None,
+        'lazy': False,
         }
     defaults.update(base.ImportParamsBase.defaults)
 
@@ -295,12 +373,39 @@ class OperationDataImportHDF5(base.OperationDataImportBase):
                 aslice = self.params.slices[dsname]
 
             # finally return data
-            objdata = convertDatasetToObject(dataset, aslice)
+            if self.params.lazy and isinstance(dataset, h5py.Dataset):
+                objdata = self.lazyDataset(dataset, aslice)
+            else:
+                objdata = None
+            if objdata is None:
+                objdata = convertDatasetToObject(dataset, aslice)
             dsread[name] = _DataRead(dsname, objdata, options)
 
         except _ConvertError:
             pass
 
+    def lazyDataset(self, dataset, aslice):
+        """Return _LazyData for numeric 1D data, if the dataset can be
+        read lazily, otherwise None."""
+
+        try:
+            kind = dataset.dtype.kind
+        except TypeError:
+            return None
+        if kind not in ('b', 'i', 'u', 'f'):
+            return None
+        if aslice and any(
+                not isinstance(s, int) and s[2] is not None and s[2] < 0
+                for s in aslice):
+            # negative slicing requires reading all the data
+            return None
+
+        shape = slicedShape(dataset.shape, aslice)
+        if len(shape) != 1:
+            return None
+        return _LazyData(
+            self.params.filename, dataset.name, aslice, dataset.shape)
+
     def walkFile(self, item, dsread, names=None):
         """Walk an hdf file, adding datasets to dsread.
 
@@ -375,7 +480,8 @@ class OperationDataImportHDF5(base.OperationDataImportBase):
         for name in list(dsread):
             dr = dsread[name]
             ds = dr.data
-            if not isinstance(ds, N.ndarray) or len(ds.shape) != 1:
+            if ( not isinstance(ds, (N.ndarray, _LazyData)) or
+                 len(ds.shape) != 1 ):
                 # skip non-numeric or 2d datasets
                 continue
 
@@ -396,6 +502,14 @@ class OperationDataImportHDF5(base.OperationDataImportBase):
         data = dread.data
 
         ds = None
+        if isinstance(data, _LazyData):
+            if ( (self.params.convert_datetime and
+                  dread.origname in self.params.convert_datetime) or
+                 "vsz_convert_datetime" in dread.options ):
+                data = data.read()
+            else:
+                return self.lazyDataToDataset(name, data, errordatasets)
+
         if len(data.shape) == 1:
             if ( (self.params.convert_datetime and
                   dread.origname in self.params.convert_datetime) or
@@ -422,6 +536,8 @@ class OperationDataImportHDF5(base.OperationDataImportBase):
                 minlen = min([len(d) for d in cvalues(args)
                               if d is not None])
                 for a in list(args):
+                    if isinstance(args[a], _LazyData):
+                        args[a] = args[a].read()
                     if args[a] is not None and len(args[a]) > minlen:
                         args[a] = args[a][:minlen]
 
@@ -464,6 +580,32 @@ class OperationDataImportHDF5(base.OperationDataImportBase):
 
         return ds
 
+    def lazyDataToDataset(self, name, data, errordatasets):
+        """Make a dataset which reads lazy data and error bars when
+        first used."""
+
+        args = { 'data': data,
+                 'serr': errordatasets[name]['+-'],
+                 'nerr': errordatasets[name]['-'],
+                 'perr': errordatasets[name]['+'] }
+        args = dict( (a, d) for a, d in citems(args) if d is not None )
+        minlen = min([len(d) for d in cvalues(args)])
+
+        def loadfn():
+            out = {}
+            for a, d in citems(args):
+                if isinstance(d, _LazyData):
+                    d = d.read()
+                out[a] = d[:minlen]
+            return out
+
+        def chunkfn(sl):
+            # only reads the part of the columns in the slice
+            return dict( (a, d[sl]) for a, d in citems(args) )
+
+        return datasets.DatasetLazy(
+            loadfn, minlen, lazycolumns=list(args), chunkfn=chunkfn)
+
     def textDataToDataset(self, name, dread):
         """Convert textual data to a veusz dataset."""
 
@@ -526,7 +668,7 @@ class OperationDataImportHDF5(base.OperationDataImportBase):
 
         # create the veusz output datasets
         for name, dread in citems(dsread):
-            if isinstance(dread.data, N.ndarray):
+            if isinstance(dread.data, (N.ndarray, _LazyData)):
                 # numeric
                 ds = self.numericDataToDataset(name, dread, errordatasets)
             else:
@@ -552,7 +694,8 @@ def ImportFileHDF5(comm, filename,
                    convert_datetime=None,
                    prefix='', suffix='',
                    renames=None,
-                   linked=False):
+                   linked=False,
+                   lazy=False):
     """Import data from a HDF5 file
 
     items is a list of groups and datasets which can be imported.
@@ -593,6 +736,9 @@ def ImportFileHDF5(comm, filename,
 
     linked specifies that the dataset is linked to the file.
 
+    lazy specifies that 1D numeric datasets are only read from the
+    file when they are first used, rather than on import.
+
     Attributes can be used in datasets to override defaults:
      'vsz_name': set to override name for dataset in veusz
      'vsz_slice': slice on importing (use format "start:stop:step,...")
@@ -626,7 +772,8 @@ def ImportFileHDF5(comm, filename,
         convert_datetime=convert_datetime,
         prefix=prefix, suffix=suffix,
         renames=renames,
-        linked=linked)
+        linked=linked,
+        lazy=lazy)
     op = OperationDataImportHDF5(params)
     comm.document.applyOperation(op)
 
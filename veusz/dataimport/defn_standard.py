@@ -17,11 +17,16 @@
 ##############################################################################
 
 from __future__ import division, print_function
+import os
+import zlib
+
 from ..compat import citems
 from .. import qtall as qt4
 from .. import utils
 from .. import document
+from .. import datasets
 from . import simpleread
+from . import parallel
 from . import base
 
 def _(text, disambiguation=None, context="Import_Standard"):
@@ -35,6 +40,8 @@ class ImportParamsSimple(base.ImportParamsBase):
      useblocks: read datasets as blocks
      datastr: text to read from instead of file
      ignoretext: whether to ignore lines of text
+     processes: number of processes to read large files with
+                (0 or 1 to read in this process)
     """
 
     defaults = {
@@ -42,9 +49,46 @@ class ImportParamsSimple(base.ImportParamsBase):
         'useblocks': False,
         'datastr': None,
         'ignoretext': False,
+        'processes': 0,
         }
     defaults.update(base.ImportParamsBase.defaults)
 
+class _TailState(object):
+    """Where reading a linked file finished, so that only data added
+    to the end of the file need to be read when reloading.
+
+    This keeps the state of the reader, but not the data read. It is
+    not modified after creation, so it can be read from other threads.
+    """
+
+    # size of block before the end of the data read which is checked
+    # for changes
+    checksize = 65536
+
+    def __init__(self, reader, filename, offset, errors):
+        # copy of the reader without data
+        self.reader = reader.tailReader()
+        self.offset = offset
+        # total conversion errors for each part
+        self.errors = errors
+        self.checksum = self._checksum(filename)
+
+    def _checksum(self, filename):
+        """Checksum of block of file before offset."""
+        start = max(self.offset-self.checksize, 0)
+        with open(filename, 'rb') as f:
+            f.seek(start)
+            return zlib.crc32(f.read(self.offset-start))
+
+    def canReadTail(self, filename):
+        """Has the file only been added to since it was read?"""
+        try:
+            if os.path.getsize(filename) < self.offset:
+                return False
+            return self._checksum(filename) == self.checksum
+        except EnvironmentError:
+            return False
+
 class LinkedFile(base.LinkedFileBase):
     """Instead of reading data from a string, data can be read from
     a "linked file". This means the same document can be reloaded, and
@@ -53,10 +97,72 @@ class LinkedFile(base.LinkedFileBase):
     This class is used to store a link filename with the descriptor
     """
 
+    # state for reading data added to end of file
+    tailstate = None
+
     def createOperation(self):
         """Return operation to recreate self."""
         return OperationDataImport
 
+    def createReloadOperation(self):
+        """Return operation to reload the linked datasets, which can
+        read only the end of the file if it has grown."""
+        return OperationDataImport(self.params, linkedfile=self)
+
+    def _appendReadDatasets(self, tempdoc, document):
+        """Append values read from the end of the file to the linked
+        datasets in document.
+
+        Returns False if the datasets read do not match those in the
+        document.
+        """
+
+        toappend = []
+        for name, ds in citems(tempdoc.data):
+            outname = name
+            if self.params.renames and name in self.params.renames:
+                outname = self.params.renames[name]
+            old = document.data.get(outname)
+            if ( old is None or old.linked is not self or
+                 type(old) is not type(ds) or
+                 [getattr(old, c) is None for c in old.columns] !=
+                 [getattr(ds, c) is None for c in ds.columns] ):
+                return False
+            toappend.append( (old, ds) )
+
+        for old, ds in toappend:
+            if isinstance(ds, datasets.Dataset):
+                old.appendValues(
+                    ds.data, serr=ds.serr, perr=ds.perr, nerr=ds.nerr)
+            else:
+                old.appendValues(ds.data)
+            document.modifiedData(old)
+        return True
+
+    def applyReadLinks(self, document, tempdoc, op):
+        """Replace the linked datasets by those read, or append the
+        values if only the end of the file was read."""
+
+        if op.tailread:
+            if op.basetailstate is not self.tailstate:
+                # another reload finished since this one started
+                return self.reloadLinks(document)
+
+            if not self._appendReadDatasets(tempdoc, document):
+                # new datasets in the file, so read it all again
+                self.tailstate = None
+                return self.reloadLinks(document)
+            self.reloads += 1
+            read = [name for name, ds in citems(document.data)
+                    if ds.linked is self]
+            retn = (read, op.outinvalids)
+        else:
+            retn = base.LinkedFileBase.applyReadLinks(
+                self, document, tempdoc, op)
+
+        self.tailstate = op.newtailstate
+        return retn
+
     def saveToFile(self, fileobj, relpath=None):
         """Save the link to the document file.
         If relpath is set, save links relative to path given
@@ -72,12 +178,64 @@ class OperationDataImport(base.OperationDataImportBase):
 
     descr = _('import data')
 
-    def __init__(self, params):
+    def __init__(self, params, linkedfile=None):
         """Setup operation.
+
+        If linkedfile is set, the data are being reloaded for it. The
+        linked file is not modified, so that this can be done in
+        another thread. If only the end of the file is read, tailread
+        is set and only the new values are output.
         """
 
         base.OperationDataImportBase.__init__(self, params)
         self.simpleread = simpleread.SimpleRead(params.descriptor)
+        self.simpleread.progress = self.progress
+        self.linkedfile = linkedfile
+
+        # tail state read from, new tail state, and whether only the
+        # end of the file was read
+        self.basetailstate = None
+        self.newtailstate = None
+        self.tailread = False
+
+    def _readTail(self):
+        """Read only data added to the end of a linked file, if it has
+        only grown since it was last read.
+
+        Returns stream read, or None if the file needs reading again.
+        """
+
+        state = self.basetailstate = self.linkedfile.tailstate
+        if state is None or not state.canReadTail(self.params.filename):
+            return None
+
+        self.simpleread = state.reader.tailReader()
+        self.simpleread.progress = self.progress
+        stream = simpleread.FileStream(
+            utils.openEncoding(self.params.filename, self.params.encoding,
+                               offset=state.offset))
+        self.simpleread.readDataTail(stream)
+        self.tailread = True
+        return stream
+
+    def _makeTailState(self, stream, errors):
+        """Get state to read data added to the end of a file later, or
+        None if this is not possible."""
+
+        p = self.params
+        if ( stream is None or p.filename == '{clipboard}' or
+             p.useblocks or stream.remainingline or
+             not parallel.asciiCompatible(p.encoding, None) ):
+            return None
+
+        # the file has to end with a complete line
+        offset = stream.file.buffer.tell()
+        if offset > 0:
+            with open(p.filename, 'rb') as f:
+                f.seek(offset-1)
+                if f.read(1) != b'\n':
+                    return None
+        return _TailState(self.simpleread, p.filename, offset, errors)
 
     def doImport(self):
         """Import data.
@@ -86,35 +244,63 @@ class OperationDataImport(base.OperationDataImportBase):
         """
 
         p = self.params
+        stream = None
+        if self.linkedfile is not None:
+            stream = self._readTail()
+
         # open stream to import data from
-        if p.filename is not None:
-            stream = simpleread.FileStream(
-                utils.openEncoding(p.filename, p.encoding))
-        elif p.datastr is not None:
-            stream = simpleread.StringStream(p.datastr)
+        if stream is not None:
+            # only the end of the file has been read
+            pass
+        elif ( p.filename is not None and p.filename != '{clipboard}' and
+               p.processes > 1 and not p.useblocks ):
+            # read chunks of file in parallel
+            self.simpleread.clearState()
+            self.simpleread.readFileParallel(
+                p.filename, p.encoding, p.processes,
+                ignoretext=p.ignoretext)
+            stream = None
         else:
-            raise RuntimeError("No filename or string")
+            if p.filename is not None:
+                stream = simpleread.FileStream(
+                    utils.openEncoding(p.filename, p.encoding))
+            elif p.datastr is not None:
+                stream = simpleread.StringStream(p.datastr)
+            else:
+                raise RuntimeError("No filename or string")
+
+            # do the import
+            self.simpleread.clearState()
+            self.simpleread.readData(stream, useblocks=p.useblocks,
+                                     ignoretext=p.ignoretext)
 
-        # do the import
-        self.simpleread.clearState()
-        self.simpleread.readData(stream, useblocks=p.useblocks,
-                                 ignoretext=p.ignoretext)
+        self.outinvalids = self.simpleread.getInvalidConversions()
+        if self.tailread:
+            # add errors from earlier reads
+            for name, num in citems(self.basetailstate.errors):
+                self.outinvalids[name] = self.outinvalids.get(name, 0) + num
 
         # associate linked file
         LF = None
         if p.linked:
             assert p.filename
-            LF = LinkedFile(p)
+            LF = self.linkedfile
+            tailstate = self._makeTailState(stream, dict(self.outinvalids))
+            if LF is None:
+                LF = LinkedFile(p)
+                LF.tailstate = tailstate
+            else:
+                # set when the datasets are applied
+                self.newtailstate = tailstate
 
         # actually set the data in the document
         self.simpleread.setOutput(
             self.outdatasets,
             linkedfile=LF, prefix=p.prefix, suffix=p.suffix)
-        self.outinvalids = self.simpleread.getInvalidConversions()
 
 def ImportFile(comm, filename, descriptor, useblocks=False, linked=False,
                prefix='', suffix='', ignoretext=False, encoding='utf_8',
-               renames=None):
+               renames=None, processes=0, background=False):
     """Read data from file with filename using descriptor.
     If linked is True, the data won't be saved in a saved document,
     the data will be reread from the file.
@@ -130,6 +316,15 @@ def ImportFile(comm, filename, descriptor, useblocks=False, linked=False,
     encoding is name of text file encoding
     renames is a dict mapping existing to new names after import
 
+    processes is the number of processes to read large files with in
+    parallel. Files are read serially if this is 0 or 1, or if
+    useblocks is set.
+
+    If background is True, the file is read in a separate thread and
+    an id is returned to pass to ImportStatus, ImportWait or
+    ImportCancel. The datasets are added to the document by the event
+    loop when reading has finished, or by ImportWait.
+
     Returned is a tuple (datasets, errors)
      where datasets is a list of datasets read
      errors is a dict of the datasets with the number of errors while
@@ -144,8 +339,11 @@ def ImportFile(comm, filename, descriptor, useblocks=False, linked=False,
         prefix=prefix, suffix=suffix,
         ignoretext=ignoretext,
         encoding=encoding,
-        renames=renames)
+        renames=renames,
+        processes=processes)
     op = OperationDataImport(params)
+    if background:
+        return comm.addBackgroundImport(base.AsyncImport(comm.document, op))
     comm.document.applyOperation(op)
 
     if comm.verbose:
@@ -201,8 +201,10 @@ class ImportTabCSV(importdialog.ImportTab):
             op = defn_csv.OperationDataImportCSV(params)
 
             # actually import the data
-            doc.applyOperation(op)
+            self.runImport(doc, op)
 
+        except base.ImportCancelled:
+            return
         except (base.ImportingError, csv.Error) as e:
             qt4.QMessageBox.warning(self, _("Veusz"), cstr(e))
             return
@@ -24,6 +24,7 @@ from ..dialogs import importdialog, veuszdialog
 from ..compat import citems
 from . import defn_standard
 from . import simpleread
+from . import base
 
 def _(text, disambiguation=None, context="Import_Standard"):
     return qt4.QCoreApplication.translate(context, text, disambiguation)
@@ -98,7 +99,10 @@ class ImportTabStandard(importdialog.ImportTab):
             return
 
         # actually import the data
-        doc.applyOperation(op)
+        try:
+            self.runImport(doc, op)
+        except base.ImportCancelled:
+            return
 
         # tell the user what happened
         # failures in conversion
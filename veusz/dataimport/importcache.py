@@ -0,0 +1,206 @@
+#    Copyright (C) 2016 Jeremy S. Sanders
+#    Email: Jeremy Sanders <jeremy@jeremysanders.net>
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+##############################################################################
+
+"""Cache of imported datasets on disk.
+
+Datasets read from a file are saved in a npz file in the user cache
+directory. They are looked up using a key made from the filename,
+size, modification time, a hash of the start and end of the file and
+the import parameters. The least recently used files are deleted when
+the cache grows too large (the settingdb importcache_maxsize entry, in
+MB).
+"""
+
+from __future__ import division
+import os
+import hashlib
+import json
+
+import numpy as N
+
+from ..compat import citems, cstr, crepr
+from .. import qtall as qt4
+from .. import datasets
+from .. import setting
+from .. import utils
+
+# increase if format of cache files changes
+cacheversion = 2
+
+# number of bytes at start and end of file to hash
+hashsize = 65536
+
+# import parameters which do not affect the datasets read
+ignoredparams = ('filename', 'linked', 'processes', 'cache')
+
+def cacheDir():
+    """Directory to store cache files."""
+    base = qt4.QDesktopServices.storageLocation(
+        qt4.QDesktopServices.CacheLocation)
+    return os.path.join(base, 'importcache')
+
+def _paramRepr(val):
+    """Repr of parameter value with dicts and sets sorted."""
+    if isinstance(val, dict):
+        return '{%s}' % ', '.join(
+            ['%s: %s' % (_paramRepr(k), _paramRepr(v))
+             for k, v in sorted(citems(val))])
+    elif isinstance(val, (set, frozenset)):
+        return '{%s}' % ', '.join(sorted([_paramRepr(v) for v in val]))
+    return crepr(val)
+
+def cacheKey(params):
+    """Get key for import params (an ImportParamsBase), or None if
+    the file cannot be read."""
+
+    filename = os.path.abspath(params.filename)
+    try:
+        stat = os.stat(filename)
+        with open(filename, 'rb') as f:
+            h = hashlib.sha1(f.read(hashsize))
+            if stat.st_size > hashsize:
+                f.seek(max(stat.st_size-hashsize, hashsize))
+                h.update(f.read())
+    except EnvironmentError:
+        return None
+
+    parts = [
+        'version=%i' % cacheversion,
+        'veusz=%s' % utils.version(),
+        'class=%s' % params.__class__.__name__,
+        'filename=%s' % crepr(filename),
+        'size=%i' % stat.st_size,
+        'mtime=%r' % stat.st_mtime,
+        'hash=%s' % h.hexdigest(),
+        ]
+    for k in sorted(params.defaults):
+        if k not in ignoredparams:
+            parts.append('%s=%s' % (k, _paramRepr(getattr(params, k))))
+
+    return hashlib.sha1('\n'.join(parts).encode('utf-8')).hexdigest()
+
+def loadCache(key, linkedfile=None):
+    """Return (dict of names to datasets, dict of names to numbers of
+    invalid conversions) for key, or None if not in cache."""
+
+    filename = os.path.join(cacheDir(), key + '.npz')
+    try:
+        with N.load(filename) as npz:
+            meta = json.loads(cstr(npz['meta'][()]))
+            invalids = dict(meta['invalids'])
+            out = {}
+            for i, (name, dstype, cols) in enumerate(meta['datasets']):
+                vals = dict([(c, npz['%i_%s' % (i, c)]) for c in cols])
+                if dstype == 'text':
+                    ds = datasets.DatasetText(
+                        data=[cstr(x) for x in vals['data']],
+                        linked=linkedfile)
+                elif dstype == 'date':
+                    ds = datasets.DatasetDateTime(
+                        data=vals['data'], linked=linkedfile)
+                else:
+                    ds = datasets.Dataset(linked=linkedfile, **vals)
+                out[name] = ds
+    except Exception:
+        # missing or invalid file
+        return None
+
+    # mark as recently used
+    try:
+        os.utime(filename, None)
+    except EnvironmentError:
+        pass
+    return out, invalids
+
+def saveCache(key, outdatasets, invalids=None):
+    """Save datasets in dict outdatasets to the cache under key.
+
+    invalids is an optional dict of dataset names to the number of
+    invalid conversions when reading them.
+    """
+
+    meta = []
+    arrays = {}
+    for i, (name, ds) in enumerate(sorted(citems(outdatasets))):
+        if isinstance(ds, datasets.DatasetText):
+            dstype = 'text'
+            arrays['%i_data' % i] = N.array(
+                [cstr(x) for x in ds.data], dtype=N.unicode_)
+            cols = ['data']
+        elif isinstance(ds, datasets.DatasetDateTime):
+            dstype = 'date'
+            arrays['%i_data' % i] = ds.data
+            cols = ['data']
+        elif isinstance(ds, datasets.Dataset):
+            dstype = '1d'
+            cols = [c for c in ds.columns if getattr(ds, c) is not None]
+            for c in cols:
+                arrays['%i_%s' % (i, c)] = getattr(ds, c)
+        else:
+            # cannot cache this type of dataset
+            return
+        meta.append( (name, dstype, cols) )
+    arrays['meta'] = N.array(json.dumps({
+        'datasets': meta, 'invalids': invalids or {}}))
+
+    dirname = cacheDir()
+    filename = os.path.join(dirname, key + '.npz')
+    tempname = filename + '.tmp.npz'
+    try:
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        N.savez(tempname, **arrays)
+        os.rename(tempname, filename)
+    except EnvironmentError:
+        try:
+            os.unlink(tempname)
+        except EnvironmentError:
+            pass
+        return
+
+    evictCache(setting.settingdb['importcache_maxsize']*1024*1024)
+
+def evictCache(maxsize):
+    """Delete least recently used cache files until the total size is
+    at most maxsize bytes."""
+
+    dirname = cacheDir()
+    try:
+        names = os.listdir(dirname)
+    except EnvironmentError:
+        return
+
+    files = []
+    for name in names:
+        if name.endswith('.npz'):
+            path = os.path.join(dirname, name)
+            try:
+                stat = os.stat(path)
+            except EnvironmentError:
+                continue
+            files.append( (stat.st_mtime, stat.st_size, path) )
+
+    total = sum([f[1] for f in files])
+    for mtime, size, path in sorted(files):
+        if total <= maxsize:
+            break
+        try:
+            os.unlink(path)
+            total -= size
+        except EnvironmentError:
+            pass
@@ -0,0 +1,144 @@
+#    Copyright (C) 2016 Jeremy S. Sanders
+#    Email: Jeremy Sanders <jeremy@jeremysanders.net>
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+##############################################################################
+
+"""Read large text files in chunks using several processes.
+
+The file is split into chunks at line ends. The importer reads the
+first chunk itself, then the others are read in a pool of processes,
+starting from the state of the importer after the first chunk. If
+reading a chunk changes the state of the importer (e.g. a new header
+or descriptor), the rest of the file has to be read serially.
+"""
+
+from __future__ import division
+import os
+import codecs
+import multiprocessing
+import threading
+
+# default size of chunks in bytes
+chunksize = 32*1024*1024
+
+def asciiCompatible(encoding, quotechar):
+    """Can files in encoding be split at new line bytes?"""
+    try:
+        enc = codecs.getincrementalencoder(encoding)()
+        # skip any byte order mark
+        enc.encode(u'a')
+        if enc.encode(u'a\n') != b'a\n':
+            return False
+        if quotechar and enc.encode(quotechar) != quotechar.encode('ascii'):
+            return False
+    except (LookupError, UnicodeError):
+        return False
+    return True
+
+def _lineEnd(f, pos, quote, inquote):
+    """Find the position after the next new line from pos in file f
+    which is not inside quotes.
+
+    Returns None if the end of the file is reached.
+    """
+    f.seek(pos)
+    while True:
+        block = f.read(65536)
+        if not block:
+            return None
+        i = 0
+        while True:
+            j = block.find(b'\n', i)
+            if j < 0:
+                if quote and block.count(quote, i) % 2 == 1:
+                    inquote = not inquote
+                break
+            if quote and block.count(quote, i, j) % 2 == 1:
+                inquote = not inquote
+            i = j+1
+            if not inquote:
+                return pos+i
+        pos += len(block)
+
+def splitFile(filename, encoding, size=None, quotechar=None):
+    """Split a file into byte ranges of around size bytes, ending at
+    line ends.
+
+    If quotechar is given, chunks are not split inside quoted text.
+
+    Returns a list of (start, end), or None if the file cannot be
+    split in its encoding.
+    """
+
+    if size is None:
+        size = chunksize
+    if not asciiCompatible(encoding, quotechar):
+        return None
+    quote = quotechar.encode('ascii') if quotechar else None
+
+    filesize = os.path.getsize(filename)
+    chunks = []
+    start = 0
+    with open(filename, 'rb') as f:
+        while start + size < filesize:
+            inquote = False
+            if quote:
+                f.seek(start)
+                inquote = f.read(size).count(quote) % 2 == 1
+            end = _lineEnd(f, start+size, quote, inquote)
+            if end is None:
+                break
+            chunks.append( (start, end) )
+            start = end
+    if start < filesize or not chunks:
+        chunks.append( (start, filesize) )
+    return chunks
+
+def _context():
+    """Get multiprocessing context to start processes with, or None
+    if processes cannot be started safely.
+
+    Processes are spawned rather than forked, as forking a Qt
+    application (possibly from a thread reading in the background)
+    is unsafe. Old versions of Python can only fork, so processes
+    are only started from the main thread.
+    """
+    try:
+        return multiprocessing.get_context('spawn')
+    except AttributeError:
+        if isinstance(threading.current_thread(), threading._MainThread):
+            return multiprocessing
+        return None
+
+def available():
+    """Can chunks be read in parallel from this thread?"""
+    return _context() is not None
+
+def mapChunks(func, args, processes):
+    """Call func with each of args in a pool of processes, yielding
+    the results in order.
+
+    The pool is stopped when all the results are read, or the
+    generator is closed.
+    """
+
+    pool = _context().Pool(processes)
+    try:
+        for result in pool.imap(func, args):
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
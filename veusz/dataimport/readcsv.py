@@ -21,35 +21,16 @@ in an easy-to-use manner."""
 
 from __future__ import division
 import re
+import itertools
+import operator
 import numpy as N
 
-from ..compat import crange, cnext, CIterator
+from ..compat import crange, cnext, citems, citervalues, czip_longest, \
+    CIterator
 from .. import datasets
 from .. import utils
 from .. import qtall as qt4
-
-class _FileReaderCols(CIterator):
-    """Read a CSV file in rows. This acts as an iterator.
-
-    This is a very simple wrapper around the csv module
-    """
-
-    def __init__(self, csvreader):
-        self.csvreader = csvreader
-        self.maxlen = 0
-
-    def __iter__(self):
-        return self
-
-    def __next__(self):
-        """Return next row."""
-        row = cnext(self.csvreader)
-
-        # add blank columns up to maximum previously read
-        self.maxlen = max(self.maxlen, len(row))
-        row = row + ['']*(self.maxlen - len(row))
-
-        return row
+from . import parallel
 
 class _FileReaderRows(CIterator):
     """Read a CSV file in columns. This acts as an iterator.
@@ -58,34 +39,49 @@ class _FileReaderRows(CIterator):
     """
 
     def __init__(self, csvreader):
-        self.data = []
-        self.maxlength = 0
-
-        for line in csvreader:
-            self.maxlength = max(self.maxlength, len(line))
-            self.data.append(line)
-
-        self.counter = 0
+        # transpose rows, filling in missing values
+        self.cols = iter( list(
+            czip_longest(*list(csvreader), fillvalue='')) )
 
     def __iter__(self):
         return self
 
     def __next__(self):
         """Return the next column."""
+        return list( cnext(self.cols) )
 
-        if self.counter == self.maxlength:
-            raise StopIteration
+class _FloatBuffer(object):
+    """An array of floating point values, which grows geometrically as
+    values are added."""
 
-        # probably is a better way to do this
-        retn = []
-        for row in self.data:
-            if self.counter >= len(row):
-                retn.append('')
-            else:
-                retn.append(row[self.counter])
+    def __init__(self, vals=()):
+        self.buf = N.array(vals, dtype=N.float64)
+        self.size = len(self.buf)
+
+    def _reserve(self, num):
+        """Make space for num more values."""
+        if self.size + num > len(self.buf):
+            newbuf = N.empty(
+                max(self.size+num, len(self.buf)*2, 64), dtype=N.float64)
+            newbuf[:self.size] = self.buf[:self.size]
+            self.buf = newbuf
+
+    def append(self, val):
+        self._reserve(1)
+        self.buf[self.size] = val
+        self.size += 1
 
-        self.counter += 1
-        return retn
+    def extend(self, vals):
+        self._reserve(len(vals))
+        self.buf[self.size:self.size+len(vals)] = vals
+        self.size += len(vals)
+
+    def __len__(self):
+        return self.size
+
+    def array(self):
+        """Return the values as a numpy array."""
+        return self.buf[:self.size]
 
 # list of codes which can be added to column descriptors
 typecodes = (
@@ -101,19 +97,45 @@ typecodes = (
 class _NextValue(Exception):
     """A class to be raised to move to next value."""
 
+# values in a column which are blank
+blankrun_re = re.compile(r'(?:[^\S\n]*\n)*')
+# a blank value on a line
+blankvalue_re = re.compile(r'^[^\S\n]*$', re.MULTILINE)
+# exponents which could overflow
+bigexponent_re = re.compile(r'[eE][+-]?[0-9]{3}')
+
 class ReadCSV(object):
     """A class to import data from CSV files."""
 
+    # number of lines read at a time
+    chunklines = 65536
+    # initial number of lines to try to convert column-by-column
+    minrun = 64
+
     def __init__(self, params):
         """Initialise the reader.
         params is a ParamsCSV object
         """
 
         self.params = params
+        # optional ImportProgress to update while reading
+        self.progress = None
         self.numericlocale = qt4.QLocale(params.numericlocale)
         self.datere = re.compile(
             utils.dateStrToRegularExpression(params.dateformat))
 
+        # values in a column which are simple numbers in the locale
+        # (or blank), which can be converted together
+        self.decimalpoint = self.numericlocale.decimalPoint()
+        number = (
+            r'[+-]?(?:[0-9]+(?:%(dp)s[0-9]*)?|%(dp)s[0-9]+)'
+            r'(?:[eE][+-]?[0-9]{1,2})?' % {
+                'dp': re.escape(self.decimalpoint)} )
+        self.floatrun_re = re.compile(r'(?:(?:%s|[^\S\n]*)\n)*' % number)
+        # characters in numbers, for quickly checking a whole column
+        self.numbertable = dict(
+            (ord(c), None) for c in '0123456789+-eE'+self.decimalpoint)
+
         # created datasets. Each name is associated with a list
         self.data = {}
 
@@ -246,9 +268,12 @@ class ReadCSV(object):
         self.coltypes[colnum] = dtype
 
         # add back on blanks if necessary with correct format
+        name = self.colnames[colnum]
         for i in crange(self.colblanks[colnum]):
-            d = (N.nan, '')[dtype == 'string']
-            self.data[self.colnames[colnum]].append(d)
+            if dtype == 'string':
+                self._listData(name).append('')
+            else:
+                self.data[name].append(N.nan)
         self.colblanks[colnum] = 0
 
     def _handleFailedConversion(self, colnum, col):
@@ -309,10 +334,26 @@ class ReadCSV(object):
 
         else:
             # conversion succeeded - append number to data
-            self.data[self.colnames[colnum]].append(v)
+            if ctype == 'string':
+                self._listData(self.colnames[colnum]).append(v)
+            else:
+                self.data[self.colnames[colnum]].append(v)
 
-    def readData(self):
-        """Read the data into the document."""
+    def _listData(self, name):
+        """Get data for name as a list, for adding text.
+
+        A dataset can change type if a column with the same name has
+        a different type."""
+        data = self.data[name]
+        if isinstance(data, _FloatBuffer):
+            data = self.data[name] = list(data.array())
+        return data
+
+    def _openReader(self, byterange=None, offset=None):
+        """Make an iterator over the lines (or columns) of the file.
+
+        If byterange=(start, end) is given, only read that part of
+        the file. If offset is given, read from that byte offset."""
 
         par = self.params
 
@@ -322,21 +363,21 @@ class ReadCSV(object):
             delimiter=par.delimiter,
             quotechar=par.textdelimiter,
             skipinitialspace=par.skipwhitespace,
-            encoding=par.encoding )
+            encoding=par.encoding,
+            byterange=byterange,
+            offset=offset )
 
         # make in iterator for the file
         if par.readrows:
-            it = _FileReaderRows(csvf)
+            return _FileReaderRows(csvf)
         else:
-            it = _FileReaderCols(csvf)
+            return csvf
 
-        # ignore rows (at top), if requested
-        for i in crange(par.rowsignore):
-            try:
-                cnext(it)
-            except StopIteration:
-                return
+    def _clearState(self):
+        """Reset the state of the columns before reading."""
 
+        # maximum length of lines read, as short lines are padded
+        self.maxlen = 0
         # dataset names for each column
         self.colnames = {}
         # type of column (float, string or date)
@@ -349,19 +390,304 @@ class ReadCSV(object):
         # type detection
         self.colblanks = {}
 
-        # iterate over each line (or column)
-        while True:
+    def _ignoreRows(self, it):
+        """Ignore rows at the top of the file, if requested.
+
+        Returns False if the iterator finished first."""
+        for i in crange(self.params.rowsignore):
             try:
                 line = cnext(it)
             except StopIteration:
+                return False
+            self.maxlen = max(self.maxlen, len(line))
+        return True
+
+    def _readIter(self, it):
+        """Read the lines (or columns) from the iterator."""
+        # iterate over chunks of lines (or columns)
+        while True:
+            lines = list( itertools.islice(it, self.chunklines) )
+            if not lines:
                 break
+            self._readLines(lines)
+            if self.progress is not None:
+                self.progress.update(len(lines))
+
+    def readData(self):
+        """Read the data into the document."""
+
+        it = self._openReader()
+        self._clearState()
+        if self._ignoreRows(it):
+            self._readIter(it)
+
+    def readDataParallel(self, processes):
+        """Read the data, reading chunks of the file in parallel
+        using the number of processes given.
+
+        Chunks are read in parallel starting from the state of the
+        columns after the first chunk. If reading a chunk changes this
+        state (e.g. new headers, or data types), the rest of the file
+        is read serially.
+        """
+
+        par = self.params
+        chunks = None
+        if ( not par.readrows and par.filename != '{clipboard}' and
+             parallel.available() ):
+            chunks = parallel.splitFile(
+                par.filename, par.encoding, quotechar=par.textdelimiter)
+        if chunks is None or len(chunks) == 1:
+            self.readData()
+            return
+
+        # the first chunk is read here to get the state for the others
+        it = self._openReader(chunks[0])
+        self._clearState()
+        if not self._ignoreRows(it):
+            # ignored rows are not all in the first chunk
+            self.readData()
+            return
+        self._readIter(it)
+
+        state = self._chunkState()
+        serialfrom = None
+        args = [ (par, state, c) for c in chunks[1:] ]
+        results = parallel.mapChunks(_readChunk, args, processes)
+        try:
+            for i, (data, chunkstate) in enumerate(results):
+                if chunkstate != state:
+                    serialfrom = i+1
+                    break
+                self._addChunk(data)
+                if self.progress is not None:
+                    self.progress.update(bytesread=chunks[i+1][1])
+        finally:
+            results.close()
+
+        if serialfrom is not None:
+            # read the rest of the file from the start of the chunk
+            self._readIter(self._openReader(offset=chunks[serialfrom][0]))
+
+    def _chunkState(self):
+        """State of the columns which has to stay the same for chunks
+        to be read in parallel."""
+        return (
+            dict(self.colnames), list(self.coltypes), dict(self.nametypes),
+            dict(self.colignore), dict(self.colblanks), self.maxlen )
+
+    def _setChunkState(self, state):
+        """Set the state of the columns to read a chunk, without data."""
+        colnames, coltypes, nametypes, colignore, colblanks, maxlen = state
+        self.colnames = dict(colnames)
+        self.coltypes = list(coltypes)
+        self.nametypes = dict(nametypes)
+        self.colignore = dict(colignore)
+        self.colblanks = dict(colblanks)
+        self.maxlen = maxlen
+        self.data = dict( (name, []) for name in citervalues(colnames) )
+
+    def _addChunk(self, data):
+        """Add data read from a chunk."""
+        for name, vals in citems(data):
+            if isinstance(vals, N.ndarray):
+                old = self.data[name]
+                if not isinstance(old, _FloatBuffer):
+                    old = self.data[name] = _FloatBuffer(old)
+                old.extend(vals)
+            else:
+                self._listData(name).extend(vals)
+
+    def _readLine(self, line):
+        """Read a line (or column) value-by-value."""
+        for colnum, col in enumerate(line):
+            try:
+                self._handleVal(colnum, col)
+            except _NextValue:
+                pass
+
+    def _readLines(self, lines):
+        """Read a list of lines (or columns).
+
+        Runs of lines which do not change the state of any column
+        (i.e. which do not contain headers, new types or invalid
+        values) are converted column-by-column. Other lines are read
+        value-by-value.
+        """
+
+        # transpose into columns, adding blank values up to maximum
+        # line length
+        lengths = set(map(len, lines))
+        if len(lengths) == 1:
+            cols = [ tuple(map(operator.itemgetter(i), lines))
+                     for i in crange(lengths.pop()) ]
+        else:
+            cols = list( czip_longest(*lines, fillvalue='') )
+        numlines = len(lines)
+        self.maxlen = max(self.maxlen, len(cols))
+        cols += [('',)*numlines] * (self.maxlen-len(cols))
+
+        line = 0
+        run = self.minrun
+        while line < numlines:
+            end = min(line+run, numlines)
+            num = self._readRun(cols, line, end)
+            line += num
+            if line == end:
+                # try longer run next time
+                run *= 2
+            else:
+                self._readLine([col[line] for col in cols])
+                line += 1
+                run = self.minrun
+
+    def _readRun(self, cols, start, end):
+        """Convert values in lines start to end in cols column-by-column
+        until a value changes the state of a column.
+
+        Returns number of lines read.
+        """
+
+        # values for a dataset in multiple columns need to be interleaved
+        names = list(self.colnames.values())
+        if len(set(names)) != len(names):
+            return 0
+
+        num = end - start
+        runs = []
+        for colnum, col in enumerate(cols):
+            colrun, vals = self._columnRun(colnum, col[start:start+num])
+            num = min(num, colrun)
+            if num == 0:
+                return 0
+            runs.append(vals)
+
+        for colnum, vals in enumerate(runs):
+            self._storeRun(colnum, num, vals)
+        return num
+
+    def _columnRun(self, colnum, vals):
+        """Get the number of values at the start of vals which can be
+        converted without changing the state of column colnum.
+
+        Returns (number, converted values or None).
+        """
 
-            # iterate over items on line
-            for colnum, col in enumerate(line):
-                try:
-                    self._handleVal(colnum, col)
-                except _NextValue:
-                    pass
+        if colnum not in self.colnames:
+            # blanks are ignored until the column is started
+            return self._blankRun(vals), None
+        if self.colignore[colnum] > 0:
+            return min(self.colignore[colnum], len(vals)), None
+
+        ctype = self.coltypes[colnum]
+        if ctype == 'unknown':
+            # blanks before type is known
+            return self._blankRun(vals), None
+        elif ctype == 'float':
+            return self._floatRun(vals)
+        elif ctype == 'date':
+            return self._dateRun(vals)
+        elif ctype == 'string':
+            return len(vals), vals
+        else:
+            raise RuntimeError("Invalid type in CSV reader")
+
+    def _joinValues(self, vals):
+        """Join values with a new line after each value.
+
+        Returns None if a value contains a new line."""
+        text = '\n'.join(vals) + '\n'
+        if text.count('\n') != len(vals):
+            return None
+        return text
+
+    def _blankRun(self, vals):
+        """Number of blank values at start of vals."""
+        text = self._joinValues(vals)
+        if text is None:
+            return 0
+        return text.count('\n', 0, blankrun_re.match(text).end())
+
+    def _floatRun(self, vals):
+        """Convert numbers (or blanks) at the start of vals.
+
+        Blanks are returned as NaN."""
+
+        text = self._joinValues(vals)
+        if text is None:
+            return 0, None
+
+        # quick check whether all the values only contain characters
+        # in numbers (or are empty)
+        rest = text.translate(self.numbertable)
+        if ( rest.count('\n') == len(rest) and
+             bigexponent_re.search(text) is None ):
+            vals = self._convertFloats(text)
+            if vals is not None:
+                return len(vals), vals
+
+        # check values individually
+        end = self.floatrun_re.match(text).end()
+        num = text.count('\n', 0, end)
+        if num == 0:
+            return 0, None
+        return num, self._convertFloats(text[:end])
+
+    def _convertFloats(self, text):
+        """Convert numbers (or blanks) on each line of text.
+
+        Returns None if a value could not be converted."""
+
+        text = blankvalue_re.sub('nan', text[:-1])
+        if self.decimalpoint != '.':
+            text = text.replace(self.decimalpoint, '.')
+        try:
+            return N.array(text.split('\n'), dtype=N.float64)
+        except ValueError:
+            return None
+
+    def _dateRun(self, vals):
+        """Convert dates (or blanks) at the start of vals.
+
+        Blanks are returned as NaN."""
+
+        datere = self.datere
+        out = []
+        for val in vals:
+            try:
+                out.append( utils.dateREMatchToDate(datere.match(val)) )
+            except ValueError:
+                if val.strip() != '':
+                    break
+                out.append(N.nan)
+        return len(out), N.array(out, dtype=N.float64)
+
+    def _storeRun(self, colnum, num, vals):
+        """Add the first num values converted by _columnRun to the
+        column data."""
+
+        if colnum not in self.colnames:
+            return
+        if self.colignore[colnum] > 0:
+            self.colignore[colnum] -= num
+            return
+
+        ctype = self.coltypes[colnum]
+        name = self.colnames[colnum]
+        if ctype == 'unknown':
+            if self.params.blanksaredata:
+                self.colblanks[colnum] += num
+        elif ctype == 'string':
+            self._listData(name).extend(vals[:num])
+        else:
+            vals = vals[:num]
+            if not self.params.blanksaredata:
+                # blanks are skipped
+                vals = vals[N.logical_not(N.isnan(vals))]
+            data = self.data[name]
+            if not isinstance(data, _FloatBuffer):
+                data = self.data[name] = _FloatBuffer(data)
+            data.extend(vals)
 
     def setData(self, outmap, linkedfile=None):
         """Set the read-in datasets in the dict outmap."""
@@ -375,7 +701,10 @@ class ReadCSV(object):
             # get data and errors (if any)
             data = []
             for k in (name, name+'\0+-', name+'\0+', name+'\0-'):
-                data.append( self.data.get(k, None) )
+                vals = self.data.get(k, None)
+                if isinstance(vals, _FloatBuffer):
+                    vals = vals.array()
+                data.append(vals)
 
             # make them have a maximum length by adding NaNs
             maxlen = max([len(x) for x in data if x is not None])
@@ -398,3 +727,21 @@ class ReadCSV(object):
             outmap[name] = ds
 
         return sorted(outmap)
+
+def _readChunk(args):
+    """Read a chunk of a CSV file in a separate process.
+
+    Returns the data read and the final state of the columns.
+    """
+
+    params, state, byterange = args
+    reader = ReadCSV(params)
+    reader._setChunkState(state)
+    reader._readIter(reader._openReader(byterange))
+
+    data = {}
+    for name, vals in citems(reader.data):
+        if isinstance(vals, _FloatBuffer):
+            vals = vals.array()
+        data[name] = vals
+    return data, reader._chunkState()
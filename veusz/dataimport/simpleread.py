@@ -43,14 +43,16 @@ x +- y + -
 from __future__ import division
 import re
 import ast
+import itertools
 
 import numpy as N
 
-from ..compat import crange, cnext, CStringIO
+from ..compat import crange, cnext, citems, czip, CStringIO
 from .. import utils
 from .. import datasets
 from .. import qtall as qt4
 from .import base
+from . import parallel
 
 # a regular expression for splitting descriptor into tokens
 descrtokens_split_re = re.compile(r'''
@@ -155,6 +157,15 @@ $
 # a line starting with text
 text_start_re = re.compile( r'^[A-Za-z]' )
 
+# characters which mean a line cannot be read by the fast numeric
+# reader: comments, continuations, quotes and whitespace not
+# separating items in the normal reader
+numeric_special_re = re.compile(
+    u'[#!%;\\\\"\'`\x0b\x0c\x1c-\x1f\x85\xa0\u1680\u2000-\u200a'
+    u'\u2028\u2029\u202f\u205f\u3000]' )
+# a line in a block of text starting with text
+line_text_start_re = re.compile( r'^[ \t\r]*[A-Za-z]', re.MULTILINE )
+
 # convert data type strings in descriptor to internal datatype
 datatype_name_convert = {
     'float': 'float',
@@ -198,6 +209,58 @@ def guessDataType(val):
     # assume string otherwise
     return 'string'
 
+class FloatColumn(object):
+    """A column of numerical values read from a stream.
+
+    Values are appended one at a time, or in arrays by the fast
+    numeric reader. They are kept as numpy arrays, rather than as a
+    list of python floats.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.chunksize = 0
+        self._newValues()
+
+    def _newValues(self):
+        """Start a new list of individually appended values."""
+        self.values = []
+        self.append = self.values.append
+
+    def _flush(self):
+        """Move individually appended values to the chunks."""
+        if self.values:
+            self.chunks.append( N.array(self.values, dtype=N.float64) )
+            self.chunksize += len(self.values)
+            self._newValues()
+
+    def extend(self, vals):
+        """Add an array of values."""
+        self._flush()
+        self.chunks.append(vals)
+        self.chunksize += len(vals)
+
+    def array(self):
+        """Return values as a numpy array."""
+        self._flush()
+        if len(self.chunks) != 1:
+            if self.chunks:
+                self.chunks = [N.concatenate(self.chunks)]
+            else:
+                self.chunks = [N.zeros(0, dtype=N.float64)]
+        return self.chunks[0]
+
+    def __len__(self):
+        return self.chunksize + len(self.values)
+
+    def __getitem__(self, key):
+        return self.array()[key]
+
+    def __delitem__(self, key):
+        vals = N.delete(self.array(), N.arange(len(self))[key])
+        self.chunks = [vals]
+        self.chunksize = len(vals)
+
 class DescriptorPart(object):
     """Represents part of a descriptor."""
 
@@ -246,15 +309,24 @@ class DescriptorPart(object):
                 # \0 is used as the user cannot enter it
                 fullname = '%s\0%s' % (name, col)
 
+                if not self.datatype:
+                    # try to guess type of data
+                    self.datatype = guessDataType(val)
+
                 # get dataset (or get new one)
                 try:
                     dataset = thedatasets[fullname]
                 except KeyError:
-                    dataset = thedatasets[fullname] = []
-
-                if not self.datatype:
-                    # try to guess type of data
-                    self.datatype = guessDataType(val)
+                    if self.datatype == 'float':
+                        dataset = FloatColumn()
+                    else:
+                        dataset = []
+                    thedatasets[fullname] = dataset
+                else:
+                    if ( isinstance(dataset, FloatColumn) and
+                         self.datatype != 'float' ):
+                        # a part with the same name had a different type
+                        dataset = thedatasets[fullname] = list(dataset.array())
 
                 # convert according to datatype
                 if self.datatype == 'float':
@@ -321,6 +393,11 @@ class DescriptorPart(object):
                     if ds is not None and len(ds) != minlength:
                         del ds[minlength:]
 
+                # numerical columns are converted to arrays
+                vals, pos, neg, sym = [
+                    ds.array() if isinstance(ds, FloatColumn) else ds
+                    for ds in (vals, pos, neg, sym) ]
+
                 # only remember last N values
                 if tail is not None:
                     vals = vals[-tail:]
@@ -370,6 +447,29 @@ class Stream(object):
         """Initialise stream object."""
         self.remainingline = []
 
+    def readLines(self, num):
+        """Read up to num lines of the data source for the fast
+        numeric reader, returning an empty list at the end.
+
+        None is returned if the stream does not support this, or the
+        lines need interpreting by newLine.
+        """
+        return None
+
+    def splitLine(self, line):
+        """Break up line and append its items to the current line.
+
+        Returns True if the line is continued on the next line.
+        """
+        cmpts = self.find_re.findall(line)
+        self.remainingline += [ x for x in cmpts if x[0] not in '#!%;']
+
+        if self.remainingline and self.remainingline[-1] == '\\':
+            # this is a continuation: drop this item
+            self.remainingline.pop()
+            return True
+        return False
+
     def nextColumn(self):
         """Return value of next column of line."""
         try:
@@ -402,13 +502,8 @@ class Stream(object):
                 return False
 
             # break up and append to buffer (removing comments)
-            cmpts = self.find_re.findall(line)
-            self.remainingline += [ x for x in cmpts if x[0] not in '#!%;']
-
-            if self.remainingline and self.remainingline[-1] == '\\':
-                # this is a continuation: drop this item and read next line
-                self.remainingline.pop()
-            else:
+            # if this is a continuation, read next line
+            if not self.splitLine(line):
                 return True
 
 class FileStream(Stream):
@@ -424,6 +519,10 @@ class FileStream(Stream):
         StopIteration is raised if there is no more data."""
         return cnext(self.file)
 
+    def readLines(self, num):
+        """Read up to num lines of the data source."""
+        return list( itertools.islice(self.file, num) )
+
 class StringStream(FileStream):
     '''For reading data from a string.'''
     
@@ -482,14 +581,23 @@ class SimpleRead(object):
     tail attribute if set says to only use last tail data points when setting
     '''
 
+    # number of lines read at a time by the fast numeric reader
+    chunklines = 16384
+    # maximum number of columns read by the fast numeric reader
+    maxslots = 4096
+
     def __init__(self, descriptor):
         # convert descriptor to part objects
         descriptor = descriptor.strip()
+        self.descriptor = descriptor
         self._parseDescriptor(descriptor)
 
         # construct data names automatically
         self.autodescr = (descriptor == '')
 
+        # optional ImportProgress to update while reading
+        self.progress = None
+
         # get read for reading data
         self.clearState()
 
@@ -499,6 +607,11 @@ class SimpleRead(object):
         self.blocks = None
         self.tail = None
 
+    def _updateProgress(self, rows):
+        """Add rows read to the progress, if set."""
+        if self.progress is not None:
+            self.progress.update(rows)
+
     def _parseDescriptor(self, descriptor):
         """Take a descriptor, and parse it into its individual parts."""
         self.parts = interpretDescriptor(descriptor)
@@ -517,46 +630,366 @@ class SimpleRead(object):
         else:
             self._readDataUnblocked(stream, ignoretext)
 
-    def _readDataUnblocked(self, stream, ignoretext):
-        """Read in that data from the stream."""
+    def readFileParallel(self, filename, encoding, processes,
+                         ignoretext=False):
+        """Read unblocked data from filename, reading chunks of the
+        file in parallel using the number of processes given.
 
+        If a chunk contains descriptor statements, new columns with
+        an automatic descriptor, or columns of new types, or a
+        continuation line at its end, the rest of the file is read
+        serially.
+        """
+
+        self.ignoretext = ignoretext
+        chunks = None
+        if parallel.available():
+            chunks = parallel.splitFile(filename, encoding)
+        if chunks is None or len(chunks) == 1:
+            self.readData(
+                FileStream(utils.openEncoding(filename, encoding)),
+                ignoretext=ignoretext)
+            return
+
+        # the first chunk is read here to get the state for the others
         allparts = list(self.parts)
+        stream = FileStream(
+            utils.openEncoding(filename, encoding, byterange=chunks[0]))
+        self._readLinesUnblocked(stream, allparts)
+        state = self._chunkState()
+        serialfrom = None
+        if stream.remainingline:
+            # last line continued into next chunk: start again
+            serialfrom = 0
+            self.datasets = {}
+            self._parseDescriptor(self.descriptor)
+            self.autodescr = (self.descriptor == '')
+            allparts = list(self.parts)
+        else:
+            # a copy of this reader without data for the other chunks
+            reader = self._chunkReader()
+            args = [ (reader, filename, encoding, c)
+                     for c in chunks[1:] ]
+            results = parallel.mapChunks(_readChunk, args, processes)
+            try:
+                for i, (data, errors, chunkstate) in enumerate(results):
+                    if chunkstate != state:
+                        serialfrom = i+1
+                        break
+                    self._addChunk(data, errors)
+                    if self.progress is not None:
+                        self.progress.update(bytesread=chunks[i+1][1])
+            finally:
+                results.close()
+
+        if serialfrom is not None:
+            # read the rest of the file from the start of the chunk
+            stream = FileStream(
+                utils.openEncoding(
+                    filename, encoding, offset=chunks[serialfrom][0]))
+            self._readLinesUnblocked(stream, allparts)
 
-        # loop over lines
-        while stream.newLine():
-            if stream.remainingline[:1] == ['descriptor']:
-                # a change descriptor statement
-                descriptor =  ' '.join(stream.remainingline[1:])
-                self._parseDescriptor(descriptor)
-                allparts += self.parts
-                self.autodescr = False
-            elif ( self.ignoretext and len(stream.remainingline) > 0 and 
-                   text_start_re.match(stream.remainingline[0]) and
-                   len(self.parts) > 0 and
-                   self.parts[0].datatype != 'string' and
-                   stream.remainingline[0] not in ('inf', 'nan') ):
-                # ignore the line if it is text and ignore text is on
-                # and first column is not text
-                pass
+        self.parts = allparts
+        self.blocks = None
+
+    def _chunkState(self):
+        """State of reader which has to stay the same for chunks to be
+        read in parallel."""
+        return (
+            self.autodescr,
+            tuple( [ (p.name, p.datatype, p.columns, p.startindex,
+                      p.stopindex) for p in self.parts ] ) )
+
+    def _chunkReader(self):
+        """Make a copy of the reader, without data, for reading a
+        chunk."""
+        reader = SimpleRead.__new__(SimpleRead)
+        reader.__dict__.update(self.__dict__)
+        reader.datasets = {}
+        reader.progress = None
+        reader.parts = [self._copyPart(p) for p in self.parts]
+        return reader
+
+    def _copyPart(self, part):
+        """Copy of descriptor part without errors."""
+        newp = DescriptorPart.__new__(DescriptorPart)
+        newp.__dict__.update(part.__dict__)
+        newp.errorcount = 0
+        return newp
+
+    def tailReader(self):
+        """Make a copy of the reader, without data, to continue
+        reading with readDataTail."""
+        reader = self._chunkReader()
+        copies = dict(
+            (id(p), newp) for p, newp in czip(self.parts, reader.parts))
+        reader.lastparts = [
+            copies.get(id(p)) or self._copyPart(p) for p in self.lastparts]
+        return reader
+
+    def _addChunk(self, data, errors):
+        """Add data and number of errors for each part read from a
+        chunk."""
+
+        for name, vals in citems(data):
+            dataset = self.datasets.get(name)
+            if isinstance(vals, N.ndarray):
+                if dataset is None:
+                    dataset = self.datasets[name] = FloatColumn()
+                elif not isinstance(dataset, FloatColumn):
+                    vals = list(vals)
+                dataset.extend(vals)
             else:
-                # normal text
-                for p in self.parts:
-                    p.readFromStream(stream, self.datasets)
+                if dataset is None:
+                    dataset = self.datasets[name] = []
+                elif isinstance(dataset, FloatColumn):
+                    dataset = self.datasets[name] = list(dataset.array())
+                dataset.extend(vals)
 
-                # automatically create parts if data are remaining
-                if self.autodescr:
-                    while len(stream.remainingline) > 0:
-                        p = DescriptorPart(
-                            str(len(self.parts)+1), None, 'D', None )
-                        p.readFromStream(stream, self.datasets)
-                        self.parts.append(p)
-                        allparts.append(p)
+        for p, num in czip(self.parts, errors):
+            p.errorcount += num
 
-            stream.flushLine()
+    def _readDataUnblocked(self, stream, ignoretext):
+        """Read in that data from the stream."""
 
+        allparts = list(self.parts)
+        self._readLinesUnblocked(stream, allparts)
+        self.lastparts = self.parts
         self.parts = allparts
         self.blocks = None
 
+    def readDataTail(self, stream):
+        """Continue reading unblocked data from the stream, from where
+        the last call to readData finished."""
+
+        allparts = self.parts
+        self.parts = self.lastparts
+        self._readLinesUnblocked(stream, allparts)
+        self.lastparts = self.parts
+        self.parts = allparts
+
+    def _readLinesUnblocked(self, stream, allparts):
+        """Read the lines from the stream, leaving parts as the
+        current parts. Parts from descriptor statements are added to
+        allparts."""
+
+        lines = stream.readLines(self.chunklines)
+        if lines is not None:
+            # use fast reader for lines only containing numbers
+            self._readNumericChunks(stream, allparts, lines)
+        else:
+            # loop over lines
+            while stream.newLine():
+                self._interpretLine(stream, allparts)
+                stream.flushLine()
+                self._updateProgress(1)
+
+    def _interpretLine(self, stream, allparts):
+        """Interpret the current line of the stream, when reading
+        unblocked data."""
+
+        if stream.remainingline[:1] == ['descriptor']:
+            # a change descriptor statement
+            descriptor =  ' '.join(stream.remainingline[1:])
+            self._parseDescriptor(descriptor)
+            allparts += self.parts
+            self.autodescr = False
+        elif ( self.ignoretext and len(stream.remainingline) > 0 and
+               text_start_re.match(stream.remainingline[0]) and
+               len(self.parts) > 0 and
+               self.parts[0].datatype != 'string' and
+               stream.remainingline[0] not in ('inf', 'nan') ):
+            # ignore the line if it is text and ignore text is on
+            # and first column is not text
+            pass
+        else:
+            # normal text
+            for p in self.parts:
+                p.readFromStream(stream, self.datasets)
+
+            # automatically create parts if data are remaining
+            if self.autodescr:
+                while len(stream.remainingline) > 0:
+                    p = DescriptorPart(
+                        str(len(self.parts)+1), None, 'D', None )
+                    p.readFromStream(stream, self.datasets)
+                    self.parts.append(p)
+                    allparts.append(p)
+
+    def _updateNumericSlots(self):
+        """Work out which datasets are read from each column of a line
+        by the fast numeric reader.
+
+        This sets numslots to a list of (part, dataset name) for the
+        columns (the name is None for ignored columns), numfloat to
+        the number of initial columns which can be read by the fast
+        reader, and numtruncated if the list was truncated at maxslots
+        columns.
+        """
+
+        slots = []
+        truncated = False
+        for p in self.parts:
+            for index in crange(p.startindex, p.stopindex+1):
+                name = p.name if p.single else '%s_%i' % (p.name, index)
+                for col in p.columns:
+                    if col == ',':
+                        slots.append( (p, None) )
+                    else:
+                        slots.append( (p, '%s\0%s' % (name, col)) )
+                if len(slots) >= self.maxslots:
+                    truncated = True
+                    break
+            if truncated:
+                break
+
+        # columns have to be numerical, and values for a dataset
+        # must come from a single column to keep their order
+        nfloat = 0
+        names = set()
+        for p, name in slots:
+            if p.datatype != 'float' or name in names:
+                break
+            if name is not None:
+                names.add(name)
+            nfloat += 1
+
+        self.numslots = slots
+        self.numfloat = nfloat
+        self.numtruncated = truncated
+
+    def _numericColumnsOK(self, ncols):
+        """Can a line with ncols numbers be read by the fast reader?"""
+        return ncols <= self.numfloat or (
+            self.numfloat == len(self.numslots) and
+            not self.numtruncated and not self.autodescr )
+
+    def _storeNumeric(self, tokens, nlines, ncols):
+        """Convert tokens from nlines lines of ncols numbers and add
+        them to the datasets."""
+
+        slots = self.numslots
+        try:
+            vals = N.array(tokens, dtype=N.float64)
+        except ValueError:
+            # convert individually, counting errors in the columns read
+            vals = N.empty(len(tokens), dtype=N.float64)
+            for i, tok in enumerate(tokens):
+                try:
+                    vals[i] = float(tok)
+                except ValueError:
+                    vals[i] = N.nan
+                    if i % ncols < len(slots):
+                        slots[i % ncols][0].errorcount += 1
+        vals.shape = (nlines, ncols)
+
+        for col in crange(min(ncols, len(slots))):
+            name = slots[col][1]
+            if name is None:
+                continue
+            try:
+                dataset = self.datasets[name]
+            except KeyError:
+                dataset = self.datasets[name] = FloatColumn()
+            dataset.extend( N.ascontiguousarray(vals[:,col]) )
+
+    def _readNumericChunk(self, lines):
+        """Read a chunk of lines in one go if they only contain the
+        same number of numerical columns (or are blank).
+
+        Returns whether the lines were read.
+        """
+
+        text = ''.join(lines)
+        if ( numeric_special_re.search(text) is not None or
+             line_text_start_re.search(text) is not None ):
+            return False
+
+        split = type(lines[0]).split
+        counts = N.array( list(map(len, map(split, lines))), dtype=N.intp )
+        counts = counts[counts != 0]
+        if len(counts) == 0:
+            # only blank lines
+            return True
+        ncols = int(counts[0])
+        if (counts != ncols).any() or not self._numericColumnsOK(ncols):
+            return False
+
+        self._storeNumeric(text.split(), len(counts), ncols)
+        return True
+
+    def _readNumericChunks(self, stream, allparts, lines):
+        """Read data from stream in chunks of lines, converting
+        consecutive lines containing the same number of numerical
+        columns together.
+
+        Other lines are split and interpreted as normal.
+        """
+
+        self._updateNumericSlots()
+
+        while lines:
+            self._updateProgress(len(lines))
+            if self._readNumericChunk(lines):
+                lines = stream.readLines(self.chunklines)
+                continue
+
+            # tokens for current run of lines with ncols columns
+            tokens = []
+            nlines = ncols = 0
+
+            it = iter(lines)
+            for line in it:
+                items = line.split()
+                num = len(items)
+                if num == 0:
+                    # blank lines are ignored
+                    continue
+
+                if ( self._numericColumnsOK(num) and
+                     numeric_special_re.search(line) is None and
+                     text_start_re.match(items[0]) is None ):
+                    # line only contains numbers for numeric parts
+                    if num != ncols:
+                        if nlines:
+                            self._storeNumeric(tokens, nlines, ncols)
+                        tokens = []
+                        nlines = 0
+                        ncols = num
+                    tokens += items
+                    nlines += 1
+                    continue
+
+                # finish run of lines read so far
+                if nlines:
+                    self._storeNumeric(tokens, nlines, ncols)
+                    tokens = []
+                    nlines = ncols = 0
+
+                # interpret line as normal, reading continuation lines
+                cont = stream.splitLine(line)
+                while cont:
+                    line = next(it, None)
+                    if line is None:
+                        try:
+                            line = stream.readLine()
+                        except StopIteration:
+                            # file finished without end of line
+                            # (the items are left in the stream)
+                            return
+                    cont = stream.splitLine(line)
+
+                self._interpretLine(stream, allparts)
+                stream.flushLine()
+
+                # parts or their types may have changed
+                self._updateNumericSlots()
+
+            if nlines:
+                self._storeNumeric(tokens, nlines, ncols)
+
+            lines = stream.readLines(self.chunklines)
+
     def _readDataBlocked(self, stream, ignoretext):
         """Read in the data, using blocks."""
 
@@ -591,6 +1024,7 @@ class SimpleRead(object):
 
             # lose remaining data
             stream.flushLine()
+            self._updateProgress(1)
 
         self.parts = allparts
         self.blocks = list(blocks.keys())
@@ -641,6 +1075,29 @@ class SimpleRead(object):
 #####################################################################
 # 2D data reading
 
+def _readChunk(args):
+    """Read a chunk of a file with a copy of a SimpleRead object in a
+    separate process.
+
+    Returns the data read, the number of conversion errors for each
+    part and the final state of the reader (None if the chunk ended
+    with a continued line).
+    """
+
+    reader, filename, encoding, byterange = args
+    stream = FileStream(
+        utils.openEncoding(filename, encoding, byterange=byterange))
+    reader._readLinesUnblocked(stream, list(reader.parts))
+
+    data = {}
+    for name, dataset in citems(reader.datasets):
+        if isinstance(dataset, FloatColumn):
+            dataset = dataset.array()
+        data[name] = dataset
+    errors = [p.errorcount for p in reader.parts]
+    state = None if stream.remainingline else reader._chunkState()
+    return data, errors, state
+
 class Read2DError(base.ImportingError):
     pass
 
@@ -68,6 +68,14 @@ def convertNumpyNegAbs(a):
     else:
         return -N.abs( convertNumpy(a) )
 
+def readOnlyView(a):
+    """Return a read-only view of numpy array a, or None if None."""
+    if a is None:
+        return None
+    a = a.view()
+    a.flags.writeable = False
+    return a
+
 def copyOrNone(a):
     """Return a copy if not None, or None."""
     if a is None:
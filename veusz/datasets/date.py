@@ -83,6 +83,11 @@ class DatasetDateTime(DatasetDateTimeBase):
         self.data = convertNumpy(data)
         self.perr = self.nerr = self.serr = None
 
+    def appendValues(self, data):
+        """Append date values to the dataset.
+        The document is not told about the change."""
+        self._appendColumns({'data': convertNumpy(data)})
+
     def saveDataDumpToText(self, fileobj, name):
         '''Save data to file.
         '''
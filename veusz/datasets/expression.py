@@ -70,6 +70,26 @@ def substituteDatasets(datasets, expression, thispart):
 
     return ''.join(bits), dslist
 
+def recordExpressionDependencies(doc, expression):
+    """Record the datasets and custom definitions an expression could
+    use in the document dependency graph.
+
+    Names which are not datasets are included, so that the expression
+    is updated if a dataset with that name is later created.
+    """
+
+    deps = doc.dependencies
+    deps.readCustoms()
+    for bit in dataexpr_split_re.split(expression):
+        if dataexpr_quote_re.match(bit):
+            bit = bit[1:-1]
+        if not bit:
+            continue
+        deps.readDataset(bit)
+        bitbits = bit.split('_')
+        if len(bitbits) > 1 and bitbits[-1] in dataexpr_columns:
+            deps.readDataset('_'.join(bitbits[:-1]))
+
 def _evaluateDataset(datasets, dsname, dspart):
     """Return the dataset given.
 
@@ -172,6 +192,7 @@ def evalDatasetExpression(doc, origexpr, datatype='numeric',
     Returns None if error
     """
 
+    doc.dependencies.readDataset(origexpr)
     d = doc.data.get(origexpr)
     if ( d is not None and
          d.datatype == datatype and
@@ -188,6 +209,8 @@ def evalDatasetExpression(doc, origexpr, datatype='numeric',
         # ignore blank names
         return None
 
+    recordExpressionDependencies(doc, origexpr)
+
     # replace dataset names by calls to _DS_(name,part)
     expr, subdatasets = substituteDatasets(doc.data, origexpr, part)
 
@@ -243,7 +266,6 @@ class DatasetExpression(Dataset1DBase):
         self.expr['perr'] = perr
         self.parametric = parametric
 
-        self.docchangeset = -1
         self.evaluated = {}
 
     def evaluateDataset(self, dsname, dspart):
@@ -259,6 +281,8 @@ class DatasetExpression(Dataset1DBase):
 
         Returns True if succeeded
         """
+        recordExpressionDependencies(self.document, expr)
+
         # replace dataset names with calls
         newexpr = substituteDatasets(self.document.data, expr, part)[0]
 
@@ -321,19 +345,19 @@ class DatasetExpression(Dataset1DBase):
         Returns False if problem with any evaluation
         """
         ok = True
-        if self.docchangeset != self.document.changeset:
-            # avoid infinite recursion!
-            self.docchangeset = self.document.changeset
-
-            # zero out previous values
-            for part in self.columns:
-                self.evaluated[part] = None
-
-            # update all parts
-            for part in self.columns:
-                expr = self.expr[part]
-                if expr is not None and expr.strip() != '':
-                    ok = ok and self._evaluatePart(expr, part)
+        deps = self.document.dependencies
+        if not deps.isValid(self):
+            # only reevaluate if anything read has changed
+            with deps.evaluating(self):
+                # zero out previous values
+                for part in self.columns:
+                    self.evaluated[part] = None
+
+                # update all parts
+                for part in self.columns:
+                    expr = self.expr[part]
+                    if expr is not None and expr.strip() != '':
+                        ok = ok and self._evaluatePart(expr, part)
 
         return ok
 
@@ -461,7 +485,6 @@ class Dataset2DXYZExpression(Dataset2DBase):
         Parameters are mathematical expressions based on datasets."""
         Dataset2DBase.__init__(self)
 
-        self.lastchangeset = -1
         self.cacheddata = None
         self.xedge = self.yedge = self.xcent = self.ycent = None
 
@@ -482,20 +505,26 @@ class Dataset2DXYZExpression(Dataset2DBase):
         """Return the evaluated dataset."""
 
         # FIXME: handle irregular grids
-        # return cached data if document unchanged
-        if self.document.changeset == self.lastchangeset:
+        # return cached data if inputs unchanged
+        deps = self.document.dependencies
+        if deps.isValid(self):
             return self.cacheddata
-        self.lastchangeset = self.document.changeset
-        self.cacheddata = None
+        with deps.evaluating(self):
+            self.cacheddata = self._evalDatasetUncached()
+        return self.cacheddata
+
+    def _evalDatasetUncached(self):
+        """Evaluate the dataset, returning None if error."""
 
         evaluated = {}
 
-        environment = self.document.evaulate.context.copy()
+        environment = self.document.evaluate.context.copy()
         environment['_DS_'] = self.evaluateDataset
 
         # evaluate the x, y and z expressions
         for name in ('exprx', 'expry', 'exprz'):
             origexpr = getattr(self, name)
+            recordExpressionDependencies(self.document, origexpr)
             expr = substituteDatasets(self.document.data, origexpr, 'data')[0]
 
             comp = self.document.evaluate.compileCheckedExpression(
@@ -517,20 +546,20 @@ class Dataset2DXYZExpression(Dataset2DBase):
         self._xrange = (minx-stepx*0.5, maxx+stepx*0.5)
         self._yrange = (miny-stepy*0.5, maxy+stepy*0.5)
 
-        self.cacheddata = N.empty( (stepsy, stepsx) )
-        self.cacheddata[:,:] = N.nan
+        data = N.empty( (stepsy, stepsx) )
+        data[:,:] = N.nan
         xpts = ((1./stepx)*(evaluated['exprx']-minx)).astype('int32')
         ypts = ((1./stepy)*(evaluated['expry']-miny)).astype('int32')
 
         # this is ugly - is this really the way to do it?
         try:
-            self.cacheddata.flat [ xpts + ypts*stepsx ] = evaluated['exprz']
+            data.flat [ xpts + ypts*stepsx ] = evaluated['exprz']
         except Exception as e:
             self.document.log(_("Shape mismatch when constructing dataset\n"
                                 "Error: %s") % cstr(e) )
             return None
 
-        return self.cacheddata
+        return data
 
     @property
     def xrange(self):
@@ -585,7 +614,6 @@ class Dataset2DExpression(Dataset2DBase):
         Dataset2DBase.__init__(self)
 
         self.expr = expr
-        self.lastchangeset = -1
 
     @property
     def data(self):
@@ -631,7 +659,8 @@ class Dataset2DExpression(Dataset2DBase):
 
     def evalDataset(self):
         """Do actual evaluation."""
-        return self.document.evalDatasetExpression(self.expr, dimensions=2)
+        return self.document.evaluate.evalDatasetExpression(
+            self.expr, dimensions=2)
 
     def saveDataRelationToText(self, fileobj, name):
         '''Save expression to file.'''
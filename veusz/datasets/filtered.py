@@ -43,7 +43,6 @@ class DatasetFilterGenerator(object):
         replaceblanks = replace filtered values by nans
         """
 
-        self.changeset = -1
         self.inexpr = inexpr
         self.indatasets = indatasets
         self.prefix = prefix
@@ -82,9 +81,10 @@ class DatasetFilterGenerator(object):
 
     def checkUpdate(self, doc):
         """Check whether datasets need to be updated."""
-        if doc.changeset != self.changeset:
-            self.changeset = doc.changeset
-            log = self.evaluateFilter(doc)
+        deps = doc.dependencies
+        if not deps.isValid(self):
+            with deps.evaluating(self):
+                log = self.evaluateFilter(doc)
             if log:
                 doc.log('\n'.join(log)+'\n')
 
@@ -116,6 +116,7 @@ class DatasetFilterGenerator(object):
         # do filtering of datasets
         log = []
         for name in self.indatasets:
+            doc.dependencies.readDataset(name)
             ds = doc.data.get(name)
             if ds is None:
                 continue
@@ -173,21 +174,21 @@ class DatasetFiltered(DatasetBase):
         self.generator = gen
         self.namein = name
         self.document = doc
-        self.changeset = -1
         self._internalds = None
         self.tags = set()
 
     def _checkUpdate(self):
-        """Recalculate if document has changed."""
-        if self.document.changeset != self.changeset:
-            self.generator.checkUpdate(self.document)
-            self.changeset = self.document.changeset
-
-            ds = self.generator.outdatasets.get(self.namein)
-            if ds is None:
-                self._internalds = Dataset(data=[])
-            else:
-                self._internalds = ds
+        """Recalculate if generator has changed."""
+        deps = self.document.dependencies
+        if not deps.isValid(self):
+            with deps.evaluating(self):
+                self.generator.checkUpdate(self.document)
+
+                ds = self.generator.outdatasets.get(self.namein)
+                if ds is None:
+                    self._internalds = Dataset(data=[])
+                else:
+                    self._internalds = ds
 
     def linkedInformation(self):
         return _("Filtered '%s' using '%s'") % (
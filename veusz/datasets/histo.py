@@ -41,8 +41,6 @@ class DatasetHistoGenerator(object):
         errors = True/False
         """
 
-        self.changeset = -1
-
         self.document = document
         self.inexpr = inexpr
         self.binmanual = binmanual
@@ -57,17 +55,18 @@ class DatasetHistoGenerator(object):
 
     def getData(self):
         """Get data from input expression, caching result."""
-        if self.document.changeset != self.changeset:
-            d = evalDatasetExpression(self.document, self.inexpr)
-            if d is not None:
-                d = d.data
-                # only use finite data
-                d = d[N.isfinite(d)]
-                if len(d) == 0:
-                    d = None
-
-            self._cacheddata = d
-            self.changeset = self.document.changeset
+        deps = self.document.dependencies
+        if not deps.isValid(self):
+            with deps.evaluating(self):
+                d = evalDatasetExpression(self.document, self.inexpr)
+                if d is not None:
+                    d = d.data
+                    # only use finite data
+                    d = d[N.isfinite(d)]
+                    if len(d) == 0:
+                        d = None
+
+                self._cacheddata = d
         return self._cacheddata
 
     def binLocations(self):
@@ -222,13 +221,13 @@ class DatasetHistoBins(Dataset1DBase):
         self.document = document
         self.linked = None
         self._invalidpoints = None
-        self.changeset = -1
 
     def getData(self):
         """Get bin positions, caching results."""
-        if self.changeset != self.generator.document.changeset:
-            self.datacache = self.generator.getBinLocations()
-            self.changeset = self.generator.document.changeset
+        deps = self.document.dependencies
+        if not deps.isValid(self):
+            with deps.evaluating(self):
+                self.datacache = self.generator.getBinLocations()
         return self.datacache
 
     def linkedInformation(self):
@@ -257,13 +256,13 @@ class DatasetHistoValues(Dataset1DBase):
         self.document = document
         self.linked = None
         self._invalidpoints = None
-        self.changeset = -1
 
     def getData(self):
         """Get bin heights, caching results."""
-        if self.changeset != self.generator.document.changeset:
-            self.datacache = self.generator.getBinVals()
-            self.changeset = self.generator.document.changeset
+        deps = self.document.dependencies
+        if not deps.isValid(self):
+            with deps.evaluating(self):
+                self.datacache = self.generator.getBinVals()
         return self.datacache
 
     def saveDataRelationToText(self, fileobj, name):
@@ -18,6 +18,8 @@
 
 """One dimensional datasets."""
 
+import time
+
 import numpy as N
 
 from .commonfn import _
@@ -39,6 +41,35 @@ class Dataset1DBase(DatasetConcreteBase):
 
     # subclasses must define .data, .serr, .perr, .nerr
 
+    # buffers with space after the values of columns, for appending
+    _appendbuffers = None
+
+    def _appendColumns(self, vals):
+        """Append arrays of values to the columns in dict vals.
+
+        Columns are kept at the start of buffers with space for more
+        values, which are reallocated with twice the number of values
+        when full, so appending takes constant time per value on
+        average. Only the buffers after the values in use are written
+        to, so arrays previously returned for the columns are not
+        changed.
+        """
+
+        if self._appendbuffers is None:
+            self._appendbuffers = {}
+        for col, new in citems(vals):
+            old = getattr(self, col)
+            num = len(old)
+            buf, view = self._appendbuffers.get(col, (None, None))
+            if view is not old or len(buf) < num+len(new):
+                # column was replaced or buffer is full
+                buf = N.zeros(max(1024, 2*(num+len(new))), dtype=N.float64)
+                buf[:num] = old
+            buf[num:num+len(new)] = new
+            view = buf[:num+len(new)]
+            self._appendbuffers[col] = (buf, view)
+            setattr(self, col, view)
+
     def userSize(self):
         """Size of dataset."""
         return str( self.data.shape[0] )
@@ -171,6 +202,29 @@ class Dataset(Dataset1DBase):
             if x is not None and x.shape != s:
                 raise DatasetException('Lengths of error data do not match data')
 
+    def appendValues(self, data, serr=None, perr=None, nerr=None):
+        """Append values to the dataset.
+
+        Values should be given for the columns the dataset has.
+        The document is not told about the change.
+        """
+
+        vals = {
+            'data': convertNumpy(data),
+            'serr': convertNumpyAbs(serr),
+            'perr': convertNumpyAbs(perr),
+            'nerr': convertNumpyNegAbs(nerr),
+            }
+        for col in self.columns:
+            if (getattr(self, col) is None) != (vals[col] is None) or (
+                    vals[col] is not None and
+                    len(vals[col]) != len(vals['data'])):
+                raise DatasetException(
+                    'Appended values do not match columns of dataset')
+
+        self._appendColumns(
+            dict((c, v) for c, v in citems(vals) if v is not None))
+
     def changeValues(self, thetype, vals):
         """Change the requested part of the dataset to vals.
 
@@ -249,6 +303,343 @@ class Dataset(Dataset1DBase):
 
         self.document.modifiedData(self)
 
+class _ChunkedRanges(object):
+    """Mixin for 1D datasets computing ranges and invalid points in
+    chunks, so that only a chunk of the values is in memory at once.
+
+    Subclasses define __len__ and _chunkColumns(sl), returning the
+    values of data, serr, nerr and perr in slice sl as float64 arrays
+    (or None).
+    """
+
+    # number of values in each chunk when computing ranges
+    chunksize = 1048576
+
+    def _chunks(self):
+        """Iterate over slices of chunks of the data."""
+        length = len(self)
+        for i in crange(0, length, self.chunksize):
+            yield slice(i, min(i+self.chunksize, length))
+
+    def _pointRanges(self, sl):
+        """Get float64 (minima, maxima) of points in slice."""
+
+        data, serr, nerr, perr = self._chunkColumns(sl)
+        minvals = data.copy()
+        maxvals = data.copy()
+
+        if serr is not None:
+            minvals -= serr
+            maxvals += serr
+        if nerr is not None:
+            minvals += nerr
+        if perr is not None:
+            maxvals += perr
+        return minvals, maxvals
+
+    def invalidDataPoints(self):
+        """Return a numpy bool detailing which datapoints are invalid."""
+
+        invalid = N.zeros(len(self), dtype=N.bool_)
+        for sl in self._chunks():
+            for col in self._chunkColumns(sl):
+                if col is not None:
+                    invalid[sl] |= ~N.isfinite(col)
+        return invalid
+
+    def getPointRanges(self):
+        '''Get range of coordinates for each point in the form
+        (minima, maxima).'''
+        minvals, maxvals = self._pointRanges(slice(None))
+        return ( minvals[N.isfinite(minvals)],
+                 maxvals[N.isfinite(maxvals)] )
+
+    def getRange(self):
+        '''Get total range of coordinates. Returns None if empty.'''
+
+        minval = maxval = None
+        for sl in self._chunks():
+            minvals, maxvals = self._pointRanges(sl)
+            minvals = minvals[N.isfinite(minvals)]
+            maxvals = maxvals[N.isfinite(maxvals)]
+            if len(minvals) > 0:
+                v = minvals.min()
+                minval = v if minval is None else min(minval, v)
+            if len(maxvals) > 0:
+                v = maxvals.max()
+                maxval = v if maxval is None else max(maxval, v)
+
+        if minval is None or maxval is None:
+            return None
+        return (minval, maxval)
+
+    def rangeVisit(self, fn):
+        '''Call fn on chunks of data points and error values, in order
+        to get range.'''
+
+        for sl in self._chunks():
+            data, serr, nerr, perr = self._chunkColumns(sl)
+            fn(data)
+            if serr is not None:
+                fn(data - serr)
+                fn(data + serr)
+            if nerr is not None:
+                fn(data + nerr)
+            if perr is not None:
+                fn(data + perr)
+
+class DatasetMemmap(_ChunkedRanges, Dataset1DBase):
+    """1D dataset with read-only columns which are views of a file
+    (e.g. numpy memmap arrays), keeping their data type.
+
+    The columns are not copied into memory. Ranges and invalid
+    points are computed in chunks, so only part of the file has to be
+    read at once. The error columns are used as given, so serr and
+    perr should be positive and nerr negative.
+    """
+
+    dstype = _('Mapped')
+
+    def __init__(self, data, serr=None, nerr=None, perr=None,
+                 linked=None):
+        Dataset1DBase.__init__(self, linked=linked)
+
+        self.data = readOnlyView(data)
+        self.serr = readOnlyView(serr)
+        self.nerr = readOnlyView(nerr)
+        self.perr = readOnlyView(perr)
+
+        for x in self.serr, self.nerr, self.perr:
+            if x is not None and x.shape != self.data.shape:
+                raise DatasetException('Lengths of error data do not match data')
+
+    def _chunkColumns(self, sl):
+        """Get float64 values of columns in slice."""
+        return [ None if c is None else N.array(c[sl], dtype=N.float64)
+                 for c in (self.data, self.serr, self.nerr, self.perr) ]
+
+    def saveDataDumpToText(self, fileobj, name):
+        """Save data to file, reading all the data."""
+        self.returnCopy().saveDataDumpToText(fileobj, name)
+
+    def saveDataDumpToHDF5(self, group, name):
+        """Save dataset to HDF5, reading all the data."""
+        self.returnCopy().saveDataDumpToHDF5(group, name)
+
+class DatasetLazy(_ChunkedRanges, Dataset1DBase):
+    """1D dataset whose columns are only read when first used.
+
+    loadfn is called with no arguments when the data are first
+    needed, returning a dict mapping column names to values. length
+    is the length of the data and lazycolumns the names of the
+    columns loadfn will return.
+
+    If chunkfn is given, it is called with a slice to read only part
+    of the columns, returning a dict in the same way. Ranges and
+    invalid points are then computed by reading chunks, without
+    reading all the data.
+    """
+
+    def __init__(self, loadfn, length, lazycolumns=('data',),
+                 linked=None, chunkfn=None):
+        Dataset1DBase.__init__(self, linked=linked)
+        self.loadfn = loadfn
+        self.chunkfn = chunkfn
+        self.length = length
+        self.lazycolumns = tuple(lazycolumns)
+        self.loaded = None
+
+    def _convertColumns(self, vals):
+        """Convert dict of values read to float64 columns."""
+        return {
+            'data': convertNumpy(vals.get('data')),
+            'serr': convertNumpyAbs(vals.get('serr')),
+            'perr': convertNumpyAbs(vals.get('perr')),
+            'nerr': convertNumpyNegAbs(vals.get('nerr')),
+            }
+
+    def _load(self):
+        """Read the columns, if not already read."""
+        if self.loaded is None:
+            self.loaded = self._convertColumns(self.loadfn())
+        return self.loaded
+
+    data = property(lambda self: self._load()['data'])
+    serr = property(lambda self: self._load()['serr'])
+    perr = property(lambda self: self._load()['perr'])
+    nerr = property(lambda self: self._load()['nerr'])
+
+    def _chunkColumns(self, sl):
+        """Get values of columns in slice, only reading the slice if
+        the data have not been read."""
+        if self.loaded is not None or self.chunkfn is None:
+            cols = self._load()
+            return [ None if cols[c] is None else cols[c][sl]
+                     for c in ('data', 'serr', 'nerr', 'perr') ]
+        cols = self._convertColumns(self.chunkfn(sl))
+        return [cols[c] for c in ('data', 'serr', 'nerr', 'perr')]
+
+    def userSize(self):
+        """Size of dataset."""
+        return str(self.length)
+
+    def __len__(self):
+        return self.length
+
+    def description(self):
+        """Get description of dataset, without reading it."""
+
+        if 'serr' in self.lazycolumns:
+            templ = _("1D (length %i, symmetric errors)")
+        elif 'perr' in self.lazycolumns or 'nerr' in self.lazycolumns:
+            templ = _("1D (length %i, asymmetric errors)")
+        else:
+            templ = _("1D (length %i)")
+        return templ % self.length
+
+    def hasErrors(self):
+        '''Whether errors on dataset'''
+        return len(set(self.lazycolumns) & set(('serr', 'perr', 'nerr'))) > 0
+
+    def empty(self):
+        '''Is the data defined?'''
+        return self.length == 0
+
+    def saveDataDumpToText(self, fileobj, name):
+        """Save data to file, reading all the data."""
+        self.returnCopy().saveDataDumpToText(fileobj, name)
+
+    def saveDataDumpToHDF5(self, group, name):
+        """Save dataset to HDF5, reading all the data."""
+        self.returnCopy().saveDataDumpToHDF5(group, name)
+
+class DatasetStream(Dataset1DBase):
+    """1D dataset to which values can be appended quickly, e.g. when
+    capturing data.
+
+    Values are kept in buffers which are reallocated with twice the
+    number of values retained when full, so appending takes constant
+    time per value on average. If maxlength is set, only the last
+    maxlength values are kept. If maxage is set, only values appended
+    in the last maxage seconds are kept.
+
+    Appending only writes to the buffers after the values in use, so
+    arrays returned for the columns are not changed by later appends.
+    """
+
+    dstype = _('Stream')
+
+    # minimum size of buffers
+    minsize = 1024
+
+    def __init__(self, columns=('data',), maxlength=None, maxage=None,
+                 linked=None):
+        """Make an empty dataset.
+
+        columns: names of columns values are appended to
+        maxlength: maximum number of values to keep (or None)
+        maxage: maximum age of values to keep in seconds (or None)
+        """
+
+        Dataset1DBase.__init__(self, linked=linked)
+        self.streamcolumns = tuple(columns)
+        self.maxlength = maxlength
+        self.maxage = maxage
+
+        # buffers for each column (and times values were appended)
+        names = list(columns)
+        if maxage is not None:
+            names.append('\0time')
+        self.buffers = dict(
+            (c, N.zeros(self.minsize, dtype=N.float64)) for c in names)
+
+        # range of values in use in buffers
+        self.start = self.end = 0
+
+    def _column(self, col):
+        """Return values in use for column."""
+        buf = self.buffers.get(col)
+        if buf is None:
+            return None
+        return readOnlyView(buf[self.start:self.end])
+
+    data = property(lambda self: self._column('data'))
+    serr = property(lambda self: self._column('serr'))
+    perr = property(lambda self: self._column('perr'))
+    nerr = property(lambda self: self._column('nerr'))
+
+    def __len__(self):
+        return self.end - self.start
+
+    def _reserve(self, num):
+        """Make sure num more values can be added to the buffers."""
+
+        size = self.end - self.start
+        if self.end + num <= len(self.buffers['data']):
+            return
+
+        # copy values in use to start of new buffers
+        newsize = max(self.minsize, 2*(size+num))
+        for col, buf in list(citems(self.buffers)):
+            newbuf = N.zeros(newsize, dtype=N.float64)
+            newbuf[:size] = buf[self.start:self.end]
+            self.buffers[col] = newbuf
+        self.start, self.end = 0, size
+
+    def _trim(self, now):
+        """Remove values outside the window."""
+
+        if self.maxlength is not None:
+            self.start = max(self.start, self.end-self.maxlength)
+        if self.maxage is not None:
+            times = self.buffers['\0time'][self.start:self.end]
+            self.start += N.searchsorted(times, now-self.maxage)
+
+    def append(self, data, serr=None, perr=None, nerr=None):
+        """Append values to the columns of the dataset.
+
+        Values should be given for all the columns of the dataset.
+        The document is not told about the change.
+        """
+
+        vals = {
+            'data': convertNumpy(data),
+            'serr': convertNumpyAbs(serr),
+            'perr': convertNumpyAbs(perr),
+            'nerr': convertNumpyNegAbs(nerr),
+            }
+        num = len(vals['data'])
+        now = time.time()
+
+        for col in self.streamcolumns:
+            if vals[col] is None or len(vals[col]) != num:
+                raise DatasetException(
+                    'Lengths of appended values do not match')
+
+        if self.maxlength is not None and num > self.maxlength:
+            # only the last values would be kept
+            for col in vals:
+                if vals[col] is not None:
+                    vals[col] = vals[col][-self.maxlength:]
+            num = self.maxlength
+
+        self._reserve(num)
+        for col, buf in citems(self.buffers):
+            if col == '\0time':
+                buf[self.end:self.end+num] = now
+            else:
+                buf[self.end:self.end+num] = vals[col]
+        self.end += num
+        self._trim(now)
+
+    def saveDataDumpToText(self, fileobj, name):
+        """Save data to file."""
+        self.returnCopy().saveDataDumpToText(fileobj, name)
+
+    def saveDataDumpToHDF5(self, group, name):
+        """Save dataset to HDF5."""
+        self.returnCopy().saveDataDumpToHDF5(group, name)
+
 class DatasetRange(Dataset1DBase):
     """Dataset consisting of a range of values e.g. 1 to 10 in 10 steps."""
 
@@ -18,7 +18,7 @@
 
 from ..compat import cstr, citems
 
-from .oned import Dataset1DBase, Dataset
+from .oned import Dataset1DBase, Dataset, DatasetMemmap
 from .twod import Dataset2DBase, Dataset2D
 from .text import DatasetText
 from .date import DatasetDateTimeBase, DatasetDateTime
@@ -116,6 +116,10 @@ class Dataset1DPlugin(_DatasetPlugin, Dataset1DBase):
     perr = property( lambda self: self.getPluginData('perr'),
                      lambda self, val: None )
 
+class Dataset1DMemmapPlugin(Dataset1DPlugin, DatasetMemmap):
+    """1D dataset from a plugin with memory-mapped data, computing
+    ranges in chunks."""
+
 class Dataset2DPlugin(_DatasetPlugin, Dataset2DBase):
     """Return 2D dataset from a plugin."""
 
@@ -49,6 +49,11 @@ class DatasetText(DatasetConcreteBase):
         """Size of dataset."""
         return str( len(self.data) )
 
+    def appendValues(self, data):
+        """Append text values to the dataset.
+        The document is not told about the change."""
+        self.data.extend(data)
+
     def changeValues(self, type, vals):
         if type == 'data':
             self.data = list(vals)
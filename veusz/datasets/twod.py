@@ -321,7 +321,6 @@ class Dataset2DXYFunc(Dataset2DBase):
         self.xedge = self.yedge = self.xcent = self.ycent = None
 
         self.cacheddata = None
-        self.lastchangeset = -1
 
     @property
     def data(self):
@@ -335,9 +334,17 @@ class Dataset2DXYFunc(Dataset2DBase):
     def evalDataset(self):
         """Evaluate the 2d dataset."""
 
-        if self.document.changeset == self.lastchangeset:
+        deps = self.document.dependencies
+        if deps.isValid(self):
             return self.cacheddata
+        with deps.evaluating(self):
+            self.cacheddata = self._evalDatasetUncached()
+        return self.cacheddata
 
+    def _evalDatasetUncached(self):
+        """Do the evaluation of the 2d dataset."""
+
+        self.document.dependencies.readCustoms()
         env = self.document.evaluate.context.copy()
 
         xarange = N.arange(self.xstep[0], self.xstep[1]+self.xstep[2],
@@ -359,9 +366,6 @@ class Dataset2DXYFunc(Dataset2DBase):
 
         # ensure we get an array out of this (in case expr is scalar)
         data = data + xstep*0
-
-        self.cacheddata = data
-        self.lastchangeset = self.document.changeset
         return data
 
     def saveDataRelationToText(self, fileobj, name):
@@ -50,6 +50,7 @@ for kls, fn in (
         (datasets.DatasetHistoBins, _lazy_recreate_histo),
         (datasets.DatasetFiltered, _lazy_recreate_filtered),
         (datasets.Dataset1DPlugin, _lazy_recreate_plugin),
+        (datasets.Dataset1DMemmapPlugin, _lazy_recreate_plugin),
         (datasets.Dataset2DPlugin, _lazy_recreate_plugin),
         (datasets.DatasetTextPlugin, _lazy_recreate_plugin),
         ):
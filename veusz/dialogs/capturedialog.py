@@ -48,6 +48,8 @@ class CaptureDialog(VeuszDialog):
         self.numLinesStopEdit.setValidator(validator)
         self.timeStopEdit.setValidator(validator)
         self.tailEdit.setValidator(validator)
+        self.tailTimeEdit.setValidator(
+            qt4.QDoubleValidator(1e-2, 1e9, 2, self))
 
         # floating point values for interval
         self.updateIntervalsEdit.setValidator(
@@ -83,6 +85,17 @@ class CaptureDialog(VeuszDialog):
         # tail data
         self.tailCheck.toggled.connect(self.tailEdit.setEnabled)
 
+        # descriptor is not used for binary data
+        self.binaryCheck.toggled.connect(
+            lambda checked: self.descriptorEdit.setEnabled(not checked))
+
+        # list of sources to capture from together, each given as
+        # (method, arguments, dataset prefix)
+        self.sources = []
+        self.addSourceButton.clicked.connect(self.slotAddSource)
+        self.removeSourceButton.clicked.connect(self.slotRemoveSource)
+        self.tailTimeCheck.toggled.connect(self.tailTimeEdit.setEnabled)
+
         # user starts capture
         self.captureButton = self.buttonBox.addButton(
             _("Ca&pture"), qt4.QDialogButtonBox.ApplyRole )
@@ -134,17 +147,67 @@ class CaptureDialog(VeuszDialog):
         if fd.exec_() == qt4.QDialog.Accepted:
             self.filenameEdit.replaceAndAddHistory( fd.selectedFiles()[0] )
 
+    def getSource(self):
+        """Get the source entered as (method, arguments, prefix).
+
+        ValueError is raised if the port number is invalid."""
+
+        method = self.methodBG.checkedId()
+        if method == 0:
+            # file/socket
+            args = (self.filenameEdit.text(),)
+        elif method == 1:
+            # internet socket
+            args = (self.hostEdit.text(), int(self.portEdit.text()))
+        else:
+            # external program
+            args = (self.commandLineEdit.text(),)
+        return method, args, self.prefixEdit.text().strip()
+
+    def makeStream(self, method, args, binary):
+        """Create a capture stream for a source."""
+        if method == 0:
+            return capture.FileCaptureStream(*args, binary=binary)
+        elif method == 1:
+            return capture.SocketCaptureStream(*args, binary=binary)
+        else:
+            return capture.CommandCaptureStream(*args, binary=binary)
+
+    def slotAddSource(self):
+        """Add the source entered to the list of sources."""
+
+        try:
+            method, args, prefix = self.getSource()
+        except ValueError:
+            qt4.QMessageBox.critical(self, _("Invalid number"), _("Invalid number"))
+            return
+
+        self.sources.append( (method, args, prefix) )
+        text = ':'.join([cstr(a) for a in args])
+        if prefix:
+            text = _('%s (prefix %s)') % (text, prefix)
+        self.sourceList.addItem(text)
+
+    def slotRemoveSource(self):
+        """Remove the selected source from the list."""
+
+        row = self.sourceList.currentRow()
+        if row >= 0:
+            del self.sources[row]
+            self.sourceList.takeItem(row)
+
     def slotCaptureClicked(self):
         """User requested capture."""
 
-        # object to interpret data from stream
+        # describes data from stream
         descriptor = self.descriptorEdit.text()
-        simprd = simpleread.SimpleRead(descriptor)
+        binary = self.binaryCheck.isChecked()
 
         maxlines = None
         timeout = None
         updateinterval = None
         tail = None
+        tailtime = None
         try:
             stop = self.stopBG.checkedId()
             if stop == 1:
@@ -162,38 +225,47 @@ class CaptureDialog(VeuszDialog):
             if self.tailCheck.isChecked():
                 tail = int( self.tailEdit.text() )
 
+            # whether to only retain values from last T seconds
+            if self.tailTimeCheck.isChecked():
+                tailtime = float( self.tailTimeEdit.text() )
+
+            # capture from list of sources, or the one entered
+            sources = list(self.sources)
+            if not sources:
+                sources.append(self.getSource())
+
         except ValueError:
             qt4.QMessageBox.critical(self, _("Invalid number"), _("Invalid number"))
             return
-            
-        # get method of getting data
-        method = self.methodBG.checkedId()
-        try:
-            # create stream
-            if method == 0:
-                # file/socket
-                stream = capture.FileCaptureStream(self.filenameEdit.text())
-            elif method == 1:
-                # internet socket
-                stream = capture.SocketCaptureStream(
-                    self.hostEdit.text(),
-                    int(self.portEdit.text()) )
-            elif method == 2:
-                # external program
-                stream = capture.CommandCaptureStream(
-                    self.commandLineEdit.text())
-        except EnvironmentError as e:
-            # problem opening stream
-            qt4.QMessageBox.critical(self, _("Cannot open input"),
-                                     _("Cannot open input:\n"
-                                       " %s (error %i)") % (
-                    cstrerror(e), e.errno))
-            return
 
-        stream.maxlines = maxlines
-        stream.timeout = timeout
-        simprd.tail = tail
-        cd = CapturingDialog(self.document, simprd, stream, self,
+        session = capture.CaptureSession()
+        for method, args, prefix in sources:
+            try:
+                # create stream
+                stream = self.makeStream(method, args, binary)
+            except EnvironmentError as e:
+                # problem opening stream
+                session.close()
+                qt4.QMessageBox.critical(self, _("Cannot open input"),
+                                         _("Cannot open input:\n"
+                                           " %s (error %i)") % (
+                        cstrerror(e), e.errno))
+                return
+
+            stream.maxlines = maxlines
+            stream.timeout = timeout
+
+            # object to interpret data from stream
+            if binary:
+                store = capture.BinaryCaptureStore(
+                    maxlength=tail, maxage=tailtime, prefix=prefix)
+            else:
+                store = capture.CaptureStore(
+                    simpleread.SimpleRead(descriptor),
+                    maxlength=tail, maxage=tailtime, prefix=prefix)
+            session.addSource(stream, store)
+
+        cd = CapturingDialog(self.document, session, self,
                              updateinterval=updateinterval)
         self.mainwindow.showDialog(cd)
 
@@ -203,12 +275,11 @@ class CapturingDialog(VeuszDialog):
     """Capturing data dialog.
     Shows progress to user."""
 
-    def __init__(self, document, simprd, stream, parent,
+    def __init__(self, document, session, parent,
                  updateinterval = None):
         """Initialse capture dialog:
         document: document to send data to
-        simprd: object to interpret data
-        stream: capturestream to read data from
+        session: CaptureSession to read and keep data
         parent: parent widget
         updateinterval: if set, interval of seconds to update data in doc
         """
@@ -216,8 +287,8 @@ class CapturingDialog(VeuszDialog):
         VeuszDialog.__init__(self, parent, 'capturing.ui')
 
         self.document = document
-        self.simpleread = simprd
-        self.stream = stream
+        self.session = session
+        self.capturing = True
 
         # connect buttons
         self.finishButton.clicked.connect(self.slotFinish)
@@ -238,7 +309,7 @@ class CapturingDialog(VeuszDialog):
         self.displaytimer = qt4.QTimer(self)
         self.displaytimer.timeout.connect(self.slotDisplayTimer)
         self.sourceLabel.setText( self.sourceLabel.text() %
-                                  stream.name )
+                                  session.name )
         self.txt_statusLabel = self.statusLabel.text()
         self.slotDisplayTimer() # initialise label
 
@@ -255,20 +326,19 @@ class CapturingDialog(VeuszDialog):
 
     def slotReadTimer(self):
         """Time to read more data."""
-        try:
-            self.simpleread.readData(self.stream)
-        except capture.CaptureFinishException as e:
-            # stream tells us it's time to finish
-            self.streamCaptureFinished( cstr(e) )
+        messages = self.session.read()
+        if self.session.isFinished():
+            # streams tell us it's time to finish
+            self.streamCaptureFinished( '\n'.join(messages) )
 
     def slotDisplayTimer(self):
         """Time to update information about data source."""
         self.statusLabel.setText( self.txt_statusLabel %
-                                  (self.stream.bytesread,
+                                  (self.session.bytesread,
                                    self.starttime.elapsed() // 1000) )
 
         tree = self.datasetTreeWidget
-        cts = self.simpleread.getDatasetCounts()
+        cts = self.session.getDatasetCounts()
 
         # iterate over each dataset
         for name, length in citems(cts):
@@ -288,8 +358,7 @@ class CapturingDialog(VeuszDialog):
             self.updateoperation.undo(self.document)
 
         # create new one
-        self.updateoperation = capture.OperationDataCaptureSet(
-            self.simpleread)
+        self.updateoperation = capture.OperationDataCaptureSet(self.session)
 
         # apply it (bypass history here - urgh)
         self.updateoperation.do(self.document)
@@ -303,12 +372,12 @@ class CapturingDialog(VeuszDialog):
         self.readtimer.stop()
         self.displaytimer.stop()
         self.updatetimer.stop()
-        if self.stream:
+        if self.capturing:
             # update stats
             self.slotDisplayTimer()
-            # close stream
-            self.stream.close()
-            self.stream = None
+            # close streams
+            self.session.close()
+            self.capturing = False
         # show message from stream
         self.statusLabel.setText(message)
 
@@ -323,7 +392,7 @@ class CapturingDialog(VeuszDialog):
             self.updateoperation.undo(self.document)
 
         # apply real document operation update
-        op = capture.OperationDataCaptureSet(self.simpleread)
+        op = capture.OperationDataCaptureSet(self.session, final=True)
         self.document.applyOperation(op)
 
         # close dialog
@@ -68,6 +68,40 @@ class ImportTab(qt4.QWidget):
         """Do the import iteself."""
         pass
 
+    def runImport(self, doc, op):
+        """Read the data for the import operation op in a separate
+        thread, showing a progress dialog which allows the import to
+        be cancelled, then apply op to the document.
+
+        Returns a list of the datasets imported. Errors while reading,
+        or base.ImportCancelled if cancelled, are raised.
+        """
+
+        from ..dataimport import base
+        imp = base.AsyncImport(doc, op)
+
+        progress = qt4.QProgressDialog(
+            _('Importing data...'), _('Cancel'), 0, 0, self)
+        progress.setWindowModality(qt4.Qt.WindowModal)
+        progress.setMinimumDuration(500)
+        progress.setValue(0)
+
+        while not imp.wait(0.05):
+            frac = imp.progress.fraction()
+            if frac is not None:
+                progress.setMaximum(1000)
+                progress.setValue(int(frac*1000))
+            else:
+                progress.setValue(0)
+            progress.setLabelText(
+                _('Importing data (%i lines read)...') % imp.progress.rows)
+            qt4.qApp.processEvents()
+            if progress.wasCanceled():
+                imp.cancel()
+
+        progress.reset()
+        return imp.apply()
+
     def okToImport(self):
         """Secondary check (after preview) for enabling import button."""
         return True
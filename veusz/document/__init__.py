@@ -21,6 +21,7 @@
 from .widgetfactory import *
 from .doc import *
 from .evaluate import *
+from .dependencies import *
 from .commandinterface import *
 from .commandinterpreter import *
 from .operations import *
@@ -28,4 +29,5 @@ from .mime import *
 from .painthelper import *
 from .export import Export, printDialog
 from .dbusinterface import *
+from .linkwatcher import LinkWatcher
 from .loader import loadDocument, executeScript, LoadError
@@ -28,7 +28,7 @@ from __future__ import division, print_function
 import os.path
 import numpy as N
 
-from ..compat import cbasestr
+from ..compat import cbasestr, cstr
 from .. import qtall as qt4
 from .. import setting
 from .. import embed
@@ -68,7 +68,10 @@ class CommandInterface(qt4.QObject):
         'GetData',
         'GetDataType',
         'GetDatasets',
+        'ImportCancel',
         'ImportFITSFile',
+        'ImportStatus',
+        'ImportWait',
         'List',
         'NodeChildren',
         'NodeType',
@@ -110,6 +113,15 @@ class CommandInterface(qt4.QObject):
         self.currentwidget = self.document.basewidget
         self.verbose = False
         self.importpath = []
+        # imports running in the background, by id
+        self.backgroundimports = {}
+        self.nextimportid = 1
+        # (AsyncImport, dataset names, error) of finished imports, by id
+        self.finishedimports = {}
+        # timer to add datasets from finished background imports
+        self.importtimer = qt4.QTimer(self)
+        self.importtimer.setInterval(100)
+        self.importtimer.timeout.connect(self.slotCheckImports)
 
         self.document.sigWiped.connect(self.slotWipedDoc)
 
@@ -695,6 +707,104 @@ class CommandInterface(qt4.QObject):
 
         return self.document.reloadLinkedDatasets()
 
+    def addBackgroundImport(self, imp):
+        """Remember an import running in the background (an AsyncImport),
+        returning an id for ImportStatus, ImportWait and ImportCancel.
+
+        The datasets are added to the document from the event loop
+        when reading has finished.
+        """
+
+        importid = self.nextimportid
+        self.nextimportid += 1
+        self.backgroundimports[importid] = imp
+        self.importtimer.start()
+        return importid
+
+    def _finishImport(self, importid):
+        """Add the datasets of a background import which has finished
+        reading to the document."""
+
+        imp = self.backgroundimports.pop(importid)
+        names = []
+        error = None
+        try:
+            names = imp.apply()
+        except Exception as ex:
+            error = cstr(ex)
+        self.finishedimports[importid] = (imp, names, error)
+
+        if self.verbose:
+            if error:
+                print(_("Import failed: %s") % error)
+            else:
+                print(_("Imported datasets %s") % ' '.join(names))
+
+    @qt4.pyqtSlot()
+    def slotCheckImports(self):
+        """Add datasets from background imports which have finished."""
+        for importid, imp in list(self.backgroundimports.items()):
+            if imp.isDone():
+                self._finishImport(importid)
+        if not self.backgroundimports:
+            self.importtimer.stop()
+
+    def _getImport(self, importid):
+        """Get AsyncImport for id."""
+        if importid in self.backgroundimports:
+            return self.backgroundimports[importid]
+        elif importid in self.finishedimports:
+            return self.finishedimports[importid][0]
+        raise RuntimeError(_('Invalid import id'))
+
+    def ImportStatus(self, importid):
+        """Get the status of an import started with background=True.
+
+        Returned is a dict with keys:
+         rows: number of rows read so far
+         bytesread: number of bytes read (or None if not known)
+         bytestotal: size of file (or None if not known)
+         done: whether the import has finished and the datasets have
+               been added to the document
+         error: error message if the import failed or was cancelled
+         datasets: list of datasets imported when done
+        """
+
+        p = self._getImport(importid).progress
+        status = {
+            'rows': p.rows,
+            'bytesread': p.bytesread,
+            'bytestotal': p.bytestotal,
+            'done': False,
+            'error': None,
+            'datasets': [],
+            }
+
+        if importid in self.finishedimports:
+            imp, names, error = self.finishedimports[importid]
+            status['done'] = True
+            status['datasets'] = list(names)
+            status['error'] = error
+
+        return status
+
+    def ImportWait(self, importid, timeout=None):
+        """Wait for an import started with background=True to finish,
+        or until timeout seconds have passed. If it has finished, the
+        datasets are added to the document.
+
+        Returns the status as given by ImportStatus.
+        """
+
+        imp = self._getImport(importid)
+        if importid in self.backgroundimports and imp.wait(timeout):
+            self._finishImport(importid)
+        return self.ImportStatus(importid)
+
+    def ImportCancel(self, importid):
+        """Cancel an import started with background=True."""
+        self._getImport(importid).cancel()
+
     def Action(self, action, widget='.'):
         """Performs action on current widget."""
 
@@ -0,0 +1,197 @@
+#    Copyright (C) 2016 Jeremy S. Sanders
+#    Email: Jeremy Sanders <jeremy@jeremysanders.net>
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+##############################################################################
+
+"""Track what derived values in the document depend on.
+
+Derived values (dataset expressions, filters, histograms, dataset
+plugins...) record which datasets, custom definitions and settings
+they read while they are evaluated. When one of these is modified,
+only the values downstream of it are invalidated, rather than
+everything in the document.
+"""
+
+from __future__ import division
+from collections import defaultdict
+from contextlib import contextmanager
+
+from ..compat import citems
+
+# keys for items in the document which can be read
+def datasetKey(name):
+    """Key for reading dataset with name."""
+    return ('dataset', name)
+
+customsKey = ('customs',)
+settingsKey = ('settings',)
+datasetnamesKey = ('datasetnames',)
+
+class DependencyGraph(object):
+    """Graph of dependencies between document items and derived values.
+
+    Nodes are derived values, usually the object holding the cached
+    value. They record keys for the items they read, which are
+    datasets by name, custom definitions, settings, or other nodes.
+    """
+
+    def __init__(self, doc):
+        self.doc = doc
+        # number of evaluations done (useful for testing)
+        self.evaluations = 0
+        self.clear()
+
+    def clear(self):
+        """Forget all recorded nodes."""
+        # keys read by each valid node
+        self.inputs = {}
+        # other nodes or datasets generated by node
+        self.outputs = {}
+        # nodes which have read each key
+        self.dependents = defaultdict(set)
+        # nodes being evaluated and the keys they have read so far
+        self.frames = []
+        self.active = set()
+
+    def read(self, key):
+        """Record key as read by the evaluation in progress (if any)."""
+        if self.frames:
+            self.frames[-1].add(key)
+
+    def readDataset(self, name):
+        """Record dataset name read."""
+        self.read(datasetKey(name))
+
+    def readCustoms(self):
+        """Record that the custom definitions were used."""
+        self.read(customsKey)
+
+    def readSettings(self):
+        """Record that settings in the document were read."""
+        self.read(settingsKey)
+
+    def readDatasetNames(self):
+        """Record that the list of datasets was read."""
+        self.read(datasetnamesKey)
+
+    def isValid(self, node, read=True):
+        """Is the value of the node still valid?
+
+        If read is set, the node is recorded as read by the
+        evaluation in progress.
+        """
+        if read:
+            self.read(node)
+        # nodes being evaluated are valid, to avoid infinite recursion
+        return node in self.inputs or node in self.active
+
+    def beginEvaluation(self, node):
+        """Start recording the keys read while node is evaluated."""
+        self._drop(node)
+        self.evaluations += 1
+        self.active.add(node)
+        self.frames.append(set())
+
+    def endEvaluation(self, node, outputs=(), ok=True):
+        """Finish evaluating node.
+
+        outputs are optional nodes or datasets which are invalidated
+        when node is invalidated. If ok is False, the node is left
+        invalid.
+        """
+        keys = self.frames.pop()
+        self.active.discard(node)
+        if not ok:
+            return
+        keys.discard(node)
+        self.inputs[node] = keys
+        self.outputs[node] = tuple(outputs)
+        for key in keys:
+            self.dependents[key].add(node)
+        self.read(node)
+
+    @contextmanager
+    def evaluating(self, node, outputs=()):
+        """Context manager to record the keys read while node is evaluated.
+
+        If an exception is raised, the node is left invalid.
+        """
+        self.beginEvaluation(node)
+        try:
+            yield
+        except:
+            self.endEvaluation(node, ok=False)
+            raise
+        else:
+            self.endEvaluation(node, outputs=outputs)
+
+    def forget(self, node):
+        """Remove node from the graph (it becomes invalid)."""
+        self._drop(node)
+
+    def _drop(self, node):
+        """Remove node from graph."""
+        keys = self.inputs.pop(node, None)
+        self.outputs.pop(node, None)
+        if keys:
+            for key in keys:
+                dep = self.dependents.get(key)
+                if dep is not None:
+                    dep.discard(node)
+                    if not dep:
+                        del self.dependents[key]
+
+    def invalidate(self, key):
+        """Invalidate the nodes which depend on key, recursively."""
+
+        # names of datasets in document, looked up if required
+        names = None
+
+        todo = [key]
+        while todo:
+            key = todo.pop()
+            for node in self.dependents.pop(key, ()):
+                if node not in self.inputs:
+                    continue
+                outputs = self.outputs[node]
+                self._drop(node)
+                todo.append(node)
+                todo += outputs
+
+                # datasets in the document are read by name
+                if names is None:
+                    names = defaultdict(list)
+                    for name, ds in citems(self.doc.data):
+                        names[id(ds)].append(name)
+                for obj in (node,) + outputs:
+                    for name in names.get(id(obj), ()):
+                        todo.append(datasetKey(name))
+
+    def invalidateDataset(self, name):
+        """Invalidate values depending on dataset with name."""
+        self.invalidate(datasetKey(name))
+
+    def invalidateCustoms(self):
+        """Invalidate values depending on the custom definitions."""
+        self.invalidate(customsKey)
+
+    def invalidateSettings(self):
+        """Invalidate values depending on settings in the document."""
+        self.invalidate(settingsKey)
+
+    def invalidateDatasetNames(self):
+        """Invalidate values depending on the list of datasets."""
+        self.invalidate(datasetnamesKey)
@@ -41,6 +41,7 @@ from .. import qtall as qt4
 from . import widgetfactory
 from . import painthelper
 from . import evaluate
+from . import dependencies
 
 from .. import datasets
 from .. import utils
@@ -107,6 +108,9 @@ class Document(qt4.QObject):
         # default document locale
         self.locale = qt4.QLocale()
 
+        # what derived values depend on, for invalidating them
+        self.dependencies = dependencies.DependencyGraph(self)
+
         # evaluation context
         self.evaluate = evaluate.Evaluate(self)
 
@@ -116,6 +120,7 @@ class Document(qt4.QObject):
     def wipe(self):
         """Wipe out any stored data."""
         self.data = {}
+        self.dependencies.clear()
         self.basewidget = widgetfactory.thefactory.makeWidget(
             'document', None, None)
         self.basewidget.document = self
@@ -170,6 +175,7 @@ class Document(qt4.QObject):
 
         with DocSuspend(self):
             retn = operation.do(self)
+            self.dependencies.invalidateSettings()
             self.changeset += 1
 
         if self.historybatch:
@@ -203,6 +209,7 @@ class Document(qt4.QObject):
         operation = self.historyundo.pop()
         with DocSuspend(self):
             operation.undo(self)
+            self.dependencies.invalidateSettings()
             self.changeset += 1
         self.historyredo.append(operation)
 
@@ -267,6 +274,8 @@ class Document(qt4.QObject):
         self.data[name] = dataset
         dataset.document = self
         dataset.username = name
+        self.dependencies.invalidateDataset(name)
+        self.dependencies.invalidateDatasetNames()
 
         # update the change tracking
         self.setModified()
@@ -275,11 +284,16 @@ class Document(qt4.QObject):
         """Remove a dataset"""
         if name in self.data:
             del self.data[name]
+            self.dependencies.invalidateDataset(name)
+            self.dependencies.invalidateDatasetNames()
             self.setModified()
 
     def modifiedData(self, dataset):
         """The named dataset was modified"""
         if dataset in self.data.values():
+            for name, ds in list(citems(self.data)):
+                if ds is dataset:
+                    self.dependencies.invalidateDataset(name)
             self.setModified()
 
     def getLinkedFiles(self, filenames=None):
@@ -333,6 +347,10 @@ class Document(qt4.QObject):
         self.data[newname] = d
         d.username = newname
 
+        self.dependencies.invalidateDataset(oldname)
+        self.dependencies.invalidateDataset(newname)
+        self.dependencies.invalidateDatasetNames()
+
         self.setModified()
 
     def getData(self, name):
@@ -81,7 +81,6 @@ class Evaluate:
 
         # cached expressions which have been already evaluated as datasets
         self.exprdscache = {}
-        self.exprdscachechangeset = None
 
     def update(self):
         """To be called after custom constants or functions are changed.
@@ -126,6 +125,9 @@ class Evaluate:
             else:
                 raise ValueError('Invalid custom type')
 
+        # anything evaluated using the old definitions needs updating
+        self.doc.dependencies.invalidateCustoms()
+
     def _updateImport(self, module, val):
         """Add an import statement to the eval function context."""
         if module_re.match(module):
@@ -281,9 +283,10 @@ class Evaluate:
         """DATA(name, [part]) eval: return dataset as array."""
         if part not in ('data', 'perr', 'serr', 'nerr'):
             raise RuntimeError("Invalid dataset part '%s'" % part)
-        if name not in self.data:
+        self.doc.dependencies.readDataset(name)
+        if name not in self.doc.data:
             raise RuntimeError("Dataset '%s' does not exist" % name)
-        data = getattr(self.data[name], part)
+        data = getattr(self.doc.data[name], part)
         if isinstance(data, N.ndarray):
             return N.array(data)
         elif isinstance(data, list):
@@ -292,15 +295,16 @@ class Evaluate:
 
     def _evalfilename(self):
         """FILENAME() eval: returns filename."""
-        return utils.latexEscape(self.filename)
+        return utils.latexEscape(self.doc.filename)
 
     def _evalbasename(self):
         """BASENAME() eval: returns base filename."""
-        return utils.latexEscape(os.path.basename(self.filename))
+        return utils.latexEscape(os.path.basename(self.doc.filename))
 
     def _evalsetting(self, path):
         """SETTING() eval: return setting given full path."""
-        return self.resolveFullSettingPath(path).get()
+        self.doc.dependencies.readSettings()
+        return self.doc.resolveFullSettingPath(path).get()
 
     def evalDatasetExpression(self, expr, part='data', datatype='numeric',
                               dimensions=1):
@@ -312,14 +316,21 @@ class Evaluate:
         """
 
         key = (expr, part, datatype, dimensions)
-        if self.exprdscachechangeset != self.doc.changeset:
-            self.exprdscachechangeset = self.doc.changeset
-            self.exprdscache.clear()
-        elif key in self.exprdscache:
+        deps = self.doc.dependencies
+        node = ('expression',) + key
+        if deps.isValid(node) and key in self.exprdscache:
             return self.exprdscache[key]
 
-        self.exprdscache[key] = ds = datasets.evalDatasetExpression(
-            self.doc, expr, part=part, datatype=datatype, dimensions=dimensions)
+        # throw away results which are out of date
+        for k in list(self.exprdscache):
+            if not deps.isValid(('expression',)+k, read=False):
+                del self.exprdscache[k]
+
+        with deps.evaluating(node):
+            ds = datasets.evalDatasetExpression(
+                self.doc, expr, part=part, datatype=datatype,
+                dimensions=dimensions)
+        self.exprdscache[key] = ds
         return ds
 
     def _processSafeImports(self, module, symbols):
@@ -0,0 +1,213 @@
+#    Copyright (C) 2016 Jeremy S. Sanders
+#    Email: Jeremy Sanders <jeremy@jeremysanders.net>
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+###############################################################################
+
+"""Watch the files linked to a document, reloading them in the
+background when they change."""
+
+from __future__ import division
+import os
+
+from .. import qtall as qt4
+
+class _ReadThread(qt4.QThread):
+    """Read the data for linked files, without modifying the
+    document."""
+
+    def __init__(self, document, links):
+        qt4.QThread.__init__(self)
+        self.document = document
+        self.links = links
+        # number of reloads of links when started
+        self.reloads = dict([(lf, lf.reloads) for lf in links])
+        # list of (link, tempdoc, op, exception)
+        self.results = []
+
+    def run(self):
+        for lf in self.links:
+            try:
+                tempdoc, op = lf.readLinks(self.document)
+                self.results.append( (lf, tempdoc, op, None) )
+            except Exception as ex:
+                self.results.append( (lf, None, None, ex) )
+
+class LinkWatcher(qt4.QObject):
+    """Watch files linked to a document, reloading them when they are
+    modified.
+
+    Changes are notified by QFileSystemWatcher, or found by polling
+    the size and modification time of the files (e.g. on network
+    filesystems). Reloading waits until the files have stopped changing
+    for the debounce interval. The files are read in a separate thread
+    and the datasets replaced in the document in one step. If a file
+    is reloaded by other means while the thread reads it, the data read
+    are discarded and the file is read again.
+    """
+
+    # emitted after reloading with (list of datasets, dict of errors)
+    sigReloaded = qt4.pyqtSignal(list, dict)
+
+    def __init__(self, document, parent=None, pollinterval=2000,
+                 debounce=500):
+        """Watch files in document.
+
+        pollinterval: interval in ms to check files, or 0 to disable
+        debounce: time in ms to wait after a change before reloading
+        """
+
+        qt4.QObject.__init__(self, parent)
+        self.document = document
+
+        # map of filenames to (mtime, size)
+        self.filestats = {}
+        # changed files to be reloaded
+        self.changed = set()
+        # thread reading files
+        self.thread = None
+
+        self.fswatcher = qt4.QFileSystemWatcher(self)
+        self.fswatcher.fileChanged.connect(self.slotFileChanged)
+
+        self.debouncetimer = qt4.QTimer(self)
+        self.debouncetimer.setSingleShot(True)
+        self.debouncetimer.setInterval(debounce)
+        self.debouncetimer.timeout.connect(self.slotReload)
+
+        self.polltimer = qt4.QTimer(self)
+        self.polltimer.timeout.connect(self.slotPoll)
+        if pollinterval > 0:
+            self.polltimer.start(pollinterval)
+
+        self.document.signalModified.connect(self.slotDocModified)
+        self.updateFiles()
+
+    def stop(self):
+        """Stop watching files."""
+        self.document.signalModified.disconnect(self.slotDocModified)
+        self.polltimer.stop()
+        self.debouncetimer.stop()
+        files = self.fswatcher.files()
+        if files:
+            self.fswatcher.removePaths(files)
+        if self.thread is not None:
+            self.thread.wait()
+            self.thread = None
+
+    def _stat(self, filename):
+        """Return (mtime, size) of file, or None if missing."""
+        try:
+            s = os.stat(filename)
+            return (s.st_mtime, s.st_size)
+        except OSError:
+            return None
+
+    def updateFiles(self):
+        """Update the list of files watched from the document."""
+
+        filenames = set(
+            [lf.filename for lf in self.document.getLinkedFiles()])
+        for f in set(self.filestats) - filenames:
+            del self.filestats[f]
+        for f in filenames:
+            if f not in self.filestats:
+                self.filestats[f] = self._stat(f)
+
+        watched = set(self.fswatcher.files())
+        if watched - filenames:
+            self.fswatcher.removePaths(list(watched - filenames))
+        # files which are replaced are removed from the watcher
+        toadd = [f for f in filenames - watched if os.path.exists(f)]
+        if toadd:
+            self.fswatcher.addPaths(toadd)
+
+    def slotDocModified(self, ismodified):
+        """Linked files may have been added or removed."""
+        self.updateFiles()
+
+    def _checkChanged(self, filenames):
+        """Note any of filenames which have changed."""
+        for f in filenames:
+            stat = self._stat(f)
+            if stat is not None and stat != self.filestats.get(f):
+                self.filestats[f] = stat
+                self.changed.add(f)
+                # restart wait for writes to finish
+                self.debouncetimer.start()
+
+    def slotFileChanged(self, filename):
+        """File changed according to QFileSystemWatcher."""
+        self._checkChanged([filename])
+        self.updateFiles()
+
+    def slotPoll(self):
+        """Check files for changes."""
+        self._checkChanged(list(self.filestats))
+
+    def slotReload(self):
+        """Start reading the changed files in a thread."""
+
+        if self.thread is not None:
+            # reload again after this one has finished
+            return
+
+        links = self.document.getLinkedFiles(filenames=self.changed)
+        self.changed = set()
+        if not links:
+            return
+
+        self.thread = _ReadThread(self.document, links)
+        self.thread.finished.connect(self.slotReadFinished)
+        self.thread.start()
+
+    def slotReadFinished(self):
+        """Replace datasets with those read by the thread."""
+
+        # make sure the thread has exited before it is deleted
+        self.thread.wait()
+        results = self.thread.results
+        reloads = self.thread.reloads
+        self.thread = None
+
+        # links may have been removed from the document while reading
+        links = set(self.document.getLinkedFiles())
+
+        read = []
+        errors = {}
+        with self.document.suspend():
+            for lf, tempdoc, op, ex in results:
+                if lf not in links:
+                    continue
+                if lf.reloads != reloads[lf]:
+                    # reloaded while reading (e.g. by Data > Reload),
+                    # so these data may be out of date
+                    self.changed.add(lf.filename)
+                    continue
+                if ex is not None:
+                    nread, nerrors = lf.readLinksError(self.document, ex)
+                else:
+                    nread, nerrors = lf.applyReadLinks(
+                        self.document, tempdoc, op)
+                read += nread
+                errors.update(nerrors)
+            self.document.setModified()
+
+        read.sort()
+        self.sigReloaded.emit(read, errors)
+
+        if self.changed:
+            # files changed while reading
+            self.debouncetimer.start()
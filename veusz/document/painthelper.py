@@ -33,15 +33,18 @@ except ImportError:
 class DrawState(object):
     """Each widget plotted has a recorded state in this object."""
 
-    def __init__(self, widget, bounds, clip, helper):
+    def __init__(self, widget, bounds, clip, helper, record=None):
         """Initialise state for widget.
         bounds: tuple of (x1, y1, x2, y2)
-        clip: if clipping should be done, another tuple."""
+        clip: if clipping should be done, a QRectF.
+        record: existing recorded layer to reuse, if any."""
 
         self.widget = widget
-        self.record = RecordPaintDevice(
-            helper.pagesize[0], helper.pagesize[1],
-            helper.dpi[0], helper.dpi[1])
+        if record is None:
+            record = RecordPaintDevice(
+                helper.pagesize[0], helper.pagesize[1],
+                helper.dpi[0], helper.dpi[1])
+        self.record = record
         self.bounds = bounds
         self.clip = clip
 
@@ -51,18 +54,50 @@ class DrawState(object):
         # list of child widgets states
         self.children = []
 
+        # area drawn on (computed when needed)
+        self.drawbounds = None
+
+    def drawBounds(self):
+        """Return QRectF containing everything drawn in the layer.
+
+        This is the clipping rectangle if set, otherwise it is found
+        by replaying the layer to a QPicture.
+        """
+        if self.drawbounds is None:
+            if self.clip is not None:
+                self.drawbounds = qt4.QRectF(self.clip)
+            else:
+                picture = qt4.QPicture()
+                painter = qt4.QPainter(picture)
+                self.record.play(painter)
+                painter.end()
+                self.drawbounds = qt4.QRectF(picture.boundingRect())
+        return self.drawbounds
+
 class Painter(qt4.QPainter):
-    def __init__(self, helper, widget, outdev):
+    def __init__(self, helper, widget, outdev, cachelayer=None):
+        """cachelayer is a tuple of (layer, fingerprint) if the
+        recorded layer should be saved in the helper's LayerCache."""
         qt4.QPainter.__init__(self, outdev)
         self.helper = helper
         self.widget = widget
+        self.outdev = outdev
+        self.cachelayer = cachelayer
 
     def __enter__(self):
         #print ' '*len(self.helper.widgetstack), self.widget
         self.helper.widgetstack.append(self.widget)
+        if self.cachelayer is not None:
+            self.helper.layercache.startRecording(
+                self.widget, self.cachelayer[0])
 
     def __exit__(self, exc_type, exc_value, traceback):
         self.helper.widgetstack.pop()
+        if self.cachelayer is not None:
+            layer, fingerprint = self.cachelayer
+            self.helper.layercache.endRecording(
+                self.widget, layer, fingerprint, self.outdev,
+                ok=exc_type is None)
 
 class DirectPainter(qt4.QPainter):
     """Painter class for direct painting with PaintHelper below.
@@ -74,6 +109,64 @@ class DirectPainter(qt4.QPainter):
     def __exit__(self, exc_type, exc_value, traceback):
         pass
 
+class LayerCache(object):
+    """Recorded widget layers, kept between renders of a page.
+
+    A layer is reused if the widget gives the same fingerprint (its
+    settings, bounds and axes) as when it was recorded, and the
+    document dependency graph shows that nothing read while drawing
+    it (datasets, custom definitions...) has changed.
+    """
+
+    def __init__(self, doc):
+        self.doc = doc
+        # map (widget, layer) -> (fingerprint, record)
+        self.layers = {}
+        # number of layers recorded and reused
+        self.numrecorded = self.numreused = 0
+
+    def get(self, widget, layer, fingerprint):
+        """Return record for widget layer, or None if out of date."""
+        try:
+            oldfingerprint, record = self.layers[(widget, layer)]
+        except KeyError:
+            return None
+        if ( oldfingerprint != fingerprint or
+             not self.doc.dependencies.isValid(
+                ('layer', widget, layer), read=False) ):
+            return None
+        self.numreused += 1
+        return record
+
+    def startRecording(self, widget, layer):
+        """Start recording what the widget layer depends on."""
+        deps = self.doc.dependencies
+        deps.beginEvaluation(('layer', widget, layer))
+        # widgets may evaluate expressions or use custom colormaps
+        deps.readCustoms()
+
+    def endRecording(self, widget, layer, fingerprint, record, ok=True):
+        """Finish recording widget layer, storing it if ok."""
+        self.doc.dependencies.endEvaluation(('layer', widget, layer), ok=ok)
+        if ok:
+            self.layers[(widget, layer)] = (fingerprint, record)
+            self.numrecorded += 1
+        else:
+            self.layers.pop((widget, layer), None)
+
+    def prune(self, helper):
+        """Remove layers for widgets not drawn by the PaintHelper."""
+        for key in list(self.layers):
+            if key not in helper.states:
+                del self.layers[key]
+                self.doc.dependencies.forget(('layer',) + key)
+
+    def clear(self):
+        """Remove all stored layers."""
+        for key in self.layers:
+            self.doc.dependencies.forget(('layer',) + key)
+        self.layers.clear()
+
 class PaintHelper(object):
     """Helper used when painting widgets.
 
@@ -83,7 +176,7 @@ class PaintHelper(object):
     """
 
     def __init__(self, pagesize, scaling=1., dpi=(100, 100),
-                 directpaint=None):
+                 directpaint=None, layercache=None):
         """Initialise using page size (tuple of pixelw, pixelh).
 
         If directpaint is set to a painter, use this directly rather
@@ -91,6 +184,9 @@ class PaintHelper(object):
         case the painter must be a DirectPainter object, and
         save()/restore() must be placed around doing the rendering to
         the painter.
+
+        layercache is an optional LayerCache, to reuse layers
+        recorded in previous renders if they have not changed.
         """
 
         self.dpi = dpi
@@ -108,9 +204,15 @@ class PaintHelper(object):
         # whether to directly render to a painter or make new layers
         self.directpaint = directpaint
 
+        # previously recorded layers (not used if painting directly)
+        self.layercache = layercache if directpaint is None else None
+
         # state for root widget
         self.rootstate = None
 
+        # states in order drawn (made when needed)
+        self.drawnstates = None
+
         # keep track of last widget being plotted
         self.widgetstack = []
 
@@ -129,30 +231,64 @@ class PaintHelper(object):
         self.pagesize = ( setting.Distance.convertDistance(self, pagew),
                           setting.Distance.convertDistance(self, pageh) )
 
-    def painter(self, widget, bounds, clip=None, layer=None):
+    def _nextLayer(self, widget):
+        """Get next free layer for widget."""
+        layer = 0
+        while (widget, layer) in self.states:
+            layer += 1
+        return layer
+
+    def _addState(self, widget, layer, state):
+        """Add drawing state for widget layer into hierarchy."""
+        self.states[(widget, layer)] = state
+        self.drawnstates = None
+        if self.widgetstack:
+            self.states[(self.widgetstack[-1], 0)].children.append(state)
+        else:
+            self.rootstate = state
+
+    def reuseLayer(self, widget, bounds, fingerprint, clip=None):
+        """Reuse layer for widget from a previous render, if possible.
+
+        fingerprint is a value (compared by equality) which changes
+        if the widget would draw differently, given the same data.
+        Returns True if the layer was reused, otherwise the widget
+        should be drawn, passing the fingerprint to painter().
+        """
+
+        if self.layercache is None:
+            return False
+        layer = self._nextLayer(widget)
+        record = self.layercache.get(widget, layer, fingerprint)
+        if record is None:
+            return False
+        self._addState(widget, layer, DrawState(
+            widget, bounds, clip, self, record=record))
+        return True
+
+    def painter(self, widget, bounds, clip=None, layer=None,
+                fingerprint=None):
         """Return a painter for use when drawing the widget.
         widget: widget object
         bounds: tuple (x1, y1, x2, y2) of widget bounds
         clip: a QRectF, if set
         layer: layer to plot widget, or None to get next automatically
+        fingerprint: if set, store the layer for reuse (see reuseLayer)
         """
 
         # automatically add a layer if not given
         if layer is None:
-            layer = 0
-            while (widget, layer) in self.states:
-                layer += 1
+            layer = self._nextLayer(widget)
 
-        s = self.states[(widget, layer)] = DrawState(widget, bounds, clip, self)
-
-        if self.widgetstack:
-            self.states[(self.widgetstack[-1], 0)].children.append(s)
-        else:
-            self.rootstate = s
+        s = DrawState(widget, bounds, clip, self)
+        self._addState(widget, layer, s)
 
         if self.directpaint is None:
             # save to multiple recorded layers
-            p = Painter(self, widget, s.record)
+            cachelayer = None
+            if fingerprint is not None and self.layercache is not None:
+                cachelayer = (layer, fingerprint)
+            p = Painter(self, widget, s.record, cachelayer=cachelayer)
         else:
             # only paint to one output painter
             p = self.directpaint
@@ -198,31 +334,44 @@ class PaintHelper(object):
             #print '  '*indent, child.widget
             self._renderState(child, painter, indent=indent+1)
 
+    def _drawnStates(self):
+        """Return list of states in the order they are drawn."""
+        if self.drawnstates is None:
+            self.drawnstates = []
+            todo = [self.rootstate] if self.rootstate is not None else []
+            while todo:
+                state = todo.pop()
+                self.drawnstates.append(state)
+                todo += state.children[::-1]
+        return self.drawnstates
+
     def identifyWidgetAtPoint(self, x, y, antialias=True):
         """What widget has drawn at the point x,y?
 
         Returns the widget drawn last on the point, or None if it is
         an empty part of the page.
-        root is the root widget to recurse from
         if antialias is true, do test for antialiased drawing
+
+        Layers are tested from the last drawn, skipping those which
+        do not draw near the point.
         """
-        
+
         # make a small image filled with a specific color
         box = 3
         specialcolor = qt4.QColor(254, 255, 254)
         origpix = qt4.QPixmap(2*box+1, 2*box+1)
         origpix.fill(specialcolor)
         origimg = origpix.toImage()
-        # store most recent widget here
-        lastwidget = [None]
-        
-        def rendernextstate(state):
-            """Recursively draw painter.
 
-            Checks whether drawing a widgetchanges the small image
-            around the point given.
-            """
+        # region tested, with a margin for antialiasing
+        testrect = qt4.QRectF(x-box-2, y-box-2, box*2+5, box*2+5)
 
+        for state in reversed(self._drawnStates()):
+            if not state.drawBounds().intersects(testrect):
+                continue
+
+            # does drawing the widget change the small image around
+            # the point given?
             pixmap = qt4.QPixmap(origpix)
             painter = qt4.QPainter(pixmap)
             painter.setRenderHint(qt4.QPainter.Antialiasing, antialias)
@@ -232,16 +381,10 @@ class PaintHelper(object):
             painter.setWindow(x-box,y-box,box*2+1,box*2+1)
             state.record.play(painter)
             painter.end()
-            newimg = pixmap.toImage()
-
-            if newimg != origimg:
-                lastwidget[0] = state.widget
-
-            for child in state.children:
-                rendernextstate(child)
+            if pixmap.toImage() != origimg:
+                return state.widget
 
-        rendernextstate(self.rootstate)
-        return lastwidget[0]
+        return None
 
     def pointInWidgetBounds(self, x, y, widgettype):
         """Which graph widget plots at point x,y?
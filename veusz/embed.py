@@ -41,25 +41,36 @@ More than one embedded window can be opened at once
 
 from __future__ import division
 import atexit
+import io
 import sys
 import os
 import os.path
 import struct
 import socket
 import subprocess
+import tempfile
 import time
 import uuid
 import functools
 import types
 
-# python3 compatibility
+# the Pickler classes are subclassed below, which is not possible
+# with cPickle in python2
+import pickle
+
+# numpy is only needed to pass arrays in shared memory
 try:
-    import cPickle as pickle
+    import numpy
 except ImportError:
-    import pickle
+    numpy = None
 
 # check remote process has this API version
-API_VERSION = 2
+API_VERSION = 3
+
+# numpy arrays of at least this many bytes are passed to and from the
+# remote process in shared memory rather than being pickled (set to
+# None to always pickle)
+sharedminbytes = 1048576
 
 def findOnPath(cmd):
     """Find a command on the system path, or None if does not exist."""
@@ -71,6 +82,104 @@ def findOnPath(cmd):
             return cmdtry
     return None
 
+def sharedDir():
+    """Directory to write shared arrays in.
+
+    /dev/shm is used if possible, so that the arrays stay in memory.
+    """
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        return '/dev/shm'
+    return tempfile.gettempdir()
+
+def writeSharedArray(arr, written):
+    """Write numpy array to a shared file.
+
+    The filename is appended to the list written.
+    Returns (filename, dtype, shape) to send to the other process, or
+    None if the file could not be written (e.g. the disk is full).
+    """
+    try:
+        fd, filename = tempfile.mkstemp(
+            prefix='veusz-embed-', suffix='.dat', dir=sharedDir())
+    except EnvironmentError:
+        return None
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            numpy.ascontiguousarray(arr).tofile(f)
+    except EnvironmentError:
+        removeSharedFiles([filename])
+        return None
+    written.append(filename)
+    return (filename, arr.dtype.str, arr.shape)
+
+def readSharedArray(filename, dtype, shape):
+    """Return array in file written by writeSharedArray, deleting the
+    file.
+
+    The file is mapped into memory without copying. Changes to the
+    array are not written back to the file.
+    """
+    try:
+        if sys.platform == 'win32':
+            # files cannot be deleted on Windows while mapped
+            arr = numpy.fromfile(filename, dtype=dtype).reshape(shape)
+        else:
+            arr = numpy.memmap(
+                filename, dtype=dtype, mode='c', shape=shape).view(
+                numpy.ndarray)
+    finally:
+        removeSharedFiles([filename])
+    return arr
+
+def removeSharedFiles(filenames):
+    """Delete shared files, if they still exist."""
+    for filename in filenames:
+        try:
+            os.unlink(filename)
+        except OSError:
+            pass
+
+class _SharedPickler(pickle.Pickler):
+    """Pickler writing large numpy arrays to shared files."""
+
+    def __init__(self, f, written):
+        # note: protocol 2 for python2 compat
+        pickle.Pickler.__init__(self, f, 2)
+        self.written = written
+
+    def persistent_id(self, obj):
+        if ( numpy is not None and sharedminbytes is not None and
+             isinstance(obj, numpy.ndarray) and
+             obj.dtype.kind in 'biufc' and
+             obj.nbytes >= max(sharedminbytes, 1) ):
+            desc = writeSharedArray(obj, self.written)
+            if desc is not None:
+                return ('ndarray',) + desc
+        # pickle normally
+        return None
+
+class _SharedUnpickler(pickle.Unpickler):
+    """Unpickler mapping arrays in shared files."""
+
+    def persistent_load(self, pid):
+        if pid[0] == 'ndarray':
+            return readSharedArray(*pid[1:])
+        raise pickle.UnpicklingError('Unknown persistent id')
+
+def dumpsShared(obj, written):
+    """Pickle obj, writing large numpy arrays to shared files.
+
+    The names of the files are appended to the list written. Arrays
+    which cannot be written are pickled instead.
+    """
+    f = io.BytesIO()
+    _SharedPickler(f, written).dump(obj)
+    return f.getvalue()
+
+def loadsShared(data):
+    """Unpickle data written by dumpsShared."""
+    return _SharedUnpickler(io.BytesIO(data)).load()
+
 class Embedded(object):
     """An embedded instance of Veusz.
 
@@ -294,16 +403,23 @@ class Embedded(object):
     def sendCommand(cls, cmd):
         """Send the command to the remote process."""
 
-        # note: protocol 2 for python2 compat
-        outs = pickle.dumps(cmd, 2)
+        # large arrays are sent in shared files
+        written = []
+        try:
+            outs = dumpsShared(cmd, written)
+
+            cls.writeToSocket( cls.serv_socket,
+                               struct.pack('<I', len(outs)) )
+            cls.writeToSocket( cls.serv_socket, outs )
 
-        cls.writeToSocket( cls.serv_socket, struct.pack('<I', len(outs)) )
-        cls.writeToSocket( cls.serv_socket, outs )
+            backlen = struct.unpack('<I', cls.readLenFromSocket(
+                cls.serv_socket, cls.cmdlen))[0]
+            rets = cls.readLenFromSocket( cls.serv_socket, backlen )
+        finally:
+            # the remote process normally deletes these after reading
+            removeSharedFiles(written)
 
-        backlen = struct.unpack('<I', cls.readLenFromSocket(cls.serv_socket,
-                                                            cls.cmdlen))[0]
-        rets = cls.readLenFromSocket( cls.serv_socket, backlen )
-        retobj = pickle.loads(rets)
+        retobj = loadsShared(rets)
 
         if isinstance(retobj, Exception):
             raise retobj
@@ -21,7 +21,8 @@ import sys
 import struct
 import socket
 
-from .compat import citems, pickle
+from .compat import citems
+from .embed import dumpsShared, loadsShared, removeSharedFiles
 from .windows.simplewindow import SimpleWindow
 from . import document
 from . import setting
@@ -30,7 +31,7 @@ from . import qtall as qt4
 """Program to be run by embedding interface to run Veusz commands."""
 
 # embed.py module checks this is the same as its version number
-API_VERSION = 2
+API_VERSION = 3
 
 class EmbeddedClient(object):
     """An object for each instance of embedded window with document."""
@@ -187,6 +188,9 @@ class EmbedApplication(qt4.QApplication):
         self.clients = {}
         self.clientcounter = 0
 
+        # shared files written for the last output
+        self.sharedfiles = []
+
     def readLenFromSocket(thesocket, length):
         """Read length bytes from socket."""
         s = b''
@@ -206,9 +210,9 @@ class EmbedApplication(qt4.QApplication):
         # get length of packet
         length = struct.unpack('<I', EmbedApplication.readLenFromSocket(
                 thesocket, EmbedApplication.cmdlenlen))[0]
-        # unpickle command and arguments
+        # unpickle command and arguments, mapping any shared arrays
         temp = EmbedApplication.readLenFromSocket(thesocket, length)
-        return pickle.loads(temp)
+        return loadsShared(temp)
     readCommand = staticmethod(readCommand)
 
     def makeNewClient(self, title, doc=None, hidden=False):
@@ -226,8 +230,8 @@ class EmbedApplication(qt4.QApplication):
 
     def writeOutput(self, output):
         """Send output back to embed process."""
-        # format return data
-        outstr = pickle.dumps(output)
+        # format return data, writing large arrays to shared files
+        outstr = dumpsShared(output, self.sharedfiles)
 
         # send return data to stdout
         self.writeToSocket( self.socket, struct.pack('<I', len(outstr)) )
@@ -236,6 +240,7 @@ class EmbedApplication(qt4.QApplication):
     def finishRemote(self):
         """Clean up on exit."""
         self.notifier.setEnabled(False)
+        removeSharedFiles(self.sharedfiles)
         try:
             self.socket.shutdown(socket.SHUT_RDWR)
         except socket.error:
@@ -254,7 +259,11 @@ class EmbedApplication(qt4.QApplication):
     def readFromSocket(self):
         self.notifier.setEnabled(False)
         self.socket.setblocking(1)
-        
+
+        # the client has read any shared files from the last output
+        removeSharedFiles(self.sharedfiles)
+        self.sharedfiles = []
+
         # unpickle command and arguments
         window, cmd, args, argsv = self.readCommand(self.socket)
 
@@ -47,9 +47,14 @@ class DatasetPluginException(RuntimeError):
 
 def numpyCopyOrNone(data):
     """If data is None return None
-    Otherwise return a numpy array corresponding to data."""
+    Otherwise return a numpy array corresponding to data.
+
+    Memory-mapped arrays are returned without copying, keeping their
+    type, so that the data are only read from the file when used."""
     if data is None:
         return None
+    if isinstance(data, N.memmap):
+        return data
     return N.array(data, dtype=N.float64)
 
 # these classes are returned from dataset plugins
@@ -84,6 +89,8 @@ class Dataset1D(object):
 
     def _makeVeuszDataset(self, manager):
         """Make a Veusz dataset from the plugin dataset."""
+        if isinstance(self.data, N.memmap):
+            return datasets.Dataset1DMemmapPlugin(manager, self)
         return datasets.Dataset1DPlugin(manager, self)
 
 class Dataset2D(object):
@@ -109,7 +116,7 @@ class Dataset2D(object):
     def update(self, data=[[]], rangex=None, rangey=None,
                xedge=None, yedge=None,
                xcent=None, ycent=None):
-        self.data = N.array(data, dtype=N.float64)
+        self.data = numpyCopyOrNone(data)
         self.rangex = rangex
         self.rangey = rangey
         self.xedge = xedge
@@ -216,24 +223,28 @@ class DatasetPluginHelper(object):
     @property
     def datasets1d(self):
         """Return list of existing 1D numeric datasets"""
+        self._doc.dependencies.readDatasetNames()
         return [name for name, ds in citems(self._doc.data) if
                 (ds.dimensions == 1 and ds.datatype == 'numeric')]
 
     @property
     def datasets2d(self):
         """Return list of existing 2D numeric datasets"""
+        self._doc.dependencies.readDatasetNames()
         return [name for name, ds in citems(self._doc.data) if
                 (ds.dimensions == 2 and ds.datatype == 'numeric')]
 
     @property
     def datasetstext(self):
         """Return list of existing 1D text datasets"""
+        self._doc.dependencies.readDatasetNames()
         return [name for name, ds in citems(self._doc.data) if
                 (ds.dimensions == 1 and ds.datatype == 'text')]
 
     @property
     def datasetsdatetime(self):
         """Return list of existing date-time datesets"""
+        self._doc.dependencies.readDatasetNames()
         return [name for name, ds in citems(self._doc.data) if
                 isinstance(ds, datasets.DatasetDateTime)]
 
@@ -249,7 +260,7 @@ class DatasetPluginHelper(object):
 
         Returns None if expression could not be evaluated.
         """
-        ds = self._doc.evalDatasetExpression(expr, part=part)
+        ds = self._doc.evaluate.evalDatasetExpression(expr, part=part)
         return None if ds is None else ds.data
 
     def getDataset(self, name, dimensions=1):
@@ -262,6 +273,7 @@ class DatasetPluginHelper(object):
         name not found: raise a DatasetPluginException
         dimensions not right: raise a DatasetPluginException
         """
+        self._doc.dependencies.readDataset(name)
         try:
             ds = self._doc.data[name]
         except KeyError:
@@ -299,6 +311,7 @@ class DatasetPluginHelper(object):
         name not found: raise a DatasetPluginException
         """
 
+        self._doc.dependencies.readDataset(name)
         try:
             ds = self._doc.data[name]
         except KeyError:
@@ -323,7 +336,6 @@ class DatasetPluginManager(object):
         self.document = doc
         self.helper = DatasetPluginHelper(doc)
         self.fields = dict(fields)
-        self.changeset = -1
 
         self.fixMissingFields()
         self.setupDatasets()
@@ -381,21 +393,23 @@ class DatasetPluginManager(object):
         when updating the dataset
         """
 
-        if self.document.changeset == self.changeset:
+        deps = self.document.dependencies
+        if deps.isValid(self):
             return
-        self.changeset = self.document.changeset
 
-        # run the plugin with its parameters
-        try:
-            self.plugin.updateDatasets(self.fields, self.helper)
-        except DatasetPluginException as ex:
-            # this is for immediate notification
-            if raiseerrors:
-                raise
-
-            # otherwise if there's an error, then log and null outputs
-            self.document.log( cstr(ex) )
-            self.nullDatasets()
+        # run the plugin with its parameters, recording the datasets
+        # it reads so that it is only rerun if these change
+        with deps.evaluating(self, outputs=self.veuszdatasets):
+            try:
+                self.plugin.updateDatasets(self.fields, self.helper)
+            except DatasetPluginException as ex:
+                # this is for immediate notification
+                if raiseerrors:
+                    raise
+
+                # otherwise if there's an error, then log and null outputs
+                self.document.log( cstr(ex) )
+                self.nullDatasets()
 
 class DatasetPlugin(object):
     """Base class for defining dataset plugins."""
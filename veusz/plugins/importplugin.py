@@ -20,6 +20,8 @@
 
 from __future__ import division
 import os.path
+import struct
+import zipfile
 import numpy as N
 
 from ..compat import crange, cstr, cstrerror
@@ -442,18 +444,25 @@ class ImportPluginQdp(ImportPlugin):
 
         return rqdp.retndata
 
-def cnvtImportNumpyArray(name, val, errorsin2d=True):
-    """Convert a numpy array to plugin returns."""
+def cnvtImportNumpyArray(name, val, errorsin2d=True, copy=True):
+    """Convert a numpy array to plugin returns.
+
+    If copy is False, the array is used without conversion (e.g. for
+    memory-mapped arrays)."""
 
     try:
         val.shape
     except AttributeError:
         raise ImportPluginException(_("Not the correct format file"))
-    try:
-        val + 0.
-        val = val.astype(N.float64)
-    except TypeError:
-        raise ImportPluginException(_("Unsupported array type"))
+    if not copy:
+        if val.dtype.kind not in 'biuf':
+            raise ImportPluginException(_("Unsupported array type"))
+    else:
+        try:
+            val + 0.
+            val = val.astype(N.float64)
+        except TypeError:
+            raise ImportPluginException(_("Unsupported array type"))
 
     if val.ndim == 1:
         return datasetplugin.Dataset1D(name, val)
@@ -473,6 +482,59 @@ def cnvtImportNumpyArray(name, val, errorsin2d=True):
     else:
         raise ImportPluginException(_("Unsupported dataset shape"))
 
+def loadNpzMemmap(filename):
+    """Load arrays from a NPZ file, memory mapping the arrays which
+    are stored uncompressed.
+
+    Returns a dict of names to arrays
+    """
+
+    npz = N.load(filename)
+    out = {}
+    with zipfile.ZipFile(filename) as zf:
+        with open(filename, 'rb') as f:
+            for info in zf.infolist():
+                if not info.filename.endswith('.npy'):
+                    continue
+                name = info.filename[:-4]
+                out[name] = None
+
+                if info.compress_type == zipfile.ZIP_STORED:
+                    # find start of data in zip file from local header
+                    f.seek(info.header_offset)
+                    hdr = f.read(30)
+                    if len(hdr) == 30 and hdr[:4] == b'PK\x03\x04':
+                        namelen, extralen = struct.unpack('<HH', hdr[26:30])
+                        f.seek(info.header_offset+30+namelen+extralen)
+                        out[name] = _memmapNpy(filename, f)
+
+                if out[name] is None:
+                    out[name] = npz[name]
+    return out
+
+def _memmapNpy(filename, f):
+    """Memory map npy array stored in filename, where f is the file
+    positioned at the start of the array.
+
+    Returns None if the array cannot be memory mapped."""
+
+    try:
+        version = N.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran, dtype = N.lib.format.read_array_header_1_0(f)
+        elif version == (2, 0):
+            shape, fortran, dtype = N.lib.format.read_array_header_2_0(f)
+        else:
+            return None
+    except ValueError:
+        return None
+
+    if dtype.hasobject or N.prod(shape) == 0:
+        return None
+    return N.memmap(
+        filename, dtype=dtype, mode='r', offset=f.tell(), shape=shape,
+        order='F' if fortran else 'C')
+
 class ImportPluginNpy(ImportPlugin):
     """For reading single datasets from NPY numpy saved files."""
 
@@ -489,6 +551,9 @@ class ImportPluginNpy(ImportPlugin):
                             descr=_("Treat 2 and 3 column 2D arrays as\n"
                                     "data with error bars"),
                             default=True),
+            field.FieldBool("mmap",
+                            descr=_("Memory map file, keeping data type"),
+                            default=False),
             ]
 
     def getPreview(self, params):
@@ -497,7 +562,7 @@ class ImportPluginNpy(ImportPlugin):
         Returns (text, okaytoimport)
         """
         try:
-            retn = N.load(params.filename)
+            retn = N.load(params.filename, mmap_mode='r')
         except Exception:
             return _("Cannot read file"), False
 
@@ -518,14 +583,16 @@ class ImportPluginNpy(ImportPlugin):
         if not name:
             raise ImportPluginException(_("Please provide a name for the dataset"))
 
+        mmap = params.field_results.get("mmap", False)
         try:
-            retn = N.load(params.filename)
+            retn = N.load(params.filename, mmap_mode='r' if mmap else None)
         except Exception as e:
             raise ImportPluginException(_("Error while reading file: %s") %
                                         cstr(e))
 
         return [ cnvtImportNumpyArray(
-                name, retn, errorsin2d=params.field_results["errorsin2d"]) ]
+                name, retn, errorsin2d=params.field_results["errorsin2d"],
+                copy=not isinstance(retn, N.memmap)) ]
 
 class ImportPluginNpz(ImportPlugin):
     """For reading single datasets from NPY numpy saved files."""
@@ -541,6 +608,10 @@ class ImportPluginNpz(ImportPlugin):
                             descr=_("Treat 2 and 3 column 2D arrays as\n"
                                     "data with error bars"),
                             default=True),
+            field.FieldBool("mmap",
+                            descr=_("Memory map uncompressed arrays,\n"
+                                    "keeping data type"),
+                            default=False),
             ]
 
     def getPreview(self, params):
@@ -559,9 +630,15 @@ class ImportPluginNpz(ImportPlugin):
         except AttributeError:
             return _("Not an NPZ file"), False
 
+        # avoid reading uncompressed arrays to get their shapes
+        try:
+            arrays = loadNpzMemmap(params.filename)
+        except Exception:
+            return _("Cannot read file"), False
+
         text = []
-        for f in sorted(retn.files):
-            a = retn[f]
+        for f in sorted(arrays):
+            a = arrays[f]
             text.append(_('Name: %s') % f)
             text.append(_(' Shape: %s') % str(a.shape))
             text.append(_(' Datatype: %s (%s)') % (a.dtype.str, str(a.dtype)))
@@ -583,11 +660,22 @@ class ImportPluginNpz(ImportPlugin):
         except AttributeError:
             raise ImportPluginException(_("File is not in NPZ format"))
 
+        if params.field_results.get("mmap", False):
+            try:
+                arrays = loadNpzMemmap(params.filename)
+            except Exception as e:
+                raise ImportPluginException(
+                    _("Error while reading file: %s") % cstr(e))
+        else:
+            arrays = retn
+
         # convert each of the imported arrays
         out = []
-        for f in sorted(retn.files):
+        for f in sorted(arrays):
+            a = arrays[f]
             out.append( cnvtImportNumpyArray(
-                    f, retn[f], errorsin2d=params.field_results["errorsin2d"]) )
+                    f, a, errorsin2d=params.field_results["errorsin2d"],
+                    copy=not isinstance(a, N.memmap)) )
 
         return out
 
@@ -610,7 +698,17 @@ class ImportPluginBinary(ImportPlugin):
             field.FieldCombo("endian", descr=_("Endian (byte order)"),
                              items = ("little", "big"), editable=False),
             field.FieldInt("offset", descr=_("Offset (bytes)"), default=0, minval=0),
-            field.FieldInt("length", descr=_("Length (values)"), default=-1)
+            field.FieldInt("length",
+                           descr=_("Length (records, -1 for all)"),
+                           default=-1),
+            field.FieldInt("channels", descr=_("Interleaved channels"),
+                           default=1, minval=1),
+            field.FieldInt("recordsize",
+                           descr=_("Record size (bytes, 0 if packed)"),
+                           default=0, minval=0),
+            field.FieldBool("mmap",
+                            descr=_("Memory map file, keeping data type"),
+                            default=False),
             ]
 
     def getNumpyDataType(self, params):
@@ -619,16 +717,33 @@ class ImportPluginBinary(ImportPlugin):
         return t.newbyteorder( {"little": "<", "big": ">"} [
                 params.field_results["endian"]] )
 
+    def getRecordDataType(self, params):
+        """Get numpy datatype for a record containing the channels."""
+        t = self.getNumpyDataType(params)
+        channels = params.field_results.get("channels", 1)
+        size = params.field_results.get("recordsize", 0)
+        if size == 0:
+            size = channels*t.itemsize
+        elif size < channels*t.itemsize:
+            raise ImportPluginException(
+                _("Record size is smaller than size of channels"))
+        return N.dtype({
+                'names': ['c%i' % i for i in crange(channels)],
+                'formats': [t]*channels,
+                'offsets': [i*t.itemsize for i in crange(channels)],
+                'itemsize': size })
+
     def getPreview(self, params):
         """Preview of data files."""
         try:
+            size = os.path.getsize(params.filename)
             f = open(params.filename, "rb")
-            data = f.read()
+            data = f.read(65536)
             f.close()
         except EnvironmentError as e:
             return _("Cannot read file (%s)") % cstrerror(e), False
 
-        text = [_('File length: %i bytes') % len(data)]
+        text = [_('File length: %i bytes') % size]
 
         def filtchr(c):
             """Filtered character to ascii range."""
@@ -655,24 +770,47 @@ class ImportPluginBinary(ImportPlugin):
         if not name:
             raise ImportPluginException(_("Please provide a name for the dataset"))
 
+        dtype = self.getRecordDataType(params)
+        offset = params.field_results["offset"]
+        length = params.field_results["length"]
+
         try:
-            f = open(params.filename, "rb")
-            f.seek( params.field_results["offset"] )
-            retn = f.read()
-            f.close()
+            if params.field_results.get("mmap", False):
+                # number of records in file after offset
+                size = os.path.getsize(params.filename)
+                num = max(size-offset, 0) // dtype.itemsize
+                if length >= 0:
+                    if length > num:
+                        raise ValueError(_("File is too short"))
+                    num = length
+                if num == 0:
+                    data = N.zeros(0, dtype=dtype)
+                else:
+                    data = N.memmap(params.filename, dtype=dtype, mode='r',
+                                    offset=offset, shape=(num,))
+            else:
+                f = open(params.filename, "rb")
+                f.seek(offset)
+                retn = f.read()
+                f.close()
+                if length < 0:
+                    # ignore partial record at end
+                    retn = retn[:len(retn)//dtype.itemsize*dtype.itemsize]
+                data = N.frombuffer(retn, dtype=dtype, count=length)
         except EnvironmentError as e:
             raise ImportPluginException(_("Error while reading file '%s'\n\n%s") %
                                         (params.filename, cstrerror(e)))
-
-        try:
-            data = N.fromstring(retn, dtype=self.getNumpyDataType(params),
-                                count=params.field_results["length"])
         except ValueError as e:
             raise ImportPluginException(_("Error converting data for file '%s'\n\n%s") %
                                         (params.filename, cstr(e)))
 
-        data = data.astype(N.float64)
-        return [ datasetplugin.Dataset1D(name, data) ]
+        # memory-mapped channels are views of the file, otherwise
+        # they are converted to float64 by Dataset1D
+        names = dtype.names
+        if len(names) == 1:
+            return [ datasetplugin.Dataset1D(name, data[names[0]]) ]
+        return [ datasetplugin.Dataset1D('%s_%i' % (name, i+1), data[n])
+                 for i, n in enumerate(names) ]
 
 class ImportPluginGnuplot2D(ImportPlugin):
     """A Veusz plugin for reading data in Gnuplot 2D data format from a file."""
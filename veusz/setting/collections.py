@@ -96,6 +96,11 @@ class XYPlotLine(Line):
         self.add( setting.Bool('bezierJoin', False,
                                descr=_('Connect points with a cubic Bezier curve'),
                                usertext=_('Bezier join')), 1 )
+        self.add( setting.Bool('decimate', True,
+                               descr=_('Skip points which do not change the '
+                                       'line drawn (several in the same '
+                                       'pixel column)'),
+                               usertext=_('Decimate')), 2 )
         self.get('color').newDefault( Reference('../color') )
 
 class MarkerLine(Line):
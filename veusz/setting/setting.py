@@ -1156,6 +1156,7 @@ class Dataset(Str):
 
     def getData(self, doc):
         """Return a list of datasets entered."""
+        doc.dependencies.readDataset(self.val)
         d = doc.data.get(self.val)
         if ( d is not None and
              d.datatype == self.datatype and
@@ -1237,6 +1238,7 @@ class Datasets(Setting):
         """Return a list of datasets entered."""
         out = []
         for name in self.val:
+            doc.dependencies.readDataset(name)
             d = doc.data.get(name)
             if ( d is not None and
                  d.datatype == self.datatype and
@@ -1350,6 +1352,7 @@ class DatasetOrStr(Dataset):
         If checknull then None is returned if blank
         """
         if doc:
+            doc.dependencies.readDataset(self.val)
             ds = doc.data.get(self.val)
             if ds and ds.dimensions == 1:
                 return doc.formatValsWithDatatypeToText(
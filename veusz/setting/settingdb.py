@@ -80,6 +80,12 @@ defaultValues = {
 
     # add these directories to the python path (colon-separated)
     'external_pythonpath': '',
+
+    # reload linked files automatically when they change
+    'data_watchlinks': False,
+
+    # maximum size of cache of imported data (MB)
+    'importcache_maxsize': 1024,
     }
 
 class _SettingDB(object):
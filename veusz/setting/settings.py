@@ -200,6 +200,21 @@ class Settings(object):
         else:
             raise ValueError('"%s" is not a setting' % name)
 
+    def fingerprint(self, formatting=True):
+        """Return a tuple of the values of the settings, which can be
+        compared to check whether any have been modified.
+
+        If formatting is False, ignore formatting settings.
+        """
+        out = []
+        for name in self.setnames:
+            s = self.setdict[name]
+            if isinstance(s, Settings):
+                out.append( (name, s.fingerprint(formatting=formatting)) )
+            elif formatting or not s.formatting:
+                out.append( (name, s.get()) )
+        return tuple(out)
+
     def saveText(self, saveall, rootname = None):
         """Return the text which would reload the settings.
 
@@ -234,6 +234,54 @@ def validLinePoints(x, y):
     if last < x.shape[0]-1:
         yield x[last:], y[last:]
 
+def interleaveArrays(*args):
+    """Interleave numpy arrays, truncating to the shortest.
+
+    interleaveArrays(a, b) returns [a[0], b[0], a[1], b[1], ...]
+    """
+    minlen = min([x.shape[0] for x in args])
+    return N.column_stack([x[:minlen] for x in args]).ravel()
+
+def decimateLinePoints(x, y, width=1.):
+    """Reduce the number of points on a polyline without changing
+    how it looks.
+
+    Runs of consecutive points falling in the same column of the given
+    width are replaced by the first, minimum, maximum and last points
+    of the run (in their original order). Returns new x and y arrays,
+    or the originals if nothing would be gained.
+    """
+    x = N.asarray(x, dtype=N.float64)
+    y = N.asarray(y, dtype=N.float64)
+    npts = min(len(x), len(y))
+    if npts < 8:
+        return x, y
+    x, y = x[:npts], y[:npts]
+    if not N.all(N.isfinite(x)) or not N.all(N.isfinite(y)):
+        return x, y
+
+    col = N.floor(x * (1./width))
+    newrun = N.concatenate(([True], col[1:] != col[:-1]))
+    starts = N.nonzero(newrun)[0]
+    if len(starts)*4 >= npts:
+        return x, y
+    ends = N.concatenate((starts[1:], [npts])) - 1
+    runid = N.cumsum(newrun) - 1
+
+    def firstinrun(vals):
+        """Index of first point in each run equal to the run value."""
+        idx = N.nonzero(y == vals[runid])[0]
+        r = runid[idx]
+        return idx[ N.concatenate(([True], r[1:] != r[:-1])) ]
+
+    imin = firstinrun(N.minimum.reduceat(y, starts))
+    imax = firstinrun(N.maximum.reduceat(y, starts))
+
+    idx = N.column_stack((
+        starts, N.minimum(imin, imax), N.maximum(imin, imax), ends)).ravel()
+    idx = idx[ N.concatenate(([True], idx[1:] != idx[:-1])) ]
+    return x[idx], y[idx]
+
 class NonBlockingReaderThread(threading.Thread):
     """A class to read blocking file objects and return the result.
 
@@ -250,14 +298,19 @@ class NonBlockingReaderThread(threading.Thread):
 
     If exiteof is True, then exit capturing when we can capture no
     more data.
+
+    If binary is True, blocks of bytes are read as they become
+    available, rather than lines of text.
     """
 
-    def __init__(self, fileobject, exiteof=True):
+    def __init__(self, fileobject, exiteof=True, binary=False):
         """Create the thread object."""
         threading.Thread.__init__(self)
         self.fileobject = fileobject
+        self.binary = binary
         self.lock = threading.Lock()
-        self.data = ''
+        # list of pieces of data read (or an exception)
+        self.data = []
         self.done = False
         self.exiteof = exiteof
 
@@ -270,20 +323,23 @@ class NonBlockingReaderThread(threading.Thread):
         self.lock.acquire()
         data = self.data
         done = self.done
-        self.data = ''
+        self.data = []
         self.lock.release()
         if isinstance(data, Exception):
             # if the reader errored somewhere
             raise data
         else:
-            return data, done
+            return (b'' if self.binary else '').join(data), done
 
     def run(self):
         """Do the reading from the file object."""
 
         while True:
             try:
-                data = self.fileobject.readline()
+                if self.binary:
+                    data = os.read(self.fileobject.fileno(), 65536)
+                else:
+                    data = self.fileobject.readline()
             except Exception as e:
                 # error in reading
                 self.lock.acquire()
@@ -302,7 +358,7 @@ class NonBlockingReaderThread(threading.Thread):
                     time.sleep(0.1)
             else:
                 self.lock.acquire()
-                self.data += data
+                self.data.append(data)
                 self.lock.release()
 
 # standard python encodings
@@ -327,15 +383,32 @@ encodings = [
     'utf_32_be', 'utf_32_le', 'utf_32', 'utf_7', 'utf_8', 'utf_8_sig'
     ]
 
-def openEncoding(filename, encoding, mode='r'):
+def readFileRange(filename, byterange):
+    """Read bytes in file between byterange=(start, end)."""
+    with open(filename, 'rb') as f:
+        f.seek(byterange[0])
+        return f.read(byterange[1]-byterange[0])
+
+def openEncoding(filename, encoding, mode='r', byterange=None, offset=None):
     """Convenience function for opening file with encoding given.
 
     If filename == '{clipboard}', then load the data from the clipboard
     instead.
+
+    If byterange=(start, end) is given, only that part of the file is
+    read. If offset is given, the file is read from that byte offset.
     """
     if filename == '{clipboard}':
         text = qt4.QApplication.clipboard().text()
         return CStringIO(text)
+    elif byterange is not None:
+        return io.TextIOWrapper(
+            io.BytesIO(readFileRange(filename, byterange)),
+            encoding=encoding, errors='ignore')
+    elif offset is not None:
+        f = io.open(filename, 'rb')
+        f.seek(offset)
+        return io.TextIOWrapper(f, encoding=encoding, errors='ignore')
     else:
         return io.open(filename, mode, encoding=encoding, errors='ignore')
 
@@ -369,10 +442,26 @@ class _UTF8Decoder:
         return [cstr(x, "utf-8") for x in line]
 
 def get_unicode_csv_reader(filename, dialect=csv.excel,
-                           encoding='utf-8', **kwds):
-    """Return an iterator to iterate over CSV file with encoding given."""
+                           encoding='utf-8', byterange=None, offset=None,
+                           **kwds):
+    """Return an iterator to iterate over CSV file with encoding given.
+
+    If byterange=(start, end) is given, only that part of the file is
+    read. If offset is given, the file is read from that byte offset.
+    """
 
-    if filename != '{clipboard}':
+    if filename != '{clipboard}' and (
+            byterange is not None or offset is not None):
+        if byterange is not None:
+            data = io.BytesIO(readFileRange(filename, byterange))
+        else:
+            data = io.open(filename, 'rb')
+            data.seek(offset)
+        if cpy3:
+            f = io.TextIOWrapper(data, encoding=encoding, errors='ignore')
+        else:
+            f = _UTF8Recoder(data, encoding)
+    elif filename != '{clipboard}':
         if cpy3:
             # python3 native encoding support
             f = open(filename, encoding=encoding, errors='ignore')
@@ -25,6 +25,7 @@ import sys
 import os.path
 import signal
 import optparse
+import multiprocessing
 
 # trick to make sure veusz is on the path, if being run as a script
 try:
@@ -291,6 +292,10 @@ class VeuszApp(qt4.QApplication):
 def run():
     '''Run the main application.'''
 
+    # processes reading files in parallel restart the program in
+    # frozen Windows builds
+    multiprocessing.freeze_support()
+
     # nasty workaround for bug that causes non-modal windows not to
     # appear on mac see
     # https://github.com/jeremysanders/veusz/issues/39
@@ -451,6 +451,12 @@ class Axis(widget.Widget):
 
         self.docchangeset = self.document.changeset
 
+    def rangeFingerprint(self):
+        """Return values which determine how data are plotted on the
+        axis, to see whether plotters need redrawing."""
+        return ( tuple(self.plottedrange),
+                 self.settings.fingerprint(formatting=False) )
+
     def plottedLog(self):
         """Plotted in log?
         This is overridden if the mode is incorrect."""
@@ -429,6 +429,7 @@ class Contour(plotters.GenericPlotter):
         d = self.document
 
         # return if no data or if the dataset isn't two dimensional
+        d.dependencies.readDataset(s.data)
         data = d.data.get(s.data, None)
         if data is None or data.dimensions != 2 or data.data.size == 0:
             self.contsettings = self.lastdataset = None
@@ -61,6 +61,12 @@ class FunctionPlotter(GenericPlotter):
             descr = _('Number of steps to evaluate the function'
                       ' over'),
             usertext=_('Steps'), formatting=True), 0 )
+        s.add( setting.Bool(
+            'adaptive', False,
+            descr = _('Evaluate the function at more points where the '
+                      'plotted curve bends, jumps or becomes invalid, '
+                      'starting from the number of steps'),
+            usertext=_('Adaptive steps'), formatting=True), 1 )
         s.add( setting.Choice(
             'variable', ['x', 'y'], 'x',
             descr=_('Variable the function is a function of'),
@@ -152,28 +158,35 @@ class FunctionPlotter(GenericPlotter):
         if s.max != 'Auto':
             varaxrange[1] = min(s.max, varaxrange[1])
 
-        # work out function in steps
-        try:
-            if varaxis.settings.log:
-                # log spaced steps
-                l1, l2 = N.log(varaxrange[1]), N.log(varaxrange[0])
-                delta = (l2-l1)/20.
-                points = N.exp(N.arange(l1, l2+delta, delta))
-            else:
-                # linear spaced steps
-                delta = (varaxrange[1] - varaxrange[0])/20.
-                points = N.arange(varaxrange[0], varaxrange[1]+delta, delta)
-        except ZeroDivisionError:
-            # delta is zero
-            return
+        # evaluate function in steps over the range, in data
+        # coordinates so that the axis position is not changed
+        log = varaxis.settings.log
+        key = ( 'range', s.fingerprint(formatting=False),
+                tuple(varaxrange), log )
+        def evaluate():
+            try:
+                if log:
+                    # log spaced steps
+                    l1, l2 = N.log(varaxrange[1]), N.log(varaxrange[0])
+                    delta = (l2-l1)/20.
+                    points = N.exp(N.arange(l1, l2+delta, delta))
+                else:
+                    # linear spaced steps
+                    delta = (varaxrange[1] - varaxrange[0])/20.
+                    points = N.arange(
+                        varaxrange[0], varaxrange[1]+delta, delta)
+            except ZeroDivisionError:
+                # delta is zero
+                return None
+            return self._evalFunction(compiled, points)
 
-        env = self.initEnviron()
-        env[s.variable] = points
         try:
-            vals = eval(compiled, env) + points*0.
-        except:
+            vals = self.cachedEval(key, evaluate)
+        except Exception:
             # something wrong in the evaluation
             return
+        if vals is None:
+            return
 
         # get values which are finite: excluding nan and inf
         finitevals = vals[N.isfinite(vals)]
@@ -291,13 +304,20 @@ class FunctionPlotter(GenericPlotter):
              axes[1].settings.direction != 'vertical' ):
             return None, None
 
-        # get axes function is plotted along and on and
+        # get axis function is plotted along
+        axis1 = axes[0] if s.variable == 'x' else axes[1]
+        return self._axisPoints(axis1, posn)
+
+    def _axisPoints(self, axis1, posn):
+        """Calculate the real and screen points to plot along the
+        independent axis axis1."""
+
+        s = self.settings
+
         # plot coordinates along axis function plotted along
         if s.variable == 'x':
-            axis1, axis2 = axes[0], axes[1]
             minval, maxval = posn[0], posn[2]
         else:
-            axis1, axis2 = axes[1], axes[0]
             minval, maxval = posn[1], posn[3]
 
         # get equally spaced coordinates along axis in plotter coords
@@ -315,48 +335,156 @@ class FunctionPlotter(GenericPlotter):
 
         return axispts, plotpts
 
-    def calcDependentPoints(self, axispts, axes, posn):
-        """Calculate the real and screen points to plot for the dependent axis"""
+    def evalCurve(self, varaxis, posn):
+        """Evaluate the function along varaxis, the axis it is a
+        function of.
+
+        Returns (independent, dependent) values, or (None, None) if the
+        function is invalid. Raises an exception if evaluation fails.
+
+        The result only depends on the range of the independent axis,
+        not posn, so is cached using this range and the widget
+        settings as the key.
+        """
 
         s = self.settings
+        key = ( 'curve', s.steps, s.fingerprint(formatting=False),
+                varaxis.rangeFingerprint() )
 
-        if ( axes[0] is None or axes[1] is None or
-             axes[0].settings.direction != 'horizontal' or
-             axes[1].settings.direction != 'vertical' ):
-            return None, None
+        def evaluate():
+            compiled = self.document.evaluate.compileCheckedExpression(
+                s.function)
+            if not compiled:
+                return None, None
+            axispts = self._axisPoints(varaxis, posn)[0]
+            return axispts, self._evalFunction(compiled, axispts)
 
-        if axispts is None:
-            return None, None
+        return self.cachedEval(key, evaluate)
+
+    def _evalFunction(self, compiled, axispts):
+        """Evaluate compiled function at the independent values given."""
+        env = self.initEnviron()
+        env[self.settings.variable] = axispts
+        return eval(compiled, env) + N.zeros(axispts.shape)
+
+    def refinePoints(self, axes, posn, ipts, pipts, dpts, pdpts,
+                     tolerance=0.25, minstep=0.5, maxpoints=65536):
+        """Evaluate the function at more points where needed to plot it
+        accurately.
+
+        Each level, the midpoints of intervals are evaluated together.
+        An interval is split if the curve at its midpoint is more than
+        tolerance (in plotter coordinates) from a straight line, or if
+        the function becomes non-finite within it. Intervals are not
+        split below minstep along the independent axis. No more than
+        maxpoints points are returned (unless more were given).
 
+        Returns new (ipts, pipts, dpts, pdpts)
+        """
+
+        s = self.settings
         compiled = self.document.evaluate.compileCheckedExpression(s.function)
-        if not compiled:
-            return None, None
+        if s.variable == 'x':
+            axis1, axis2 = axes[0], axes[1]
+        else:
+            axis1, axis2 = axes[1], axes[0]
 
-        axis2 = axes[1] if s.variable == 'x' else axes[0]
+        # intervals to split
+        split = N.ones(max(len(pipts)-1, 0), dtype=bool)
+        while N.any(split) and len(pipts) < maxpoints:
+            # only split as many intervals as points remain
+            idx = N.flatnonzero(split)[:maxpoints-len(pipts)]
+            pmid = 0.5*(pipts[idx] + pipts[idx+1])
+            imid = axis1.plotterToDataCoords(posn, pmid)
+            try:
+                dmid = self._evalFunction(compiled, imid)
+                pdmid = axis2.dataToPlotterCoords(posn, dmid)
+            except Exception:
+                # errors are reported for the unrefined points
+                break
+            if pdmid.shape != pmid.shape:
+                break
+
+            # deviation of midpoint from line joining ends
+            with N.errstate(invalid='ignore'):
+                deviation = N.abs(pdmid - 0.5*(pdpts[idx] + pdpts[idx+1]))
+            fin1, fin2 = N.isfinite(pdpts[idx]), N.isfinite(pdpts[idx+1])
+            finmid = N.isfinite(pdmid)
+            refine = (
+                ( (fin1 & fin2 & finmid & (deviation > tolerance)) |
+                  (fin1 != finmid) | (fin2 != finmid) ) &
+                (N.abs(pmid - pipts[idx]) > minstep) )
+
+            # insert midpoints and mark both halves of refined
+            # intervals to be split again
+            ipts = N.insert(ipts, idx+1, imid)
+            pipts = N.insert(pipts, idx+1, pmid)
+            dpts = N.insert(dpts, idx+1, dmid)
+            pdpts = N.insert(pdpts, idx+1, pdmid)
+            newposn = idx + 1 + N.arange(len(idx))
+            split = N.zeros(len(pipts)-1, dtype=bool)
+            split[newposn[refine]-1] = True
+            split[newposn[refine]] = True
+
+        return ipts, pipts, dpts, pdpts
+
+    def _calcPlotterPoints(self, axes, posn):
+        """Evaluate the function, returning values and plotter
+        coordinates (ipts, pipts, dpts, pdpts) for the independent and
+        dependent axes."""
 
-        # evaluate function
-        env = self.initEnviron()
-        env[s.variable] = axispts
+        s = self.settings
+        if ( axes[0] is None or axes[1] is None or
+             axes[0].settings.direction != 'horizontal' or
+             axes[1].settings.direction != 'vertical' ):
+            return None, None, None, None
+
+        varaxis = axes[0] if s.variable == 'x' else axes[1]
         try:
-            results = eval(compiled, env) + N.zeros(axispts.shape)
-            resultpts = axis2.dataToPlotterCoords(posn, results)
+            ipts, dpts = self.evalCurve(varaxis, posn)
         except Exception as e:
             self.logEvalError(e)
-            results = None
-            resultpts = None
+            return None, None, None, None
+        if ipts is None:
+            return None, None, None, None
 
-        return results, resultpts
+        if s.variable == 'x':
+            axis1, axis2 = axes[0], axes[1]
+        else:
+            axis1, axis2 = axes[1], axes[0]
+        pipts = axis1.dataToPlotterCoords(posn, ipts)
+        pdpts = axis2.dataToPlotterCoords(posn, dpts)
+        return ipts, pipts, dpts, pdpts
 
     def calcFunctionPoints(self, axes, posn):
-        ipts, pipts = self.getIndependentPoints(axes, posn)
-        dpts, pdpts = self.calcDependentPoints(ipts, axes, posn)
+        s = self.settings
 
-        if self.settings.variable == 'x':
+        if s.adaptive and axes[0] is not None and axes[1] is not None:
+            # refined points depend on plotter coordinates
+            key = ( 'adaptive', s.steps, s.fingerprint(formatting=False),
+                    tuple(posn), axes[0].rangeFingerprint(),
+                    axes[1].rangeFingerprint() )
+            def evaluate():
+                ipts, pipts, dpts, pdpts = self._calcPlotterPoints(axes, posn)
+                if dpts is None or dpts.ndim != 1 or len(dpts) != len(ipts):
+                    return ipts, pipts, dpts, pdpts
+                return self.refinePoints(
+                    axes, posn, ipts, pipts, dpts, pdpts)
+            ipts, pipts, dpts, pdpts = self.cachedEval(key, evaluate)
+        else:
+            ipts, pipts, dpts, pdpts = self._calcPlotterPoints(axes, posn)
+
+        if s.variable == 'x':
             return (ipts, dpts), (pipts, pdpts)
         else:
             return (dpts, ipts), (pdpts, pipts)
 
     def _pickable(self, posn):
+        return pickable.cachedPickable(
+            self, (self.document.changeset, tuple(posn)),
+            lambda: self._makePickable(posn))
+
+    def _makePickable(self, posn):
         s = self.settings
 
         axisnames = [s.xAxis, s.yAxis]
@@ -89,52 +89,81 @@ def cropLinearImageToBox(image, pltx, plty, posn):
     # return new image coordinates and image
     return pltx, plty, newimage
 
-def cropGridImageToBox(image, gridx, gridy, posn):
-    """Given an image, pixel coordinates and box, crop image to box."""
-
-    def trimGrid(grid, p1, p2):
-        """Trim grid to bounds given, returning index range."""
+def _edgeIndices(edges, vals):
+    """Return indices of pixels, with monotonic edges given, containing
+    vals."""
+    npix = len(edges)-1
+    if edges[0] <= edges[-1]:
+        idx = N.searchsorted(edges, vals, side='right') - 1
+    else:
+        idx = npix - N.searchsorted(edges[::-1], vals, side='right')
+    return N.clip(idx, 0, npix-1)
+
+def _numOutputPixels(edges, length, maxpixels):
+    """Number of output pixels to resample pixels with edges onto a
+    range of length plotter units.
+
+    There is a pixel for the narrowest image pixel, but no more than
+    one for each plotter unit, or maxpixels."""
+
+    mindelta = N.abs(N.diff(edges)).min()
+    num = N.ceil(length)
+    if mindelta > 0:
+        num = min(num, N.ceil(length/mindelta))
+    return int(max(min(num, maxpixels), 1))
+
+def resampleGridToBox(gridx, gridy, posn, maxpixels=2048):
+    """Given pixel edges gridx and gridy for an image in plotter
+    coordinates, compute how to resample the image onto a linear grid
+    cropped to posn.
+
+    The output grid has a pixel for the narrowest image pixel along
+    each axis, but no more than one per plotter coordinate unit, or
+    maxpixels. The image should be drawn scaled to the plotted ranges.
+
+    Returns None if the image is outside posn, otherwise
+     - plotted x range of resampled image
+     - plotted y range of resampled image (bottom, top)
+     - indices of image rows for each output row (as a column)
+     - indices of image columns for each output column
+    Indexing the image data with these gives the resampled data.
+    """
 
-        if grid[0] < grid[-1]:
-            # fwd order
-            i1 = max(N.searchsorted(grid, p1, side='right')-1, 0)
-            i2 = min(N.searchsorted(grid, p2, side='left'), len(grid)) + 1
+    if not N.all(N.isfinite(gridx)) or not N.all(N.isfinite(gridy)):
+        return None
 
-        else:
-            # reverse order of grid
-            gridr = grid[::-1]
+    x1 = float(max(min(gridx[0], gridx[-1]), posn[0]))
+    x2 = float(min(max(gridx[0], gridx[-1]), posn[2]))
+    y1 = float(max(min(gridy[0], gridy[-1]), posn[1]))
+    y2 = float(min(max(gridy[0], gridy[-1]), posn[3]))
+    if x2 <= x1 or y2 <= y1:
+        return None
 
-            i1 = max( len(grid) - N.searchsorted(gridr, p2, side='left')-1,
-                      0)
-            i2 = min( len(grid) - N.searchsorted(gridr, p1, side='right'),
-                      len(grid) ) + 1
+    # centres of output pixels (first row is the bottom, as for data)
+    nx = _numOutputPixels(gridx, x2-x1, maxpixels)
+    ny = _numOutputPixels(gridy, y2-y1, maxpixels)
+    xcentres = x1 + (N.arange(nx)+0.5)*((x2-x1)/nx)
+    ycentres = y2 - (N.arange(ny)+0.5)*((y2-y1)/ny)
 
-        return i1, i2
+    xidx = _edgeIndices(gridx, xcentres)
+    yidx = _edgeIndices(gridy, ycentres)
 
-    def trimEdge(grid, minval, maxval):
-        """Trim outer gridpoints to minval and maxval."""
-        if grid[0] < grid[-1]:
-            grid[0] = max(grid[0], minval)
-            grid[-1] = min(grid[-1], maxval)
-        else:
-            grid[0] = min(grid[0], maxval)
-            grid[-1] = max(grid[-1], minval)
+    return (x1, x2), (y2, y1), yidx[:,N.newaxis], xidx
 
-    # see whether cropping necessary
-    x1, x2 = trimGrid(gridx, posn[0], posn[2])
-    y1, y2 = trimGrid(gridy, posn[1], posn[3])
+def clipTransparencyToShape(transimg, shape):
+    """Return transparency array transimg with the given shape.
 
-    if x1 > 0 or y1 > 0 or x2 < len(gridx)-1 or y2 < len(gridy)-1:
-        # do cropping
-        image = image.copy(x1, len(gridy)-y2, x2-x1-1, y2-y1-1)
-        gridx = N.array(gridx[x1:x2])
-        gridy = N.array(gridy[y1:y2])
-
-        # trim outer grid point to viewable range
-        trimEdge(gridx, posn[0], posn[2])
-        trimEdge(gridy, posn[1], posn[3])
+    Only the region overlapping the image is used, so that pixels
+    outside transimg are left opaque.
+    """
 
-    return gridx, gridy, image
+    if transimg.shape == shape:
+        return transimg
+    out = N.ones(shape)
+    ny = min(shape[0], transimg.shape[0])
+    nx = min(shape[1], transimg.shape[1])
+    out[:ny, :nx] = transimg[:ny, :nx]
+    return out
 
 class Image(plotters.GenericPlotter):
     """A class which plots an image on a graph with a specified
@@ -230,16 +259,24 @@ class Image(plotters.GenericPlotter):
         """Update data range from data."""
 
         s = self.settings
+        if data is not None and (s.min == 'Auto' or s.max == 'Auto'):
+            # avoid scanning large images each time
+            def evaluate():
+                # record dataset used, in case it is modified
+                s.get('data').getData(self.document)
+                return N.nanmin(data.data), N.nanmax(data.data)
+            datamin, datamax = self.cachedEval(('range', data), evaluate)
+
         minval = s.min
         if minval == 'Auto':
             if data is not None:
-                minval = N.nanmin(data.data)
+                minval = datamin
             else:
                 minval = 0.
         maxval = s.max
         if maxval == 'Auto':
             if data is not None:
-                maxval = N.nanmax(data.data)
+                maxval = datamax
             else:
                 maxval = minval + 1
 
@@ -282,6 +319,61 @@ class Image(plotters.GenericPlotter):
         return (minval, maxval, s.colorScaling, s.colorMap,
                 s.transparency, s.colorInvert)
 
+    def _sampleStep(self, npixels, pltrange):
+        """Get step (a power of two) to sample image pixels with, so
+        that there are at least as many as output pixels."""
+        step = 1
+        ratio = npixels / max(abs(pltrange[1]-pltrange[0]), 1.)
+        while step*2 <= ratio:
+            step *= 2
+        return step
+
+    def colorImage(self, vals, transimg, minval, maxval):
+        """Convert array vals to a QImage using the colormap.
+        transimg is an optional transparency array."""
+        s = self.settings
+        cmap = self.document.evaluate.getColormap(s.colorMap, s.colorInvert)
+        return utils.applyColorMap(
+            cmap, s.colorScaling, vals, minval, maxval,
+            s.transparency, transimg=transimg)
+
+    def makeColorImage(self, data, transdata, stepx=1, stepy=1):
+        """Return a QImage of the data, colored using the colormap.
+
+        If stepx or stepy are greater than 1, only every stepx or
+        stepy pixel is used, dropping pixels which do not make up a
+        full step at the ends.
+
+        Recently made images are cached, keyed on the datasets and
+        settings used.
+        """
+
+        s = self.settings
+        d = self.document
+        minval, maxval = self.getDataValueRange(data)
+
+        def evaluate():
+            # record datasets used, in case they are modified
+            s.get('data').getData(d)
+            s.get('transparencyData').getData(d)
+
+            vals = data.data
+            transimg = None if transdata is None else transdata.data
+            if stepx > 1 or stepy > 1:
+                ny, nx = vals.shape
+                sel = ( slice(stepy//2, (ny//stepy)*stepy, stepy),
+                        slice(stepx//2, (nx//stepx)*stepx, stepx) )
+                vals = vals[sel]
+                if transimg is not None:
+                    transimg = N.ascontiguousarray(transimg[sel])
+
+            return self.colorImage(vals, transimg, minval, maxval)
+
+        key = ( 'image', data, transdata, s.colorMap, s.colorInvert,
+                s.colorScaling, minval, maxval, s.transparency,
+                stepx, stepy )
+        return self.cachedEval(key, evaluate)
+
     def dataDraw(self, painter, axes, posn, clip):
         """Draw image."""
 
@@ -292,9 +384,7 @@ class Image(plotters.GenericPlotter):
         if s.hide or data is None or data.dimensions != 2:
             return
 
-        transimg = s.get('transparencyData').getData(d)
-        if transimg is not None:
-            transimg = transimg.data
+        transdata = s.get('transparencyData').getData(d)
 
         rangex, rangey = data.getDataRanges()
         pltrangex = axes[0].dataToPlotterCoords(posn, N.array(rangex))
@@ -305,16 +395,22 @@ class Image(plotters.GenericPlotter):
            abs(pltrangey[0]-pltrangey[1])<1e-2):
             return
 
-        # make QImage from data
-        cmap = d.evaluate.getColormap(s.colorMap, s.colorInvert)
-        datavaluerange = self.getDataValueRange(data)
-        image = utils.applyColorMap(
-            cmap, s.colorScaling, data.data,
-            datavaluerange[0], datavaluerange[1],
-            s.transparency, transimg=transimg)
-
         if data.isLinearImage():
-            # linearly spaced grid
+            # no point coloring more pixels than can be shown
+            ny, nx = data.data.shape
+            stepx = self._sampleStep(nx, pltrangex)
+            stepy = self._sampleStep(ny, pltrangey)
+            if stepx > 1 or stepy > 1:
+                # range covered by sampled pixels
+                rangex = ( rangex[0], rangex[0] + (rangex[1]-rangex[0]) *
+                           ((nx//stepx)*stepx / nx) )
+                rangey = ( rangey[0], rangey[0] + (rangey[1]-rangey[0]) *
+                           ((ny//stepy)*stepy / ny) )
+                pltrangex = axes[0].dataToPlotterCoords(posn, N.array(rangex))
+                pltrangey = axes[1].dataToPlotterCoords(posn, N.array(rangey))
+
+            # make QImage from data
+            image = self.makeColorImage(data, transdata, stepx, stepy)
 
             if ( pltrangex[0] < posn[0] or pltrangex[1] > posn[2] or
                  pltrangey[0] < posn[1] or pltrangey[1] > posn[3] ):
@@ -328,15 +424,20 @@ class Image(plotters.GenericPlotter):
                 scalefnx=lambda v: axes[0].dataToPlotterCoords(posn, v),
                 scalefny=lambda v: axes[1].dataToPlotterCoords(posn, v))
 
-            # crop any pixels completely outside posn
-            xedgep, yedgep, image = cropGridImageToBox(
-                image, xedgep, yedgep, posn)
-
-            # make image on linear grid
-            image = utils.resampleLinearImage(image, xedgep, yedgep)
-
-            pltrangex = xedgep[0], xedgep[-1]
-            pltrangey = yedgep[0], yedgep[-1]
+            # resample data onto linear grid inside posn, at the
+            # output resolution
+            resample = resampleGridToBox(xedgep, yedgep, posn)
+            if resample is None:
+                return
+            pltrangex, pltrangey, yidx, xidx = resample
+
+            vals = data.data[yidx, xidx]
+            transimg = None
+            if transdata is not None:
+                transimg = clipTransparencyToShape(
+                    transdata.data, data.data.shape)[yidx, xidx]
+            minval, maxval = self.getDataValueRange(data)
+            image = self.colorImage(vals, transimg, minval, maxval)
 
         # optionally smooth images before displaying
         if s.smooth:
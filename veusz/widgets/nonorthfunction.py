@@ -142,7 +142,12 @@ class NonOrthFunction(Widget):
     def updateDataRanges(self, inrange):
         '''Update ranges of data given function.'''
 
-    def _pickable(self):
+    def _pickable(self, bounds):
+        return pickable.cachedPickable(
+            self, (self.document.changeset, tuple(bounds)),
+            self._makePickable)
+
+    def _makePickable(self):
         apts, bpts = self.getFunctionPoints()
         px, py = self.parent.graphToPlotCoords(apts, bpts)
 
@@ -154,10 +159,10 @@ class NonOrthFunction(Widget):
         return pickable.GenericPickable( self, labels, (apts, bpts), (px, py) )
 
     def pickPoint(self, x0, y0, bounds, distance='radial'):
-        return self._pickable().pickPoint(x0, y0, bounds, distance)
+        return self._pickable(bounds).pickPoint(x0, y0, bounds, distance)
 
     def pickIndex(self, oldindex, direction, bounds):
-        return self._pickable().pickIndex(oldindex, direction, bounds)
+        return self._pickable(bounds).pickIndex(oldindex, direction, bounds)
 
     def draw(self, parentposn, phelper, outerbounds=None):
         '''Plot the function on a plotter.'''
@@ -22,7 +22,7 @@
 from __future__ import division
 import numpy as N
 
-from ..compat import CBool
+from ..compat import CBool, crange
 from .. import document
 
 class PickInfo(CBool):
@@ -87,6 +87,153 @@ def _chooseOrderingSign(m, c, p):
     else:
         assert m is not None or p is not None
 
+class ScreenIndex(object):
+    """Spatial index of the finite screen points inside bounds.
+
+    Points are sorted along each axis for picking the closest point
+    horizontally or vertically, and put in a grid of cells for picking
+    the closest radially. These are built when first needed.
+    """
+
+    def __init__(self, xscreen, yscreen, bounds):
+        self.bounds = tuple(bounds)
+        with N.errstate(invalid='ignore'):
+            visible = (
+                N.isfinite(xscreen) & N.isfinite(yscreen) &
+                (xscreen >= bounds[0]) & (xscreen <= bounds[2]) &
+                (yscreen >= bounds[1]) & (yscreen <= bounds[3]) )
+
+        # indices of the visible points (ascending) and their positions
+        self.visidx = N.flatnonzero(visible)
+        self.xs = N.asarray(xscreen)[self.visidx]
+        self.ys = N.asarray(yscreen)[self.visidx]
+
+        self.sortedaxes = {}
+        self.grid = None
+
+    def _sortedAxis(self, axis):
+        """Get visible values along axis ('x' or 'y') in order, with
+        their indices."""
+        if axis not in self.sortedaxes:
+            vals = self.xs if axis == 'x' else self.ys
+            order = N.argsort(vals)
+            self.sortedaxes[axis] = (vals[order], self.visidx[order])
+        return self.sortedaxes[axis]
+
+    def nearestAlong(self, axis, v0):
+        """Find the point closest to v0 along axis.
+
+        Returns (index, distance) or (None, inf) if there are no points.
+        If there are several, the one with the lowest index is returned.
+        """
+        vals, idxs = self._sortedAxis(axis)
+        best, bestdist = None, N.inf
+
+        pos = N.searchsorted(vals, v0)
+        # check closest values below and above v0
+        for cpos in (pos-1, pos):
+            if cpos < 0 or cpos >= len(vals):
+                continue
+            dist = abs(vals[cpos] - v0)
+            if dist <= bestdist:
+                # lowest index of points with this value
+                idx = idxs[ N.searchsorted(vals, vals[cpos], side='left'):
+                            N.searchsorted(vals, vals[cpos], side='right')
+                            ].min()
+                if dist < bestdist or idx < best:
+                    best, bestdist = idx, dist
+
+        return best, bestdist
+
+    def _makeGrid(self):
+        """Put the visible points into a grid of cells, with around
+        four points in each, in order of cell."""
+        x1, y1, x2, y2 = self.bounds
+        width = max(x2-x1, 1e-3)
+        height = max(y2-y1, 1e-3)
+        cellsize = max(N.sqrt(width*height*4./max(len(self.xs), 1)), 1.)
+        nx = int(width/cellsize) + 1
+        ny = int(height/cellsize) + 1
+
+        cx = N.clip(((self.xs-x1)/cellsize).astype(N.intp), 0, nx-1)
+        cy = N.clip(((self.ys-y1)/cellsize).astype(N.intp), 0, ny-1)
+        cellidx = cy*nx + cx
+        order = N.argsort(cellidx)
+
+        # where points for each cell start in the sorted arrays
+        starts = N.concatenate((
+            [0], N.cumsum(N.bincount(cellidx, minlength=nx*ny)) ))
+
+        self.grid = ( cellsize, nx, ny, starts,
+                      self.xs[order], self.ys[order], self.visidx[order] )
+
+    def nearestRadial(self, x0, y0):
+        """Find the point closest to (x0, y0).
+
+        Returns (index, distance) or (None, inf) if there are no points.
+        If there are several, the one with the lowest index is returned.
+        """
+        if len(self.xs) == 0:
+            return None, N.inf
+        if self.grid is None:
+            self._makeGrid()
+        cellsize, nx, ny, starts, gx, gy, gidx = self.grid
+        bx, by = self.bounds[:2]
+
+        # cell containing point, moved inside grid
+        qx = min(max(int((x0-bx)//cellsize), 0), nx-1)
+        qy = min(max(int((y0-by)//cellsize), 0), ny-1)
+
+        # search increasing blocks of cells around point until the
+        # closest point is nearer than any outside the block
+        r = 1
+        while True:
+            cx1, cx2 = max(qx-r, 0), min(qx+r, nx-1)
+            cy1, cy2 = max(qy-r, 0), min(qy+r, ny-1)
+
+            sel = N.concatenate([
+                N.arange(starts[row*nx+cx1], starts[row*nx+cx2+1])
+                for row in crange(cy1, cy2+1) ])
+            if len(sel) > 0:
+                dist = N.sqrt((gx[sel]-x0)**2 + (gy[sel]-y0)**2)
+                mindist = dist.min()
+                best = gidx[sel][dist == mindist].min()
+
+                # distance to edge of block (ignoring edges of grid)
+                margin = min(
+                    x0-(bx+cx1*cellsize) if cx1 > 0 else N.inf,
+                    (bx+(cx2+1)*cellsize)-x0 if cx2 < nx-1 else N.inf,
+                    y0-(by+cy1*cellsize) if cy1 > 0 else N.inf,
+                    (by+(cy2+1)*cellsize)-y0 if cy2 < ny-1 else N.inf )
+                if mindist < margin:
+                    return best, mindist
+
+            r *= 2
+
+    def nextVisible(self, i, incr):
+        """Get the index of the first visible point from i, moving in
+        direction incr (+1 or -1), or None if none."""
+        if incr > 0:
+            pos = N.searchsorted(self.visidx, i, side='left')
+            return self.visidx[pos] if pos < len(self.visidx) else None
+        else:
+            pos = N.searchsorted(self.visidx, i, side='right') - 1
+            return self.visidx[pos] if pos >= 0 else None
+
+def cachedPickable(widget, key, makepickable):
+    """Return pickable for widget made by makepickable().
+
+    The previous pickable is reused if key (which should contain
+    everything the screen coordinates depend on) is unchanged, so that
+    its screen index is kept between picks.
+    """
+    cache = getattr(widget, '_pickablecache', None)
+    if cache is not None and cache[0] == key:
+        return cache[1]
+    pickable = makepickable()
+    widget._pickablecache = (key, pickable)
+    return pickable
+
 class GenericPickable:
     """Utility class which abstracts the math of picking the closest point out
        of a list of points"""
@@ -97,30 +244,41 @@ class GenericPickable:
         self.xvals, self.yvals = vals
         self.xscreen, self.yscreen = screenvals
 
+        # built when required
+        self.screenindex = None
+        self.finiteidx = None
+
+    def _screenIndex(self, bounds):
+        """Get spatial index of screen points inside bounds."""
+        if self.screenindex is None or self.screenindex.bounds != tuple(bounds):
+            self.screenindex = ScreenIndex(self.xscreen, self.yscreen, bounds)
+        return self.screenindex
+
     def _pickSign(self, i):
         if len(self.xscreen) <= 1:
             # we only have one element, so it doesn't matter anyways
             return 1
 
-        # go backwards to get previous finite point
-        mi = i-1
-        while mi >= 0 and not N.isfinite(self.xscreen[mi]+self.yscreen[mi]):
-            mi -= 1
-        if mi < 0:
+        if self.finiteidx is None:
+            self.finiteidx = N.flatnonzero(
+                N.isfinite(self.xscreen) & N.isfinite(self.yscreen))
+        pos = N.searchsorted(self.finiteidx, i)
+
+        # previous finite point
+        if pos == 0:
             m = None
         else:
+            mi = self.finiteidx[pos-1]
             m = self.xscreen[mi], self.yscreen[mi]
 
         # point in centre
         c = self.xscreen[i], self.yscreen[i]
 
-        # find next finite point
-        pi = i+1
-        while pi < len(self.xscreen) and not N.isfinite(self.xscreen[pi]+self.yscreen[pi]):
-            pi += 1
-        if pi == len(self.xscreen):
+        # next finite point
+        if pos+1 >= len(self.finiteidx):
             p = None
         else:
+            pi = self.finiteidx[pos+1]
             p = self.xscreen[pi], self.yscreen[pi]
 
         return _chooseOrderingSign(m, c, p)
@@ -136,37 +294,24 @@ class GenericPickable:
         if len(self.xscreen) == 0 or len(self.yscreen) == 0:
             return info
 
-        # calculate distances
+        # find closest point inside bounds using index
+        index = self._screenIndex(bounds)
         if distance_direction == 'vertical':
             # measure distance along y
-            dist = N.abs(self.yscreen - y0)
+            i, m = index.nearestAlong('y', y0)
         elif distance_direction == 'horizontal':
             # measure distance along x
-            dist = N.abs(self.xscreen - x0)
+            i, m = index.nearestAlong('x', x0)
         elif distance_direction == 'radial':
             # measure radial distance
-            dist = N.sqrt((self.xscreen - x0)**2 + (self.yscreen - y0)**2)
+            i, m = index.nearestRadial(x0, y0)
         else:
             # programming error
             assert (distance_direction == 'radial' or
                     distance_direction == 'vertical' or
                     distance_direction == 'horizontal')
 
-        # ignore points which are offscreen or not finite
-        with N.errstate(invalid='ignore'):
-            outofbounds = (
-                (self.xscreen < bounds[0]) | (self.xscreen > bounds[2]) |
-                (self.yscreen < bounds[1]) | (self.yscreen > bounds[3]) |
-                ~N.isfinite(self.xscreen) | ~N.isfinite(self.yscreen) )
-        dist[outofbounds] = N.inf
-
-        m = N.min(dist)
-        # if there are multiple equidistant points, arbitrarily take
-        # the first one
-
-        try:
-            i = N.nonzero(dist == m)[0][0]
-        except IndexError:
+        if i is None:
             return info
 
         info.screenpos = self.xscreen[i], self.yscreen[i]
@@ -206,17 +351,9 @@ class GenericPickable:
         else:
             assert direction == 'right' or direction == 'left'
 
-        i += incr
-
         # skip points that are outside of the bounds or are not finite
-        while (i >= 0 and i < len(self.xscreen) and
-                ( not N.isfinite(self.xscreen[i]) or
-                  not N.isfinite(self.yscreen[i]) or
-                  (self.xscreen[i] < bounds[0] or self.xscreen[i] > bounds[2] or
-                   self.yscreen[i] < bounds[1] or self.yscreen[i] > bounds[3]) )):
-            i += incr
-
-        if i < 0 or i >= len(self.xscreen):
+        i = self._screenIndex(bounds).nextVisible(i+incr, incr)
+        if i is None:
             return info
 
         info.screenpos = self.xscreen[i], self.yscreen[i]
@@ -22,6 +22,7 @@
 """A generic plotter widget which is inherited by function and point."""
 
 from __future__ import division
+import itertools
 from .. import qtall as qt4
 import numpy as N
 
@@ -43,6 +44,11 @@ class GenericPlotter(widget.Widget):
         """Initialise object, setting axes."""
         widget.Widget.__init__(self, parent, name=name)
 
+        # cached results of evaluations as [key, node, result, bytes],
+        # most recent last (see cachedEval)
+        self.evalcache = []
+        self.evalnodes = itertools.count()
+
     @classmethod
     def allowedParentTypes(klass):
         from . import graph
@@ -101,6 +107,56 @@ class GenericPlotter(widget.Widget):
         cliprect = qt4.QRectF(qt4.QPointF(x1, y1), qt4.QPointF(x2, y2))
         return cliprect
 
+    # maximum total size in bytes of results kept by cachedEval
+    evalcachebytes = 64*1024*1024
+
+    @staticmethod
+    def _evalResultBytes(result):
+        """Approximate size in bytes of a result from cachedEval."""
+        if isinstance(result, qt4.QImage):
+            return result.byteCount()
+        elif isinstance(result, N.ndarray):
+            return result.nbytes
+        elif isinstance(result, (tuple, list)):
+            return sum([GenericPlotter._evalResultBytes(r) for r in result])
+        return 0
+
+    def cachedEval(self, key, evalfn, maxsize=4):
+        """Return evalfn(), reusing the result from a previous call with
+        the same key if nothing it read (datasets, custom
+        definitions...) has changed since.
+
+        The last maxsize results are kept, dropping older results if
+        their total size (images and arrays) exceeds evalcachebytes.
+        """
+
+        deps = self.document.dependencies
+
+        # keys may contain unhashable settings values, so are compared
+        for i, entry in enumerate(self.evalcache):
+            if entry[0] == key:
+                del self.evalcache[i]
+                if deps.isValid(entry[1]):
+                    self.evalcache.append(entry)
+                    return entry[2]
+                deps.forget(entry[1])
+                break
+
+        node = ('eval', self, next(self.evalnodes))
+        with deps.evaluating(node):
+            deps.readCustoms()
+            result = evalfn()
+
+        self.evalcache.append(
+            [key, node, result, self._evalResultBytes(result)])
+        total = sum([e[3] for e in self.evalcache])
+        while ( len(self.evalcache) > maxsize or
+                (len(self.evalcache) > 1 and total > self.evalcachebytes) ):
+            entry = self.evalcache.pop(0)
+            total -= entry[3]
+            deps.forget(entry[1])
+        return result
+
     def getAxisLabels(self, direction):
         """Get labels for datapoints and coordinates, or None if none.
         direction is 'horizontal' or 'vertical'
@@ -167,15 +223,28 @@ class GenericPlotter(widget.Widget):
 
         # clip data within bounds of plotter
         cliprect = self.clipAxesBounds(axes, posn)
-        painter = painthelper.painter(self, posn, clip=cliprect)
-        with painter:
-            self.dataDraw(painter, axes, posn, cliprect)
+
+        # reuse layer from previous render if nothing has changed
+        fingerprint = self.layerFingerprint(painthelper, axes, posn, cliprect)
+        if not painthelper.reuseLayer(self, posn, fingerprint, clip=cliprect):
+            painter = painthelper.painter(self, posn, clip=cliprect,
+                                          fingerprint=fingerprint)
+            with painter:
+                self.dataDraw(painter, axes, posn, cliprect)
 
         for c in self.children:
             c.draw(posn, painthelper, outerbounds)
 
         return posn
 
+    def layerFingerprint(self, painthelper, axes, posn, cliprect):
+        """Return values which determine how the plotter is drawn,
+        besides the data it reads, for reusing previous renders."""
+        return ( painthelper.pagesize, painthelper.dpi, painthelper.scaling,
+                 tuple(posn), cliprect.getCoords(),
+                 self.settings.fingerprint(),
+                 tuple([a.rangeFingerprint() for a in axes]) )
+
     def dataDraw(self, painter, axes, posn, cliprect):
         """Actually plot the data."""
         pass
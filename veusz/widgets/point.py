@@ -382,6 +382,21 @@ class PointPlotter(GenericPlotter):
             descr = _('Type of marker to plot'),
             usertext=_('Marker'), formatting=True), 0 )
         s.add( setting.MarkerColor('Color') )
+        s.add( setting.Int(
+            'densityThreshold', 1000000,
+            minval=0,
+            descr=_('Draw markers as an image of the density of points if '
+                    'more than this number are plotted (0 to disable)'),
+            usertext=_('Density above'),
+            formatting=True) )
+        s.add( setting.Choice(
+            'densityScaling',
+            ['linear', 'sqrt', 'log', 'squared'],
+            'log',
+            descr=_('Scaling to transform the number of points in a '
+                    'density image pixel to color'),
+            usertext=_('Density scaling'),
+            formatting=True) )
 
         s.add( setting.ErrorStyle(
             'errorStyle',
@@ -528,33 +543,30 @@ class PointPlotter(GenericPlotter):
                 axrange[0] = min(axrange[0], 1)
                 axrange[1] = max(axrange[1], length)
 
-    def _getLinePoints( self, xvals, yvals, posn, xdata, ydata ):
-        """Get the points corresponding to the line connecting the points."""
-
-        pts = qt4.QPolygonF()
+    def _getLineVertices( self, xvals, yvals, posn, xdata, ydata ):
+        """Get x and y coordinates of the vertices of the line
+        connecting the points."""
 
         s = self.settings
         steps = s.PlotLine.steps
+        interleave = utils.interleaveArrays
 
         # simple continuous line
         if steps == 'off':
-            utils.addNumpyToPolygonF(pts, xvals, yvals)
+            return xvals, yvals
+
+        x1 = xvals[:-1]
+        x2 = xvals[1:]
+        y1 = yvals[:-1]
+        y2 = yvals[1:]
 
         # stepped line, with points on left
-        elif steps[:4] == 'left':
-            x1 = xvals[:-1]
-            x2 = xvals[1:]
-            y1 = yvals[:-1]
-            y2 = yvals[1:]
-            utils.addNumpyToPolygonF(pts, x1, y1, x2, y1, x2, y2)
+        if steps[:4] == 'left':
+            return interleave(x1, x2, x2), interleave(y1, y1, y2)
 
         # stepped line, with points on right
         elif steps[:5] == 'right':
-            x1 = xvals[:-1]
-            x2 = xvals[1:]
-            y1 = yvals[:-1]
-            y2 = yvals[1:]
-            utils.addNumpyToPolygonF(pts, x1, y1, x1, y2, x2, y2)
+            return interleave(x1, x1, x2), interleave(y1, y2, y2)
 
         # stepped line, with points in centre
         # this is complex as we can't use the mean of the plotter coords,
@@ -571,20 +583,14 @@ class PointPlotter(GenericPlotter):
                 # convert xmin and xmax to graph coordinates
                 xmin = axes[0].dataToPlotterCoords(posn, xmin)
                 xmax = axes[0].dataToPlotterCoords(posn, xmax)
-                utils.addNumpyToPolygonF(pts, xmin, yvals, xmax, yvals)
+                return interleave(xmin, xmax), interleave(yvals, yvals)
 
             else:
                 # we put the bin edges half way between the points
                 # we assume this is the correct thing to do even in log space
-                x1 = xvals[:-1]
-                x2 = xvals[1:]
-                y1 = yvals[:-1]
-                y2 = yvals[1:]
                 xc = 0.5*(x1+x2)
-                utils.addNumpyToPolygonF(pts, x1, y1, xc, y1, xc, y2)
-
-                if len(xvals) > 0:
-                    pts.append( qt4.QPointF(xvals[-1], yvals[-1]) )
+                return ( N.concatenate((interleave(x1, xc, xc), xvals[-1:])),
+                         N.concatenate((interleave(y1, y1, y2), yvals[-1:])) )
 
         elif steps[:7] == 'vcentre':
             axes = self.parent.getAxes( (s.xAxis, s.yAxis) )
@@ -598,24 +604,32 @@ class PointPlotter(GenericPlotter):
                 # convert ymin and ymax to graph coordinates
                 ymin = axes[1].dataToPlotterCoords(posn, ymin)
                 ymax = axes[1].dataToPlotterCoords(posn, ymax)
-                utils.addNumpyToPolygonF(pts, xvals, ymin, xvals, ymax)
+                return interleave(xvals, xvals), interleave(ymin, ymax)
 
             else:
                 # we put the bin edges half way between the points
                 # we assume this is the correct thing to do even in log space
-                y1 = yvals[:-1]
-                y2 = yvals[1:]
-                x1 = xvals[:-1]
-                x2 = xvals[1:]
                 yc = 0.5*(y1+y2)
-                utils.addNumpyToPolygonF(pts, x1, y1, x1, yc, x2, yc)
-
-                if len(yvals) > 0:
-                    pts.append( qt4.QPointF(xvals[-1], yvals[-1]) )
+                return ( N.concatenate((interleave(x1, x1, x2), xvals[-1:])),
+                         N.concatenate((interleave(y1, yc, yc), yvals[-1:])) )
 
         else:
             assert False
 
+    def _getLinePoints( self, xvals, yvals, posn, xdata, ydata,
+                        decimate=False ):
+        """Get the points corresponding to the line connecting the points.
+
+        If decimate is set, points which would not change how the line
+        looks (several in the same pixel column) are removed.
+        """
+
+        x, y = self._getLineVertices(xvals, yvals, posn, xdata, ydata)
+        if decimate:
+            x, y = utils.decimateLinePoints(x, y)
+
+        pts = qt4.QPolygonF()
+        utils.addNumpyToPolygonF(pts, x, y)
         return pts
 
     def _getBezierLine(self, poly, cliprect):
@@ -670,7 +684,9 @@ class PointPlotter(GenericPlotter):
                        cliprect ):
         """Draw the line connecting the points."""
 
-        pts = self._getLinePoints(xvals, yvals, posn, xdata, ydata)
+        pts = self._getLinePoints(
+            xvals, yvals, posn, xdata, ydata,
+            decimate=self.settings.PlotLine.decimate)
         if len(pts) < 2:
             return
         s = self.settings
@@ -685,6 +701,57 @@ class PointPlotter(GenericPlotter):
             painter.setPen( s.PlotLine.makeQPen(painter) )
             utils.plotClippedPolyline(painter, cliprect, pts)
 
+    @staticmethod
+    def _densityGrid(cliprect):
+        """Return an empty grid of point counts for the pixels in
+        cliprect, or None if it is empty."""
+        width = int(N.ceil(cliprect.width()))
+        height = int(N.ceil(cliprect.height()))
+        if width <= 0 or height <= 0:
+            return None
+        return N.zeros((height, width), dtype=N.float64)
+
+    @staticmethod
+    def _addDensityPoints(counts, xplt, yplt, cliprect):
+        """Add the number of points falling in each pixel of cliprect
+        to the grid counts."""
+
+        height, width = counts.shape
+        x0, y0 = cliprect.left(), cliprect.top()
+
+        # pixel of each point, with row 0 at bottom, as for images
+        with N.errstate(invalid='ignore'):
+            col = N.floor(xplt - x0)
+            row = N.floor((y0 + height) - yplt)
+            inside = ( (col >= 0) & (col < width) &
+                       (row >= 0) & (row < height) )
+        if not N.any(inside):
+            return
+        pixidx = ( row[inside].astype(N.intp)*width +
+                   col[inside].astype(N.intp) )
+        counts += N.bincount(pixidx, minlength=width*height).reshape(
+            (height, width))
+
+    def _plotDensityImage(self, painter, counts, cliprect):
+        """Draw the grid of point counts as an image, colored by the
+        number of points falling in each pixel."""
+
+        if not N.any(counts > 0):
+            return
+
+        s = self.settings
+        height, width = counts.shape
+        cmap = self.document.evaluate.getColormap(
+            s.MarkerFill.colorMap, s.MarkerFill.colorMapInvert)
+        # empty pixels are left transparent
+        image = utils.applyColorMap(
+            cmap, s.densityScaling, counts, 1., counts.max(),
+            s.MarkerFill.transparency,
+            transimg=(counts > 0).astype(N.float64))
+        painter.drawImage(
+            qt4.QRectF(cliprect.left(), cliprect.top(), width, height),
+            image)
+
     def drawKeySymbol(self, number, painter, x, y, width, height):
         """Draw the plot symbol and/or line."""
         painter.save()
@@ -804,7 +871,9 @@ class PointPlotter(GenericPlotter):
                 axes[0].dataToPlotterCoords(bounds, x),
                 axes[1].dataToPlotterCoords(bounds, y) )
 
-        return pickable.DiscretePickable(self, 'xData', 'yData', map_fn)
+        return pickable.cachedPickable(
+            self, (self.document.changeset, tuple(bounds)),
+            lambda: pickable.DiscretePickable(self, 'xData', 'yData', map_fn))
 
     def pickPoint(self, x0, y0, bounds, distance = 'radial'):
         return self._pickable(bounds).pickPoint(x0, y0, bounds, distance)
@@ -851,6 +920,14 @@ class PointPlotter(GenericPlotter):
             length = min( len(xv.data), len(yv.data) )
             text = text*(length // len(text)) + text[:length % len(text)]
 
+        # draw markers as a density image if there are too many
+        # points, counting the points of all the parts in one grid
+        usedensity = ( (not s.MarkerLine.hide or not s.MarkerFill.hide) and
+                       s.marker != 'none' and
+                       0 < s.densityThreshold <
+                       min(len(xv.data), len(yv.data)) // s.thinfactor )
+        density = self._densityGrid(cliprect) if usedensity else None
+
         # loop over chopped up values
         for xvals, yvals, tvals, ptvals, cvals in (
             datasets.generateValidDatasetParts(
@@ -900,7 +977,14 @@ class PointPlotter(GenericPlotter):
 
             # plot the points (we do this last so they are on top)
             markersize = s.get('markerSize').convert(painter)
-            if not s.MarkerLine.hide or not s.MarkerFill.hide:
+            if usedensity:
+                # too many points to draw individually
+                if density is not None:
+                    self._addDensityPoints(
+                        density, xpltpoint[::s.thinfactor],
+                        ypltpoint[::s.thinfactor], cliprect)
+
+            elif not s.MarkerLine.hide or not s.MarkerFill.hide:
 
                 #print "Painting marker fill"
                 if not s.MarkerFill.hide:
@@ -956,5 +1040,9 @@ class PointPlotter(GenericPlotter):
                     painter, xpltpoint, ypltpoint,
                     tvals, markersize)
 
+        if density is not None:
+            # a single image for all the parts, so their colors match
+            self._plotDensityImage(painter, density, cliprect)
+
 # allow the factory to instantiate an x,y plotter
 document.thefactory.register( PointPlotter )
@@ -225,6 +225,12 @@ class MainWindow(qt4.QMainWindow):
         # has the document already been setup
         self.documentsetup = False
 
+        # reload linked files automatically if requested
+        self.linkwatcher = None
+        if setdb['data_watchlinks']:
+            self.vzactions['data.watch'].setChecked(True)
+            self.slotDataWatch(True)
+
     def updateStatusbar(self, text):
         '''Display text for a set period.'''
         self.statusBar().showMessage(text, 2000)
@@ -522,6 +528,11 @@ class MainWindow(qt4.QMainWindow):
             'data.reload':
                 a(self, _('Reload linked datasets'), _('&Reload'),
                   self.slotDataReload, icon='kde-view-refresh'),
+            'data.watch':
+                a(self, _('Reload linked datasets automatically when '
+                          'their files change'),
+                  _('&Watch linked files'),
+                  self.slotDataWatch, checkable=True),
 
             'help.home':
                 a(self, _('Go to the Veusz home page on the internet'),
@@ -603,7 +614,7 @@ class MainWindow(qt4.QMainWindow):
             ['data.ops', _('&Operations'), datapluginsmenu],
             'data.import', 'data.edit', 'data.create',
             'data.create2d', 'data.capture', 'data.filter', 'data.histogram',
-            'data.reload',
+            'data.reload', 'data.watch',
             ]
         helpmenu = [
             'help.home', 'help.project', 'help.bug',
@@ -773,6 +784,22 @@ class MainWindow(qt4.QMainWindow):
         self.showDialog(dialog)
         return dialog
 
+    def slotDataWatch(self, checked):
+        """Watch linked files, reloading them when they change."""
+        setdb['data_watchlinks'] = checked
+        if checked and self.linkwatcher is None:
+            self.linkwatcher = document.LinkWatcher(self.document, self)
+            self.linkwatcher.sigReloaded.connect(self.slotLinksReloaded)
+        elif not checked and self.linkwatcher is not None:
+            self.linkwatcher.stop()
+            self.linkwatcher = None
+
+    def slotLinksReloaded(self, datasets, errors):
+        """Show datasets reloaded by watching linked files."""
+        if datasets:
+            self.updateStatusbar(
+                _('Reloaded %i linked datasets') % len(datasets))
+
     def slotHelpHomepage(self):
         """Go to the veusz homepage."""
         qt4.QDesktopServices.openUrl(qt4.QUrl('http://home.gna.org/veusz/'))
@@ -846,6 +873,10 @@ class MainWindow(qt4.QMainWindow):
             elif v == qt4.QMessageBox.Save:
                 self.slotFileSave()
 
+        # stop reloading linked files
+        if self.linkwatcher is not None:
+            self.linkwatcher.stop()
+
         # store working directory
         setdb['dirname'] = self.dirname
 
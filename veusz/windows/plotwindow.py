@@ -21,6 +21,7 @@
 
 from __future__ import division
 import sys
+import time
 import traceback
 
 from ..compat import crange
@@ -85,6 +86,10 @@ class RenderControl(qt4.QObject):
         self.latestjobs = []
         self.latestaddedjob = -1
         self.latestdrawnjob = -1
+        # number of jobs added but not yet processed
+        self.pending = 0
+        # time taken to render last job (s)
+        self.rendertime = 0.
         self.plotwindow = plotwindow
 
         self.updateNumberThreads()
@@ -131,28 +136,35 @@ class RenderControl(qt4.QObject):
         lastadded = self.latestaddedjob
         self.mutex.unlock()
 
-        # don't process jobs which have been superseded
-        if lastadded == jobid:
-            img = qt4.QImage(helper.pagesize[0], helper.pagesize[1],
-                             qt4.QImage.Format_ARGB32_Premultiplied)
-            img.fill( setting.settingdb.color('page').rgb() )
-
-            painter = qt4.QPainter(img)
-            aa = self.plotwindow.antialias
-            painter.setRenderHint(qt4.QPainter.Antialiasing, aa)
-            painter.setRenderHint(qt4.QPainter.TextAntialiasing, aa)
-            helper.renderToPainter(painter)
-            painter.end()
-
+        try:
+            # don't process jobs which have been superseded
+            if lastadded == jobid:
+                starttime = time.time()
+                img = qt4.QImage(helper.pagesize[0], helper.pagesize[1],
+                                 qt4.QImage.Format_ARGB32_Premultiplied)
+                img.fill( setting.settingdb.color('page').rgb() )
+
+                painter = qt4.QPainter(img)
+                aa = self.plotwindow.antialias
+                painter.setRenderHint(qt4.QPainter.Antialiasing, aa)
+                painter.setRenderHint(qt4.QPainter.TextAntialiasing, aa)
+                helper.renderToPainter(painter)
+                painter.end()
+
+                self.mutex.lock()
+                self.rendertime = time.time() - starttime
+                # just throw away result if it older than the latest one
+                if jobid > self.latestdrawnjob:
+                    self.signalRenderFinished.emit(jobid, img, helper)
+                    self.latestdrawnjob = jobid
+                self.mutex.unlock()
+        finally:
             self.mutex.lock()
-            # just throw away result if it older than the latest one
-            if jobid > self.latestdrawnjob:
-                self.signalRenderFinished.emit(jobid, img, helper)
-                self.latestdrawnjob = jobid
+            self.pending -= 1
             self.mutex.unlock()
 
-        # tell any listeners that a job has been processed
-        self.sigQueueChange.emit(-1)
+            # tell any listeners that a job has been processed
+            self.sigQueueChange.emit(-1)
 
     def addJob(self, helper):
         """Process drawing job in PaintHelper given."""
@@ -164,6 +176,7 @@ class RenderControl(qt4.QObject):
         self.mutex.lock()
         self.latestaddedjob += 1
         self.latestjobs.append( (self.latestaddedjob, helper) )
+        self.pending += 1
         self.mutex.unlock()
 
         if self.threads:
@@ -173,6 +186,13 @@ class RenderControl(qt4.QObject):
             # process job in current thread if multithreading disabled
             self.processNextJob()
 
+    def isBusy(self):
+        """Are there jobs which have not been processed?"""
+        self.mutex.lock()
+        busy = self.pending > 0
+        self.mutex.unlock()
+        return busy
+
 class RenderThread( qt4.QThread ):
     """A thread for processing rendering jobs.
     This is controlled by a RenderControl object
@@ -237,6 +257,11 @@ class PlotWindow( qt4.QGraphicsView ):
         (10000, _('Every 10s')),
         )
 
+    # minimum and maximum time between redrawing the plot when
+    # updating on document changes (ms)
+    minframeinterval = 33
+    maxframeinterval = 2000
+
     def __init__(self, document, parent, menu=None):
         """Initialise the window.
 
@@ -290,6 +315,11 @@ class PlotWindow( qt4.QGraphicsView ):
         # state of last plot from painthelper
         self.painthelper = None
 
+        # layers recorded in previous plots, reused if unchanged
+        # (document module is hidden by the argument here)
+        from ..document import LayerCache
+        self.layercache = LayerCache(self.document)
+
         self.lastwidgetsselected = []
         self.oldzoom = -1.
         self.zoomfactor = 1.
@@ -302,6 +332,8 @@ class PlotWindow( qt4.QGraphicsView ):
             self.slotRenderFinished)
         self.rendercontrol.sigQueueChange.connect(
             self.sigQueueChange)
+        self.rendercontrol.sigQueueChange.connect(
+            self.slotQueueChange)
 
         # mode for clicking
         self.clickmode = 'select'
@@ -314,6 +346,19 @@ class PlotWindow( qt4.QGraphicsView ):
         self.timer = qt4.QTimer(self)
         self.timer.timeout.connect(self.checkPlotUpdate)
 
+        # timer for redrawing after document changes, so that changes
+        # are combined into frames
+        self.frametimer = qt4.QTimer(self)
+        self.frametimer.setSingleShot(True)
+        self.frametimer.timeout.connect(self.slotFrameTimer)
+        # time between frames (ms), adjusted to the time taken to draw
+        self.frameinterval = self.minframeinterval
+        self.lastframetime = 0.
+        # time taken to record last drawing (s)
+        self.recordtime = 0.
+        # frame is waiting for rendering to finish
+        self.framewaiting = False
+
         # for drag scrolling
         self.grabpos = None
         self.scrolltimer = qt4.QTimer(self)
@@ -908,7 +953,43 @@ class PlotWindow( qt4.QGraphicsView ):
         # only update if doc is modified and the update policy is set
         # to update on document updates
         if ismodified and self.interval == -1:
-            self.checkPlotUpdate()
+            self.scheduleFrame()
+
+    def scheduleFrame(self):
+        """Update the plot when the frame interval since the last
+        update has passed."""
+
+        if self.frametimer.isActive() or self.framewaiting:
+            return
+        elapsed = (time.time() - self.lastframetime) * 1000
+        self.frametimer.start(max(0, int(self.frameinterval - elapsed)))
+
+    def slotFrameTimer(self):
+        """Time to draw the next frame."""
+
+        if self.rendercontrol.isBusy():
+            # record the drawing when the last one has been rendered,
+            # rather than one which would be superseded
+            self.framewaiting = True
+            return
+
+        self.lastframetime = time.time()
+        self.checkPlotUpdate()
+
+    @qt4.pyqtSlot(int)
+    def slotQueueChange(self, change):
+        """A rendering job was added or finished."""
+
+        if change < 0 and not self.rendercontrol.isBusy():
+            # spend at most around half the time drawing
+            drawtime = self.recordtime + self.rendercontrol.rendertime
+            self.frameinterval = min(
+                max(self.minframeinterval, int(2000*drawtime)),
+                self.maxframeinterval)
+
+            if self.framewaiting:
+                self.framewaiting = False
+                self.scheduleFrame()
 
     def checkPlotUpdate(self):
         """Check whether plot needs updating."""
@@ -934,9 +1015,14 @@ class PlotWindow( qt4.QGraphicsView ):
                 # draw the data into the buffer
                 # errors cause an exception window to pop up
                 try:
+                    starttime = time.time()
                     phelper = document.PaintHelper(
-                        size, scaling=self.zoomfactor, dpi=self.dpi)
+                        size, scaling=self.zoomfactor, dpi=self.dpi,
+                        layercache=self.layercache)
                     self.document.paintTo(phelper, self.pagenumber)
+                    # forget layers of widgets no longer plotted
+                    self.layercache.prune(phelper)
+                    self.recordtime = time.time() - starttime
 
                 except Exception:
                     # stop updates this time round and show exception dialog
@@ -1023,6 +1109,7 @@ class PlotWindow( qt4.QGraphicsView ):
     def actionForceUpdate(self):
         """Force an update for the graph."""
         self.docchangeset = -100
+        self.layercache.clear()
         self.checkPlotUpdate()
 
     def slotFullScreen(self):